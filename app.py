@@ -1,28 +1,58 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from db import query_view
+import datasets
+from graficos import grafico_linhas
+from queries import AGRUPAMENTOS, COLUNAS_DETALHE, contar_vendas, pagina_vendas
+from tabela_paginada import tabela_paginada
 
 st.set_page_config(page_title="Watcher", layout="wide")
 st.title("Watcher Dashboard")
 
-VIEW_NAME = "public.vw_vendas_sku_diarias"
+
+@st.cache_data(ttl=60)
+def load_versao():
+    return datasets.versao("vendas")
 
 
 @st.cache_data
-def load_data():
-    df = query_view(VIEW_NAME)
-    df["data_venda"] = pd.to_datetime(df["data_venda"])
-    return df
+def load_skus(versao):
+    return datasets.vendas_skus(versao)
+
+
+@st.cache_data
+def load_intervalo(versao):
+    return datasets.vendas_intervalo(versao)
+
 
+@st.cache_data(max_entries=100)
+def load_chart(versao, selected, data_inicio, data_fim, agrupamento):
+    return datasets.vendas_grafico(versao, selected, data_inicio, data_fim, agrupamento)
 
-df = load_data()
+
+@st.cache_data(max_entries=100)
+def load_ranking(versao, selected, data_inicio, data_fim):
+    return datasets.vendas_ranking(versao, selected, data_inicio, data_fim)
+
+
+@st.cache_data(max_entries=20)
+def load_total(versao, selected, data_inicio, data_fim):
+    return contar_vendas(selected, data_inicio, data_fim)
+
+
+@st.cache_data(max_entries=200)
+def load_pagina(versao, selected, data_inicio, data_fim, colunas, ordenar_por, decrescente, cursor, limite):
+    return pagina_vendas(
+        selected, data_inicio, data_fim, colunas,
+        ordenar_por=ordenar_por, decrescente=decrescente, apos=cursor, limite=limite,
+    )
+
+
+versao = load_versao()
 
 # --- Filtros ---
 col_filtro1, col_filtro2 = st.columns([3, 1])
 
-skus = df[["sku", "produto_nome"]].drop_duplicates().sort_values("sku")
-sku_options = {row.sku: f"{row.sku} - {row.produto_nome}" for _, row in skus.iterrows()}
+skus = load_skus(versao)
+sku_options = {row.sku: f"{row.sku} - {row.produto_nome}" for row in skus.itertuples()}
 
 with col_filtro1:
     selected = st.multiselect(
@@ -34,12 +64,11 @@ with col_filtro1:
 with col_filtro2:
     agrupamento = st.selectbox(
         "Agrupar por",
-        options=["Diário", "Semanal", "Mensal"],
+        options=list(AGRUPAMENTOS),
     )
 
 # --- Filtro de data ---
-data_min = df["data_venda"].min().date()
-data_max = df["data_venda"].max().date()
+data_min, data_max = load_intervalo(versao)
 
 col_data1, col_data2 = st.columns(2)
 with col_data1:
@@ -47,48 +76,27 @@ with col_data1:
 with col_data2:
     data_fim = st.date_input("Data final", value=None, min_value=data_min, max_value=data_max)
 
-if selected:
-    df = df[df["sku"].isin(selected)]
-if data_inicio:
-    df = df[df["data_venda"] >= pd.Timestamp(data_inicio)]
-if data_fim:
-    df = df[df["data_venda"] <= pd.Timestamp(data_fim)]
-
-# --- Agrupamento temporal ---
-freq_map = {"Diário": "D", "Semanal": "W-MON", "Mensal": "MS"}
-freq = freq_map[agrupamento]
-
-chart_df = (
-    df.groupby([pd.Grouper(key="data_venda", freq=freq), "sku"], as_index=False)
-    .agg(valor_total_vendas=("valor_total_vendas", "sum"), qtd_vendida=("qtd_vendida", "sum"))
-)
+# --- Agrupamento temporal (no banco) ---
+chart_df = load_chart(versao, selected, data_inicio, data_fim, agrupamento)
 
 # --- Gráfico ---
-fig = px.line(
+# Limita séries (maiores SKUs + "Outros") e pontos por série (LTTB) para o gráfico não crescer com o histórico
+fig = grafico_linhas(
     chart_df,
     x="data_venda",
     y="valor_total_vendas",
-    color="sku",
+    cor="sku",
     custom_data=["qtd_vendida"],
     labels={"data_venda": "Data", "valor_total_vendas": "Vendas (R$)", "sku": "SKU"},
+    hovertemplate="<b>%{x}</b><br>Vendas: R$ %{y:,.2f}<br>Qtd: %{customdata[0]:,.0f}<extra>%{fullData.name}</extra>",
 )
-fig.update_traces(
-    hovertemplate="<b>%{x}</b><br>Vendas: R$ %{y:,.2f}<br>Qtd: %{customdata[0]:,.0f}<extra>%{fullData.name}</extra>"
-)
-fig.update_layout(hovermode="x unified")
 
 st.plotly_chart(fig, width='stretch')
 
 # --- Ranking Top 10 ---
 st.subheader("Top 10 Produtos Mais Vendidos")
 
-ranking = (
-    df.groupby(["sku", "produto_nome"], as_index=False)
-    .agg(total_vendas=("valor_total_vendas", "sum"), total_qtd=("qtd_vendida", "sum"))
-    .sort_values("total_vendas", ascending=False)
-    .head(10)
-    .reset_index(drop=True)
-)
+ranking = load_ranking(versao, selected, data_inicio, data_fim)
 ranking.index = ranking.index + 1
 ranking.columns = ["SKU", "Produto", "Total Vendas (R$)", "Qtd Vendida"]
 
@@ -96,4 +104,15 @@ st.dataframe(ranking, width='stretch')
 
 # --- Dados ---
 st.subheader("Dados")
-st.dataframe(df, width='stretch')
+tabela_paginada(
+    "vendas_dados",
+    lambda *args: load_pagina(versao, selected, data_inicio, data_fim, *args),
+    list(COLUNAS_DETALHE),
+    load_total(versao, selected, data_inicio, data_fim),
+    filtros=(versao, tuple(selected), data_inicio, data_fim),
+    ordem_padrao="data_venda",
+    rotulos={
+        "data_venda": "Data", "sku": "SKU", "produto_nome": "Produto",
+        "valor_total_vendas": "Vendas (R$)", "qtd_vendida": "Qtd Vendida",
+    },
+)
@@ -0,0 +1,123 @@
+"""Postgres local do benchmark: montagem do schema a partir de migrations/ e contagem de round-trips."""
+import os
+import threading
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import extensions
+
+import db
+
+RAIZ = Path(__file__).parent.parent
+MIGRATIONS = RAIZ / "migrations"
+STUBS = Path(__file__).parent / "stubs.sql"
+
+# O benchmark apaga o schema public: só roda em hosts locais, a não ser que seja forçado
+HOSTS_LOCAIS = {"localhost", "127.0.0.1", "::1", "postgres-bench"}
+
+BENCH_PG = {
+    "SUPA_HOST": os.getenv("BENCH_PG_HOST", "localhost"),
+    "SUPA_PORT": os.getenv("BENCH_PG_PORT", "5433"),
+    "SUPA_DB": os.getenv("BENCH_PG_DB", "bench"),
+    "SUPA_USER": os.getenv("BENCH_PG_USER", "postgres"),
+    "SUPA_PASS": os.getenv("BENCH_PG_PASS", "bench"),
+}
+
+
+class ContadorRoundTrips:
+    """Conta os comandos enviados ao banco (execute, COPY, commit, rollback)."""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def somar(self, n: int = 1):
+        with self._lock:
+            self.total += n
+
+    def zerar(self):
+        with self._lock:
+            self.total = 0
+
+
+contador = ContadorRoundTrips()
+
+
+class _CursorContado(extensions.cursor):
+    def execute(self, query, vars=None):
+        contador.somar()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        # executemany do psycopg2 manda um comando por linha
+        vars_list = list(vars_list)
+        contador.somar(len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        contador.somar()
+        return super().copy_expert(sql, file, size)
+
+
+class _ConexaoContada(extensions.connection):
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("cursor_factory", _CursorContado)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        contador.somar()
+        return super().commit()
+
+    def rollback(self):
+        contador.somar()
+        return super().rollback()
+
+
+def _get_connection_contada():
+    return psycopg2.connect(
+        host=os.getenv("SUPA_HOST"),
+        port=os.getenv("SUPA_PORT"),
+        dbname=os.getenv("SUPA_DB"),
+        user=os.getenv("SUPA_USER"),
+        password=os.getenv("SUPA_PASS"),
+        connection_factory=_ConexaoContada,
+    )
+
+
+def configurar(forcar: bool = False):
+    """Aponta db.py para o Postgres do benchmark e passa a contar os round-trips."""
+    if BENCH_PG["SUPA_HOST"] not in HOSTS_LOCAIS and not forcar:
+        raise RuntimeError(
+            f"BENCH_PG_HOST={BENCH_PG['SUPA_HOST']} não é local; o benchmark recria o schema public. "
+            "Use --forcar se for mesmo um banco descartável."
+        )
+    os.environ.update(BENCH_PG)
+    db.get_connection = _get_connection_contada
+
+
+def recriar_schema():
+    """Recria o schema public com os stubs e todas as migrations, em ordem."""
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DROP SCHEMA IF EXISTS public CASCADE")
+        cur.execute("CREATE SCHEMA public")
+        cur.execute(STUBS.read_text())
+        for arquivo in sorted(MIGRATIONS.glob("*.sql")):
+            cur.execute(arquivo.read_text())
+        conn.commit()
+    finally:
+        conn.close()
+    # Conexões do pool ainda apontam para os objetos antigos
+    db.get_pool().closeall()
+
+
+def limpar_pedidos():
+    """Apaga pedidos de compra (e payloads arquivados), razão de estoque, cursores e jobs, mantendo o schema."""
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "TRUNCATE pedidos_compra, pedidos_compra_itens, pedidos_compra_chaves, pedidos_compra_payloads, "
+            "sync_cursor, sync_jobs, sync_falhas, estoque_mensal, estoque_pendentes"
+        )
+        conn.commit()
@@ -0,0 +1,240 @@
+"""Servidor local que imita os endpoints de pedidos de compra da API v3 do Bling.
+
+Uso avulso:  python -m bench.fake_bling --pedidos 5000 --latencia-ms 80 --limite-req-s 3
+e aponte o sync para ele com BLING_API_BASE / BLING_TOKEN_URL (ver README).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PREFIXO = "/Api/v3"
+
+
+def gerar_pedido(pedido_id: int, rng: random.Random, itens_por_pedido: int, payload_kb: int) -> dict:
+    """Payload de detalhe no formato do Bling, com `payload_kb` KB de campos não mapeados."""
+    data = date(2023, 1, 1) + timedelta(days=rng.randrange(900))
+    itens = []
+    for _ in range(max(1, int(rng.gauss(itens_por_pedido, itens_por_pedido / 3)))):
+        produto_id = rng.randrange(1, 2000)
+        quantidade = rng.randrange(1, 50)
+        valor = round(rng.uniform(5, 300), 2)
+        itens.append({
+            "descricao": f"Produto {produto_id}",
+            "codigoFornecedor": f"F-{produto_id}",
+            "unidade": "UN",
+            "valor": valor,
+            "quantidade": quantidade,
+            "aliquotaIPI": 0,
+            "produto": {"id": produto_id, "codigo": f"SKU-{produto_id:05d}", "nome": f"Produto {produto_id}"},
+        })
+    total_produtos = round(sum(i["valor"] * i["quantidade"] for i in itens), 2)
+    data_prevista = data + timedelta(days=rng.randrange(5, 60))
+    fornecedor_id = rng.randrange(1, 80)
+    return {
+        "id": pedido_id,
+        "numero": str(pedido_id),
+        "data": data.isoformat(),
+        "dataPrevista": data_prevista.isoformat(),
+        "totalProdutos": total_produtos,
+        "total": total_produtos,
+        "fornecedor": {"id": fornecedor_id, "nome": f"Fornecedor {fornecedor_id}"},
+        "situacao": {"valor": rng.choices([0, 1, 2, 3], weights=[2, 6, 1, 1])[0]},
+        "desconto": {"valor": 0, "unidade": "REAL"},
+        "ordemCompra": "",
+        "observacoes": "",
+        "observacoesInternas": "",
+        "itens": itens,
+        # Campos que o sync não grava, só para o payload ter o tamanho configurado
+        "parcelas": [{"observacao": "x" * 1024} for _ in range(payload_kb)],
+    }
+
+
+def _resumo(pedido: dict) -> dict:
+    return {
+        "id": pedido["id"],
+        "numero": pedido["numero"],
+        "data": pedido["data"],
+        "dataPrevista": pedido["dataPrevista"],
+        "total": pedido["total"],
+        "fornecedor": pedido["fornecedor"],
+        "situacao": pedido["situacao"],
+    }
+
+
+class FakeBling:
+    """Base de pedidos em memória servida por HTTP, com latência, 429 e tamanho configuráveis.
+
+    `limite_req_s` = 0 desliga o limite; acima dele o servidor responde 429 como o Bling.
+    `contadores` registra requisições por rota, 429s e renovações de token.
+    """
+
+    def __init__(
+        self,
+        pedidos: int = 1000,
+        itens_por_pedido: int = 5,
+        latencia_ms: float = 50,
+        jitter_ms: float = 20,
+        limite_req_s: float = 0,
+        payload_kb: int = 0,
+        semente: int = 42,
+    ):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.limite_req_s = limite_req_s
+        self.contadores = Counter()
+
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        self._janela = deque()
+        self.pedidos = {
+            i: gerar_pedido(i, self._rng, itens_por_pedido, payload_kb)
+            for i in range(1_000_001, 1_000_001 + pedidos)
+        }
+        self._ids = sorted(self.pedidos, reverse=True)
+        self._servidor = None
+
+    def alterar(self, fracao: float) -> list[int]:
+        """Muda situação e total de uma fração dos pedidos (para medir o sync incremental)."""
+        with self._lock:
+            ids = self._rng.sample(self._ids, int(len(self._ids) * fracao))
+            for pedido_id in ids:
+                pedido = self.pedidos[pedido_id]
+                pedido["situacao"] = {"valor": 1 if pedido["situacao"]["valor"] != 1 else 2}
+                pedido["itens"][0]["quantidade"] += 1
+                pedido["total"] = pedido["totalProdutos"] = round(
+                    sum(i["valor"] * i["quantidade"] for i in pedido["itens"]), 2
+                )
+        return ids
+
+    def _limitado(self) -> bool:
+        if not self.limite_req_s:
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            while self._janela and agora - self._janela[0] >= 1:
+                self._janela.popleft()
+            if len(self._janela) >= self.limite_req_s:
+                return True
+            self._janela.append(agora)
+            return False
+
+    def _listar(self, params: dict) -> dict:
+        pagina = int(params.get("pagina", 1))
+        limite = int(params.get("limite", 100))
+        ids = self._ids
+        if "dataInicial" in params:
+            ids = [i for i in ids if self.pedidos[i]["data"] >= params["dataInicial"]]
+        if "valorSituacao" in params:
+            situacao = int(params["valorSituacao"])
+            ids = [i for i in ids if self.pedidos[i]["situacao"]["valor"] == situacao]
+        inicio = (pagina - 1) * limite
+        return {"data": [_resumo(self.pedidos[i]) for i in ids[inicio:inicio + limite]]}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: dict, headers: dict | None = None):
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                for nome, valor in (headers or {}).items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlparse(self.path).path != f"{PREFIXO}/oauth/token":
+                    return self._responder(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+                fake.contadores["token"] += 1
+                self._responder(200, {
+                    "access_token": f"bench-{fake.contadores['token']}",
+                    "refresh_token": "bench-refresh",
+                    "expires_in": 21600,
+                })
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                fake.contadores["requisicoes"] += 1
+
+                if fake._limitado():
+                    fake.contadores["429"] += 1
+                    return self._responder(
+                        429,
+                        {"error": {"type": "TOO_MANY_REQUESTS", "message": "Limite de requisições atingido"}},
+                        {"Retry-After": "1"},
+                    )
+
+                time.sleep(max(0.0, fake._rng.gauss(fake.latencia_ms, fake.jitter_ms)) / 1000)
+
+                partes = url.path.removeprefix(PREFIXO).strip("/").split("/")
+                if partes == ["pedidos", "compras"]:
+                    fake.contadores["listagem"] += 1
+                    return self._responder(200, fake._listar(params))
+                if len(partes) == 3 and partes[:2] == ["pedidos", "compras"] and partes[2].isdigit():
+                    fake.contadores["detalhe"] += 1
+                    pedido = fake.pedidos.get(int(partes[2]))
+                    if pedido is None:
+                        return self._responder(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+                    return self._responder(200, {"data": pedido})
+                self._responder(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+
+        return Handler
+
+    def iniciar(self, host: str = "127.0.0.1", porta: int = 0) -> str:
+        """Sobe o servidor numa thread e retorna a URL base (equivalente a BLING_API_BASE)."""
+        self._servidor = ThreadingHTTPServer((host, porta), self._handler())
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="fake-bling", daemon=True).start()
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}{PREFIXO}"
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor fake da API de pedidos de compra do Bling")
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--pedidos", type=int, default=1000)
+    parser.add_argument("--itens-por-pedido", type=int, default=5)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--limite-req-s", type=float, default=0)
+    parser.add_argument("--payload-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeBling(
+        pedidos=args.pedidos,
+        itens_por_pedido=args.itens_por_pedido,
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        limite_req_s=args.limite_req_s,
+        payload_kb=args.payload_kb,
+    )
+    print(f"Fake Bling em {fake.iniciar(porta=args.porta)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Benchmark offline do sync de pedidos de compra (fake Bling + Postgres local).
+
+    python -m bench.run --pedidos 300 --cenarios upsert_unitario,upsert_lote,sync_completo
+    python -m bench.run --salvar base.json
+    python -m bench.run --comparar base.json --tolerancia 0.2   # sai com 1 se houver regressão
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench import banco
+from bench.fake_bling import FakeBling
+
+CENARIOS = ("upsert_unitario", "upsert_lote", "upsert_inalterado", "sync_completo", "sync_incremental")
+
+
+def _percentil(valores: list[float], p: float) -> float | None:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class Medidor:
+    """Instrumenta as chamadas ao Bling do sync (latência por página e por detalhe)."""
+
+    def __init__(self):
+        self.listagens = []
+        self.detalhes = []
+        self.itens = 0
+        self._lock = threading.Lock()
+
+    def zerar(self):
+        with self._lock:
+            self.listagens, self.detalhes, self.itens = [], [], 0
+
+    def instrumentar(self, bling, pipeline):
+        listar = pipeline.listar_pedidos_compra
+        buscar = bling.buscar_pedido_compra
+
+        def listar_medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return listar(*args, **kwargs)
+            finally:
+                self.listagens.append(time.perf_counter() - inicio)
+
+        def buscar_medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            resp = buscar(*args, **kwargs)
+            duracao = time.perf_counter() - inicio
+            with self._lock:
+                self.detalhes.append(duracao)
+                self.itens += len((resp.get("data") or resp).get("itens") or [])
+            return resp
+
+        pipeline.listar_pedidos_compra = listar_medido
+        bling.buscar_pedido_compra = buscar_medido
+
+
+def _medir(nome: str, executar, itens: int | None, fake: FakeBling, medidor: Medidor) -> dict:
+    banco.contador.zerar()
+    medidor.zerar()
+    req_antes, erros_429_antes = fake.contadores["requisicoes"], fake.contadores["429"]
+
+    inicio = time.perf_counter()
+    resultado = executar()
+    segundos = time.perf_counter() - inicio
+
+    pedidos = resultado["total"]
+    itens = medidor.itens if itens is None else itens
+    ms = lambda v: None if v is None else round(v * 1000, 1)  # noqa: E731
+    return {
+        "cenario": nome,
+        "pedidos": pedidos,
+        "itens": itens,
+        "segundos": round(segundos, 3),
+        "pedidos_s": round(pedidos / segundos, 1) if segundos else None,
+        "itens_s": round(itens / segundos, 1) if segundos else None,
+        "listagem_p50_ms": ms(_percentil(medidor.listagens, 50)),
+        "listagem_p99_ms": ms(_percentil(medidor.listagens, 99)),
+        "detalhe_p50_ms": ms(_percentil(medidor.detalhes, 50)),
+        "detalhe_p99_ms": ms(_percentil(medidor.detalhes, 99)),
+        "round_trips": banco.contador.total,
+        "round_trips_pedido": round(banco.contador.total / pedidos, 2) if pedidos else None,
+        "requisicoes": fake.contadores["requisicoes"] - req_antes,
+        "erros_429": fake.contadores["429"] - erros_429_antes,
+        "erros": resultado["erros"],
+    }
+
+
+def _consumir_sync(sync_pedidos_compra, incremental: bool) -> dict:
+    """Roda o sync até o fim. Se ele abortar, devolve o acumulado até ali (com a falha nos erros)."""
+    final = {"total": 0, "inseridos": 0, "inalterados": 0, "erros": 0}
+    try:
+        for evento in sync_pedidos_compra(incremental=incremental):
+            if evento.get("concluido"):
+                final = evento
+            elif "acumulado" in evento:
+                final = dict(evento["acumulado"])
+    except Exception as e:
+        print(f"sync abortado: {e}", file=sys.stderr)
+        final = {**final, "erros": final["erros"] + 1}
+    return final
+
+
+def executar(args) -> list[dict]:
+    fake = FakeBling(
+        pedidos=args.pedidos,
+        itens_por_pedido=args.itens_por_pedido,
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        limite_req_s=args.limite_req_s,
+        payload_kb=args.payload_kb,
+    )
+    base = fake.iniciar()
+
+    # sync.bling lê a configuração ao ser importado
+    os.environ["BLING_API_BASE"] = base
+    os.environ["BLING_TOKEN_URL"] = f"{base}/oauth/token"
+    os.environ["BLING_REQ_POR_SEGUNDO"] = str(args.req_s)
+    banco.configurar(args.forcar)
+
+    from sync import bling, pipeline
+    from sync.models import upsert_pedidos_compra, upsert_pedidos_compra_bulk
+
+    # Tokens do benchmark num arquivo temporário, sem tocar no bling_tokens.json
+    conta = bling.conta()
+    conta.tokens = bling.TokenManager(Path(tempfile.mkdtemp()) / "tokens.json", conta.id)
+    conta.tokens.salvar({"access_token": "bench", "refresh_token": "bench", "expires_in": 21600})
+
+    medidor = Medidor()
+    medidor.instrumentar(bling, pipeline)
+
+    if not args.sem_recriar:
+        banco.recriar_schema()
+
+    payloads = list(fake.pedidos.values())[:args.pedidos_upsert]
+    itens_payloads = sum(len(p["itens"]) for p in payloads)
+
+    def em_lotes():
+        total = {"total": 0, "erros": 0}
+        for i in range(0, len(payloads), pipeline.SYNC_LOTE_PEDIDOS):
+            resultado = upsert_pedidos_compra_bulk(payloads[i:i + pipeline.SYNC_LOTE_PEDIDOS])
+            total["total"] += resultado["total"]
+            total["erros"] += len(resultado["erros"])
+        return total
+
+    resultados = []
+    for cenario in args.cenarios:
+        if cenario == "upsert_unitario":
+            banco.limpar_pedidos()
+            r = _medir(cenario, lambda: upsert_pedidos_compra(payloads), itens_payloads, fake, medidor)
+        elif cenario == "upsert_lote":
+            banco.limpar_pedidos()
+            r = _medir(cenario, em_lotes, itens_payloads, fake, medidor)
+        elif cenario == "upsert_inalterado":
+            # Segunda gravação dos mesmos pedidos: mede o caminho do hash inalterado
+            em_lotes()
+            r = _medir(cenario, em_lotes, itens_payloads, fake, medidor)
+        elif cenario == "sync_completo":
+            banco.limpar_pedidos()
+            r = _medir(cenario, lambda: _consumir_sync(pipeline.sync_pedidos_compra, False), None, fake, medidor)
+        elif cenario == "sync_incremental":
+            if "sync_completo" not in args.cenarios[:args.cenarios.index(cenario)]:
+                banco.limpar_pedidos()
+                _consumir_sync(pipeline.sync_pedidos_compra, False)
+            fake.alterar(args.fracao_alterada)
+            r = _medir(cenario, lambda: _consumir_sync(pipeline.sync_pedidos_compra, True), None, fake, medidor)
+        else:
+            raise ValueError(f"Cenário desconhecido: {cenario}")
+        resultados.append(r)
+        print(_linha(r), flush=True)
+
+    fake.parar()
+    return resultados
+
+
+_COLUNAS = (
+    ("cenario", 18), ("pedidos", 8), ("itens", 8), ("segundos", 9), ("pedidos_s", 10), ("itens_s", 10),
+    ("listagem_p50_ms", 9), ("listagem_p99_ms", 9), ("detalhe_p50_ms", 9), ("detalhe_p99_ms", 9),
+    ("round_trips", 11), ("round_trips_pedido", 8), ("erros_429", 9), ("erros", 6),
+)
+
+
+def _cabecalho() -> str:
+    apelidos = {
+        "listagem_p50_ms": "list p50", "listagem_p99_ms": "list p99",
+        "detalhe_p50_ms": "det p50", "detalhe_p99_ms": "det p99",
+        "round_trips_pedido": "rt/ped", "round_trips": "round_trips",
+    }
+    return " ".join(apelidos.get(c, c).rjust(w) for c, w in _COLUNAS)
+
+
+def _linha(r: dict) -> str:
+    return " ".join(("-" if r[c] is None else str(r[c])).rjust(w) for c, w in _COLUNAS)
+
+
+def comparar(resultados: list[dict], base: list[dict], tolerancia: float) -> list[str]:
+    """Cenários cuja vazão caiu (ou cujos round-trips por pedido subiram) além da tolerância."""
+    anteriores = {r["cenario"]: r for r in base}
+    regressoes = []
+    for r in resultados:
+        anterior = anteriores.get(r["cenario"])
+        if not anterior:
+            continue
+        if anterior["pedidos_s"] and r["pedidos_s"] is not None and r["pedidos_s"] < anterior["pedidos_s"] * (1 - tolerancia):
+            regressoes.append(f"{r['cenario']}: {r['pedidos_s']} pedidos/s (antes {anterior['pedidos_s']})")
+        if (
+            anterior["round_trips_pedido"] and r["round_trips_pedido"] is not None
+            and r["round_trips_pedido"] > anterior["round_trips_pedido"] * (1 + tolerancia)
+        ):
+            regressoes.append(
+                f"{r['cenario']}: {r['round_trips_pedido']} round-trips/pedido (antes {anterior['round_trips_pedido']})"
+            )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do sync de pedidos de compra")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), type=lambda v: v.split(","))
+    parser.add_argument("--pedidos", type=int, default=300, help="pedidos servidos pelo fake Bling")
+    parser.add_argument("--pedidos-upsert", type=int, default=300, help="pedidos gravados nos cenários de upsert")
+    parser.add_argument("--itens-por-pedido", type=int, default=5)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--limite-req-s", type=float, default=0, help="acima disso o fake responde 429 (0 = sem limite)")
+    parser.add_argument("--payload-kb", type=int, default=0, help="KB extras (não mapeados) por detalhe")
+    parser.add_argument("--req-s", type=float, default=3, help="BLING_REQ_POR_SEGUNDO do client")
+    parser.add_argument("--fracao-alterada", type=float, default=0.05, help="pedidos alterados antes do incremental")
+    parser.add_argument("--sem-recriar", action="store_true", help="não recria o schema antes de rodar")
+    parser.add_argument("--forcar", action="store_true", help="permite BENCH_PG_HOST fora da lista de hosts locais")
+    parser.add_argument("--salvar", help="grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(_cabecalho(), flush=True)
+    resultados = executar(args)
+
+    if args.salvar:
+        Path(args.salvar).write_text(json.dumps(resultados, indent=2))
+    if args.comparar:
+        regressoes = comparar(resultados, json.loads(Path(args.comparar).read_text()), args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+-- Objetos que existem no Supabase mas não são criados por migrations/ (vendas vêm de outro ETL).
+-- Só as colunas usadas pelas migrations, para o schema do benchmark poder ser montado do zero.
+CREATE TABLE IF NOT EXISTS public.vendas (
+    id bigint PRIMARY KEY,
+    data_venda timestamp
+);
+
+CREATE TABLE IF NOT EXISTS public.vendas_itens (
+    id serial PRIMARY KEY,
+    venda_id bigint NOT NULL REFERENCES public.vendas(id) ON DELETE CASCADE,
+    produto_id bigint,
+    produto_codigo varchar(100),
+    produto_nome varchar(255),
+    quantidade numeric(15,3),
+    valor_total numeric(15,2)
+);
+
+CREATE OR REPLACE VIEW public.vw_vendas_sku_diarias AS
+SELECT
+    v.data_venda::date AS data_venda,
+    vi.produto_codigo AS sku,
+    max(vi.produto_nome) AS produto_nome,
+    SUM(vi.valor_total) AS valor_total_vendas,
+    SUM(vi.quantidade) AS qtd_vendida
+FROM public.vendas_itens vi
+JOIN public.vendas v ON v.id = vi.venda_id
+GROUP BY v.data_venda::date, vi.produto_codigo;
+
+CREATE TABLE IF NOT EXISTS public.produtos_bench (
+    produto_id bigint PRIMARY KEY,
+    categoria varchar(255),
+    modelo varchar(255),
+    cor varchar(255),
+    tecido varchar(255),
+    tamanho varchar(255)
+);
+
+CREATE OR REPLACE VIEW public.vw_estoque_por_produto_v6 AS
+SELECT produto_id, categoria, modelo, cor, tecido, tamanho FROM public.produtos_bench;
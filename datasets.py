@@ -0,0 +1,112 @@
+import pandas as pd
+
+import snapshot_cache
+from db import query_sql, query_view
+from queries import AGRUPAMENTOS, intervalo_datas, opcoes_sku, ranking_vendas, vendas_agrupadas
+
+# Gerações de dados_versao de que cada página depende
+VERSOES = {
+    "vendas": ("vendas",),
+    "vendas_categoria": ("vendas_categoria",),
+    "estoque_vendas_mensal": ("estoque",),
+}
+
+# --- Vendas por categoria: cubo pré-agregado por dia x hierarquia x SKU (migration 008) ---
+
+QUERY_CATEGORIA = """
+SELECT
+    data_venda,
+    produto_id,
+    produto_codigo,
+    produto_nome,
+    quantidade,
+    valor_total,
+    categoria,
+    modelo,
+    cor,
+    tecido,
+    tamanho
+FROM vendas_categoria_diaria
+"""
+
+HIERARQUIA = ["categoria", "modelo", "cor", "tecido", "tamanho"]
+
+# Dimensões como categorias, quantidades reduzidas; valores em R$ ficam em float64
+SCHEMA_CATEGORIA = {
+    "data_venda": "datetime",
+    "produto_id": "Int64",
+    "produto_codigo": "category",
+    "produto_nome": "category",
+    "quantidade": "float32",
+    "valor_total": "float64",
+    **{col: "category" for col in HIERARQUIA},
+}
+
+# --- Estoque x vendas mensal: lê o razão estoque_mensal (migration 011) ---
+
+VIEW_ESTOQUE = "public.vw_estoque_vendas_mensal"
+
+SCHEMA_ESTOQUE = {
+    "sku": "category",
+    "mes": "datetime",
+    "qtd_comprada": "float32",
+    "qtd_vendida": "float32",
+    "estoque_acumulado": "float32",
+}
+
+
+def versao(pagina: str) -> str:
+    return snapshot_cache.versao_dados(*VERSOES[pagina])
+
+
+def vendas_skus(versao: str):
+    return snapshot_cache.carregar("vendas_skus", versao, opcoes_sku)
+
+
+def vendas_intervalo(versao: str) -> tuple:
+    df = snapshot_cache.carregar(
+        "vendas_intervalo", versao, lambda: pd.DataFrame([intervalo_datas()], columns=["data_min", "data_max"])
+    )
+    return df.at[0, "data_min"], df.at[0, "data_max"]
+
+
+def vendas_grafico(versao: str, skus, data_inicio, data_fim, agrupamento: str):
+    return snapshot_cache.carregar(
+        "vendas_agrupadas", versao,
+        lambda: vendas_agrupadas(skus, data_inicio, data_fim, agrupamento),
+        skus=sorted(skus), data_inicio=data_inicio, data_fim=data_fim, agrupamento=agrupamento,
+    )
+
+
+def vendas_ranking(versao: str, skus, data_inicio, data_fim):
+    return snapshot_cache.carregar(
+        "vendas_ranking", versao,
+        lambda: ranking_vendas(skus, data_inicio, data_fim, limite=10),
+        skus=sorted(skus), data_inicio=data_inicio, data_fim=data_fim,
+    )
+
+
+def vendas_categoria(versao: str):
+    return snapshot_cache.carregar(
+        "vendas_categoria", versao, lambda: query_sql(QUERY_CATEGORIA, schema=SCHEMA_CATEGORIA)
+    )
+
+
+def estoque_vendas_mensal(versao: str):
+    return snapshot_cache.carregar(
+        "estoque_vendas_mensal", versao, lambda: query_view(VIEW_ESTOQUE, schema=SCHEMA_ESTOQUE)
+    )
+
+
+def aquecimentos() -> dict:
+    """Por página, os datasets que ela carrega sem filtros (primeira visita), como funções de `versao`."""
+    return {
+        "vendas": [
+            vendas_skus,
+            vendas_intervalo,
+            lambda v: vendas_ranking(v, [], None, None),
+            *(lambda v, a=a: vendas_grafico(v, [], None, None, a) for a in AGRUPAMENTOS),
+        ],
+        "vendas_categoria": [vendas_categoria],
+        "estoque_vendas_mensal": [estoque_vendas_mensal],
+    }
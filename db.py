@@ -1,12 +1,31 @@
 import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
 import pandas as pd
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Conexões mais velhas que isso (s) são fechadas e reabertas
+DB_POOL_MAX_IDADE = float(os.getenv("DB_POOL_MAX_IDADE", "1800"))
+# Conexões ociosas por mais que isso (s) passam por um SELECT 1 antes de serem usadas
+DB_POOL_CHECK_OCIOSA = float(os.getenv("DB_POOL_CHECK_OCIOSA", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Loader tipado: quanto do CSV do COPY fica em memória antes de ir para disco
+COPY_BUFFER_MB = int(os.getenv("COPY_BUFFER_MB", "64"))
+
 
 def get_connection():
+    """Abre uma conexão avulsa, fora do pool."""
     return psycopg2.connect(
         host=os.getenv("SUPA_HOST"),
         port=os.getenv("SUPA_PORT"),
@@ -16,21 +35,229 @@ def get_connection():
     )
 
 
-def query_view(view_name: str) -> pd.DataFrame:
-    """Lê uma view/tabela do Supabase e retorna um DataFrame."""
-    conn = get_connection()
-    try:
-        df = pd.read_sql(f"SELECT * FROM {view_name}", conn)
-    finally:
-        conn.close()
-    return df
+class ConnectionPool:
+    """Pool de conexões thread-safe com health check e reciclagem por idade."""
+
+    def __init__(self, minconn: int, maxconn: int, max_idade: float, check_ociosa: float, timeout: float):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idade = max_idade
+        self.check_ociosa = check_ociosa
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._livres = []  # (conn, criada_em, devolvida_em)
+        self._criada_em = {}  # id(conn) -> criada_em
+        self._tamanho = 0
+        self._stats = {
+            "criadas": 0,
+            "recicladas": 0,
+            "descartadas": 0,
+            "emprestimos": 0,
+            "esperas": 0,
+            "tempo_espera_s": 0.0,
+        }
+
+        for _ in range(minconn):
+            conn = self._abrir()
+            self._livres.append((conn, self._criada_em[id(conn)], time.monotonic()))
+            self._tamanho += 1
+
+    def _abrir(self):
+        conn = get_connection()
+        with self._cond:
+            self._criada_em[id(conn)] = time.monotonic()
+            self._stats["criadas"] += 1
+        return conn
+
+    def _fechar(self, conn):
+        with self._cond:
+            self._criada_em.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _contar(self, stat: str):
+        with self._cond:
+            self._stats[stat] += 1
+
+    def _utilizavel(self, conn, criada_em: float, devolvida_em: float) -> bool:
+        # Roda fora do lock (o SELECT 1 vai ao banco); só os contadores passam por ele
+        agora = time.monotonic()
+        if conn.closed:
+            self._contar("descartadas")
+            return False
+        if self.max_idade and agora - criada_em > self.max_idade:
+            self._contar("recicladas")
+            return False
+        if agora - devolvida_em > self.check_ociosa:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                self._contar("descartadas")
+                return False
+        return True
+
+    def getconn(self):
+        """Empresta uma conexão saudável, abrindo uma nova se houver espaço."""
+        inicio = time.monotonic()
+        esperou = False
+        while True:
+            with self._cond:
+                while not self._livres and self._tamanho >= self.maxconn:
+                    restante = self.timeout - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        raise PoolError("Tempo esgotado aguardando conexão do pool")
+                    esperou = True
+                    self._cond.wait(restante)
+
+                if self._livres:
+                    conn, criada_em, devolvida_em = self._livres.pop()
+                else:
+                    conn = None
+                    self._tamanho += 1
+
+            if conn is None:
+                try:
+                    conn = self._abrir()
+                except Exception:
+                    with self._cond:
+                        self._tamanho -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._utilizavel(conn, criada_em, devolvida_em):
+                self._fechar(conn)
+                with self._cond:
+                    self._tamanho -= 1
+                continue
+
+            with self._cond:
+                self._stats["emprestimos"] += 1
+                if esperou:
+                    self._stats["esperas"] += 1
+                    self._stats["tempo_espera_s"] += time.monotonic() - inicio
+            return conn
+
+    def putconn(self, conn):
+        """Devolve a conexão ao pool; conexões quebradas ou em transação falha são fechadas."""
+        utilizavel = not conn.closed
+        if utilizavel and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                utilizavel = False
+
+        with self._cond:
+            if utilizavel:
+                self._livres.append((conn, self._criada_em.get(id(conn), time.monotonic()), time.monotonic()))
+            else:
+                self._stats["descartadas"] += 1
+                self._tamanho -= 1
+            self._cond.notify()
+        if not utilizavel:
+            self._fechar(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "tamanho": self._tamanho,
+                "livres": len(self._livres),
+                "em_uso": self._tamanho - len(self._livres),
+                **self._stats,
+            }
 
+    def closeall(self):
+        with self._cond:
+            livres, self._livres = self._livres, []
+            self._tamanho -= len(livres)
+        for conn, _, _ in livres:
+            self._fechar(conn)
 
-def query_sql(sql: str) -> pd.DataFrame:
-    """Executa uma query SQL e retorna um DataFrame."""
-    conn = get_connection()
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool do processo, criado sob demanda (e recriado após um fork)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_MAX_IDADE, DB_POOL_CHECK_OCIOSA, DB_POOL_TIMEOUT)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@contextmanager
+def connection():
+    """Empresta uma conexão do pool; faz rollback do que não foi commitado ao devolver."""
+    pool = get_pool()
+    conn = pool.getconn()
     try:
-        df = pd.read_sql(sql, conn)
+        yield conn
     finally:
-        conn.close()
+        pool.putconn(conn)
+
+
+def pool_stats() -> dict:
+    """Estatísticas de uso do pool de conexões do processo."""
+    return get_pool().stats()
+
+
+def _vazio_tipado(schema: dict[str, str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        col: pd.Series(dtype="datetime64[ns]" if tipo == "datetime" else tipo)
+        for col, tipo in schema.items()
+    })
+
+
+def _query_tipada(sql: str, schema: dict[str, str], params=None) -> pd.DataFrame:
+    """Lê o resultado via COPY ... TO STDOUT, aplicando o schema declarado.
+
+    O schema mapeia coluna -> dtype do pandas ("category", "float32", "Int32", ...)
+    ou "datetime". Colunas fora do schema são inferidas normalmente.
+
+    O CSV fica num buffer (em disco acima de COPY_BUFFER_MB) e é lido de uma vez,
+    não em chunks: ler em chunks só para concatenar no fim mantinha todos os chunks
+    e a cópia concatenada em memória ao mesmo tempo. Numa leitura só, o parser já
+    produz as colunas no dtype final e o pico fica perto do tamanho do resultado.
+    """
+    datas = [col for col, tipo in schema.items() if tipo == "datetime"]
+    dtypes = {col: tipo for col, tipo in schema.items() if tipo != "datetime"}
+
+    with tempfile.SpooledTemporaryFile(max_size=COPY_BUFFER_MB * 1024 * 1024, mode="w+b") as buffer:
+        with connection() as conn:
+            cur = conn.cursor()
+            consulta = cur.mogrify(sql, params).decode() if params else sql
+            cur.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+        buffer.seek(0)
+        df = pd.read_csv(buffer, dtype=dtypes, parse_dates=datas)
+
+    if df.empty:
+        return _vazio_tipado(schema)
     return df
+
+
+def query_view(view_name: str, schema: dict[str, str] | None = None) -> pd.DataFrame:
+    """Lê uma view/tabela do Supabase e retorna um DataFrame (tipado, se houver schema)."""
+    if schema:
+        return _query_tipada(f"SELECT * FROM {view_name}", schema)
+    with connection() as conn:
+        return pd.read_sql(f"SELECT * FROM {view_name}", conn)
+
+
+def query_sql(sql: str, params=None, schema: dict[str, str] | None = None) -> pd.DataFrame:
+    """Executa uma query SQL (opcionalmente parametrizada) e retorna um DataFrame.
+
+    Com schema, usa o loader tipado (COPY lido numa passada só, categorias e numéricos reduzidos).
+    """
+    if schema:
+        return _query_tipada(sql, schema, params)
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
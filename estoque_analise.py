@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Meses de vendas usados na velocidade (média móvel até o mês de referência)
+ESTOQUE_JANELA_MESES = int(os.getenv("ESTOQUE_JANELA_MESES", "3"))
+# Cobertura (meses de estoque na velocidade atual) abaixo da qual o SKU entra em alerta
+ESTOQUE_COBERTURA_CRITICA = float(os.getenv("ESTOQUE_COBERTURA_CRITICA", "1"))
+ESTOQUE_COBERTURA_ALERTA = float(os.getenv("ESTOQUE_COBERTURA_ALERTA", "2"))
+# Cobertura que a sugestão de compra tenta atingir
+ESTOQUE_COBERTURA_ALVO = float(os.getenv("ESTOQUE_COBERTURA_ALVO", "3"))
+
+# Do mais para o menos grave; a ordem define a prioridade no ranking
+STATUS = ("ruptura", "critico", "alerta", "ok", "sem_giro")
+
+COLUNAS = [
+    "sku", "status", "estoque_atual", "velocidade", "cobertura_meses", "ruptura_prevista",
+    "ruptura_atual", "maior_ruptura", "meses_sem_estoque", "sugestao_compra",
+]
+
+
+def _indice_mes(datas: np.ndarray) -> np.ndarray:
+    """Meses como inteiros consecutivos (ano * 12 + mês), para aritmética de calendário."""
+    return datas.astype("datetime64[M]").astype(np.int64)
+
+
+def _vazio() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=object) for c in COLUNAS})
+
+
+def analisar_estoque(df: pd.DataFrame, janela: int = ESTOQUE_JANELA_MESES, referencia=None) -> pd.DataFrame:
+    """Indicadores de estoque por SKU, calculados de uma vez sobre todo o catálogo.
+
+    `df` tem o formato de vw_estoque_vendas_mensal (sku, mes, qtd_comprada,
+    qtd_vendida, estoque_acumulado), com uma linha por SKU e mês com movimento:
+    meses ausentes não têm compra nem venda e mantêm o estoque do mês anterior.
+    `referencia` é o mês "atual" da análise (padrão: o último mês de `df`).
+
+    Retorna uma linha por SKU com:
+      - estoque_atual: estoque acumulado no último mês até a referência
+      - velocidade: média de vendas por mês nos `janela` meses até a referência
+      - cobertura_meses: estoque_atual / velocidade (inf sem giro, 0 em ruptura)
+      - ruptura_prevista: primeiro mês em que o estoque zera mantida a velocidade
+      - ruptura_atual / maior_ruptura / meses_sem_estoque: sequências de meses com
+        estoque <= 0 (a atual, a mais longa e o total), em meses de calendário
+      - sugestao_compra: quantidade para chegar a ESTOQUE_COBERTURA_ALVO meses
+      - status: um de STATUS
+
+    Tudo é feito com arrays NumPy ordenados por (SKU, mês) e reduções por grupo,
+    sem laço por SKU.
+    """
+    if df.empty:
+        return _vazio()
+
+    meses = _indice_mes(df["mes"].to_numpy(dtype="datetime64[ns]"))
+    ref = _indice_mes(np.datetime64(pd.Timestamp(referencia), "ns")) if referencia is not None else meses.max()
+    ate_ref = meses <= ref
+    if not ate_ref.all():
+        df, meses = df[ate_ref], meses[ate_ref]
+        if df.empty:
+            return _vazio()
+
+    codigos, skus = pd.factorize(df["sku"], sort=False)
+    # Linhas sem SKU (código -1) ficam de fora
+    ordem = np.lexsort((meses, codigos))
+    ordem = ordem[codigos[ordem] >= 0]
+    if not len(ordem):
+        return _vazio()
+    codigos = codigos[ordem]
+    meses = meses[ordem]
+    vendido = df["qtd_vendida"].to_numpy(dtype=np.float64)[ordem]
+    estoque = df["estoque_acumulado"].to_numpy(dtype=np.float64)[ordem]
+    n_skus = len(skus)
+    n = len(codigos)
+
+    # Última linha de cada SKU (o estoque dela vale até a referência)
+    ultima = np.flatnonzero(np.append(codigos[1:] != codigos[:-1], True))
+    estoque_atual = estoque[ultima]
+
+    # Velocidade: vendas nos meses (ref - janela, ref], meses sem linha contam como zero
+    na_janela = meses > ref - janela
+    velocidade = np.bincount(codigos[na_janela], weights=vendido[na_janela], minlength=n_skus) / janela
+
+    # Sequências sem estoque: cada uma vai do mês da primeira linha <= 0 até o mês
+    # anterior à próxima linha do SKU (ou até a referência, se for a última)
+    sem_estoque = estoque <= 0
+    novo_sku = np.empty(n, dtype=bool)
+    novo_sku[0] = True
+    novo_sku[1:] = codigos[1:] != codigos[:-1]
+    inicio_seq = sem_estoque & (novo_sku | ~np.roll(sem_estoque, 1))
+    fim_sku = np.append(novo_sku[1:], True)
+    fim_seq = sem_estoque & (fim_sku | ~np.roll(sem_estoque, -1))
+    inicios = np.flatnonzero(inicio_seq)
+    fins = np.flatnonzero(fim_seq)
+    mes_saida = np.where(fim_sku[fins], ref + 1, meses[np.minimum(fins + 1, n - 1)])
+    duracao = mes_saida - meses[inicios]
+    codigo_seq = codigos[inicios]
+
+    maior_ruptura = np.zeros(n_skus, dtype=np.int64)
+    np.maximum.at(maior_ruptura, codigo_seq, duracao)
+    meses_sem_estoque = np.bincount(codigo_seq, weights=duracao, minlength=n_skus).astype(np.int64)
+    ruptura_atual = np.zeros(n_skus, dtype=np.int64)
+    em_curso = fim_sku[fins]
+    ruptura_atual[codigo_seq[em_curso]] = duracao[em_curso]
+
+    # Cobertura e primeira ruptura projetada (consumo linear na velocidade atual)
+    com_estoque = estoque_atual > 0
+    com_giro = velocidade > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cobertura = np.where(com_estoque, np.where(com_giro, estoque_atual / velocidade, np.inf), 0.0)
+    meses_ate_ruptura = np.where(com_estoque & com_giro, np.ceil(np.where(com_giro, cobertura, 0)), 0)
+    projetavel = com_giro | ~com_estoque
+    ruptura_prevista = np.full(n_skus, np.datetime64("NaT"), dtype="datetime64[M]")
+    ruptura_prevista[projetavel] = (ref + meses_ate_ruptura[projetavel]).astype("datetime64[M]")
+
+    sugestao = np.maximum(0.0, velocidade * ESTOQUE_COBERTURA_ALVO - np.maximum(estoque_atual, 0))
+
+    status = np.select(
+        [~com_estoque, ~com_giro, cobertura < ESTOQUE_COBERTURA_CRITICA, cobertura < ESTOQUE_COBERTURA_ALERTA],
+        ["ruptura", "sem_giro", "critico", "alerta"],
+        default="ok",
+    )
+
+    return pd.DataFrame({
+        "sku": np.asarray(skus),
+        "status": pd.Categorical(status, categories=STATUS, ordered=True),
+        "estoque_atual": estoque_atual,
+        "velocidade": velocidade,
+        "cobertura_meses": cobertura,
+        "ruptura_prevista": ruptura_prevista.astype("datetime64[ns]"),
+        "ruptura_atual": ruptura_atual,
+        "maior_ruptura": maior_ruptura,
+        "meses_sem_estoque": meses_sem_estoque,
+        "sugestao_compra": sugestao,
+    })
+
+
+def ranking_alertas(analise: pd.DataFrame) -> pd.DataFrame:
+    """SKUs em ruptura, crítico ou alerta, do mais para o menos urgente.
+
+    Ruptura ordena pela sequência atual (mais longa primeiro); os demais pela
+    cobertura (menor primeiro). Empates favorecem o SKU que mais vende.
+    """
+    alertas = analise[analise["status"].isin(["ruptura", "critico", "alerta"])]
+    if alertas.empty:
+        return alertas.reset_index(drop=True).assign(prioridade=0)[["prioridade", *analise.columns]]
+    urgencia = np.where(alertas["status"] == "ruptura", -alertas["ruptura_atual"], alertas["cobertura_meses"])
+    ordem = np.lexsort((-alertas["velocidade"].to_numpy(), urgencia, alertas["status"].cat.codes.to_numpy()))
+    ranking = alertas.iloc[ordem].reset_index(drop=True)
+    ranking.insert(0, "prioridade", np.arange(1, len(ranking) + 1))
+    return ranking
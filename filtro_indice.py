@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+class IndiceFiltro:
+    """Índice invertido para filtros (em cascata ou não) sobre um DataFrame que não muda.
+
+    Para cada dimensão guarda o código de cada linha e, por valor, a lista ordenada
+    das posições das linhas com aquele valor. Para a coluna de data guarda a ordem
+    das linhas por data, o que permite recortar intervalos com busca binária. As
+    seleções viram operações de conjunto sobre arrays de posições, sem varrer nem
+    copiar o DataFrame a cada widget.
+
+    Linhas são representadas por um array ordenado de posições, ou None (= todas).
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensoes: list[str], coluna_data: str | None = None):
+        self.n = len(df)
+        self._codigos = {}
+        self._valores = {}
+        self._ordem = {}
+        self._limites = {}
+
+        for dim in dimensoes:
+            codigos, valores = pd.factorize(df[dim])
+            # Reordena os códigos pela ordem dos valores (categorias podem vir fora de ordem)
+            valores = np.asarray(valores, dtype=object)
+            ordem_valores = np.argsort(valores, kind="stable")
+            if len(valores):
+                novo_codigo = np.empty(len(valores), dtype=np.intp)
+                novo_codigo[ordem_valores] = np.arange(len(valores))
+                codigos = np.where(codigos >= 0, novo_codigo[codigos], -1)
+            valores = valores[ordem_valores]
+
+            ordem = np.argsort(codigos, kind="stable")
+            self._codigos[dim] = codigos
+            self._valores[dim] = valores
+            self._ordem[dim] = ordem
+            # Posições do código c: ordem[limites[c]:limites[c + 1]] (NaN = -1 fica antes)
+            self._limites[dim] = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+
+        self._datas = None
+        if coluna_data:
+            datas = df[coluna_data].to_numpy(dtype="datetime64[ns]")
+            self._ordem_datas = np.argsort(datas, kind="stable")
+            self._datas = datas[self._ordem_datas]
+
+    def _posicoes(self, dim: str, valor) -> np.ndarray:
+        codigo = np.searchsorted(self._valores[dim], valor)
+        if codigo >= len(self._valores[dim]) or self._valores[dim][codigo] != valor:
+            return np.empty(0, dtype=np.intp)
+        limites = self._limites[dim]
+        return self._ordem[dim][limites[codigo]:limites[codigo + 1]]
+
+    @staticmethod
+    def _intersecao(linhas: np.ndarray | None, outras: np.ndarray) -> np.ndarray:
+        if linhas is None:
+            return outras
+        return np.intersect1d(linhas, outras, assume_unique=True)
+
+    def intervalo(self, inicio=None, fim=None, linhas: np.ndarray | None = None) -> np.ndarray | None:
+        """Restringe as linhas ao intervalo de datas [inicio, fim] (extremos opcionais)."""
+        if self._datas is None or (inicio is None and fim is None):
+            return linhas
+        lo = 0 if inicio is None else np.searchsorted(self._datas, np.datetime64(pd.Timestamp(inicio)), "left")
+        hi = len(self._datas) if fim is None else np.searchsorted(self._datas, np.datetime64(pd.Timestamp(fim)), "right")
+        return self._intersecao(linhas, np.sort(self._ordem_datas[lo:hi]))
+
+    def restringir(self, dim: str, valores, linhas: np.ndarray | None = None) -> np.ndarray | None:
+        """Restringe as linhas às que têm algum dos valores na dimensão (vazio = sem filtro)."""
+        if not len(valores):
+            return linhas
+        # Cada linha tem um único valor por dimensão, então as listas são disjuntas
+        uniao = np.sort(np.concatenate([self._posicoes(dim, v) for v in valores]))
+        return self._intersecao(linhas, uniao)
+
+    def selecionar(self, selecoes: dict, inicio=None, fim=None) -> np.ndarray | None:
+        """Linhas que atendem ao intervalo de datas e a todas as seleções por dimensão."""
+        linhas = self.intervalo(inicio, fim)
+        for dim, valores in selecoes.items():
+            linhas = self.restringir(dim, valores, linhas)
+        return linhas
+
+    def opcoes(self, dim: str, linhas: np.ndarray | None = None) -> list:
+        """Valores da dimensão presentes nas linhas informadas, em ordem."""
+        if linhas is None:
+            return self._valores[dim].tolist()
+        codigos = np.unique(self._codigos[dim][linhas])
+        return self._valores[dim][codigos[codigos >= 0]].tolist()
+
+    @staticmethod
+    def aplicar(df: pd.DataFrame, linhas: np.ndarray | None) -> pd.DataFrame:
+        """Materializa as linhas selecionadas do DataFrame indexado."""
+        return df if linhas is None else df.iloc[linhas]
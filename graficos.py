@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Pontos por série depois do downsampling (~ largura do gráfico em pixels)
+GRAFICO_PONTOS_SERIE = int(os.getenv("GRAFICO_PONTOS_SERIE", "800"))
+# Acima desse total de pontos as séries são desenhadas em WebGL (Scattergl)
+GRAFICO_LIMITE_WEBGL = int(os.getenv("GRAFICO_LIMITE_WEBGL", "5000"))
+# Séries desenhadas individualmente; as demais são somadas em "Outros"
+GRAFICO_MAX_SERIES = int(os.getenv("GRAFICO_MAX_SERIES", "10"))
+
+ROTULO_OUTROS = "Outros"
+COR_OUTROS = "#9e9e9e"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, pontos: int) -> np.ndarray:
+    """Índices dos pontos escolhidos pelo Largest-Triangle-Three-Buckets.
+
+    Mantém o primeiro e o último ponto e, de cada um dos `pontos - 2` baldes
+    intermediários, o ponto que forma o maior triângulo com o ponto escolhido no
+    balde anterior e a média do próximo: picos e vales sobrevivem à redução.
+    `x` precisa estar ordenado.
+    """
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bordas em aritmética inteira: com linspace, uma borda exata (16.0) pode sair
+    # 15.999... e o truncamento a joga no balde anterior
+    bordas = np.arange(pontos - 1, dtype=np.int64) * (n - 2) // (pontos - 2) + 1
+    escolhidos = np.empty(pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+
+    a = 0
+    for i in range(pontos - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        if i + 2 < len(bordas):
+            prox = slice(bordas[i + 1], bordas[i + 2])
+            cx, cy = x[prox].mean(), y[prox].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[inicio:fim] - y[a]) - (x[a] - x[inicio:fim]) * (cy - y[a]))
+        a = inicio + int(np.argmax(area))
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def _limitar_series(df: pd.DataFrame, x: str, y: str, cor: str, aditivas: list[str], max_series: int):
+    """Mantém as `max_series` séries de maior total em `y` e soma o resto numa série "Outros"."""
+    totais = df.groupby(cor, observed=True)[y].sum().sort_values(ascending=False)
+    if len(totais) <= max_series:
+        return df, list(totais.index)
+
+    principais = list(totais.index[:max_series])
+    selecao = df[cor].isin(principais)
+    outros = df[~selecao].groupby(x, as_index=False)[[y, *aditivas]].sum()
+    outros[cor] = ROTULO_OUTROS
+    df = pd.concat([df[selecao].astype({cor: object}), outros], ignore_index=True)
+    return df, [*principais, ROTULO_OUTROS]
+
+
+def grafico_linhas(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    cor: str,
+    custom_data: list[str] | None = None,
+    labels: dict[str, str] | None = None,
+    hovertemplate: str | None = None,
+    max_series: int = GRAFICO_MAX_SERIES,
+    pontos: int = GRAFICO_PONTOS_SERIE,
+) -> go.Figure:
+    """Gráfico de linhas (uma por valor de `cor`) com tamanho limitado.
+
+    Equivalente ao `px.line(df, x, y, color=cor, custom_data=...)`, mas só as
+    `max_series` maiores séries são desenhadas (o resto vira "Outros", somando
+    `y` e `custom_data`), cada série é reduzida a `pontos` pontos por LTTB e,
+    se o total ainda passar de GRAFICO_LIMITE_WEBGL, as linhas vão para WebGL.
+    """
+    custom_data = custom_data or []
+    labels = labels or {}
+    df, series = _limitar_series(df, x, y, cor, custom_data, max_series)
+
+    tracos = []
+    for nome, serie in df.groupby(cor, observed=True, sort=False):
+        serie = serie.sort_values(x)
+        eixo_x = serie[x].to_numpy()
+        if np.issubdtype(eixo_x.dtype, np.datetime64):
+            eixo_x = eixo_x.astype("datetime64[ns]").astype(np.int64)
+        indices = lttb(eixo_x, serie[y].to_numpy(), pontos)
+        tracos.append((nome, serie.iloc[indices]))
+
+    total_pontos = sum(len(s) for _, s in tracos)
+    Traco = go.Scattergl if total_pontos > GRAFICO_LIMITE_WEBGL else go.Scatter
+    ordem = {nome: i for i, nome in enumerate(series)}
+    paleta = px.colors.qualitative.Plotly
+
+    fig = go.Figure()
+    for nome, serie in sorted(tracos, key=lambda t: ordem[t[0]]):
+        cor_linha = COR_OUTROS if nome == ROTULO_OUTROS else paleta[ordem[nome] % len(paleta)]
+        fig.add_trace(Traco(
+            x=serie[x],
+            y=serie[y],
+            name=str(nome),
+            mode="lines",
+            line=dict(color=cor_linha),
+            customdata=serie[custom_data].to_numpy() if custom_data else None,
+            hovertemplate=hovertemplate,
+        ))
+    fig.update_layout(
+        hovermode="x unified",
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        legend_title_text=labels.get(cor, cor),
+    )
+    return fig
@@ -0,0 +1,9 @@
+-- Cursor da sincronização incremental (high-water mark por entidade)
+CREATE TABLE IF NOT EXISTS public.sync_cursor (
+    entidade varchar(50) PRIMARY KEY,
+    ultima_data date,
+    atualizado_em timestamp DEFAULT now()
+);
+
+-- Usado para reconsultar pedidos que ainda podem mudar de situação
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_situacao ON public.pedidos_compra(situacao_valor);
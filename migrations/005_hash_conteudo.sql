@@ -0,0 +1,9 @@
+-- Detecção de mudanças: hash do conteúdo mapeado de cada pedido e de cada item
+ALTER TABLE public.pedidos_compra ADD COLUMN IF NOT EXISTS hash_conteudo varchar(64);
+
+ALTER TABLE public.pedidos_compra_itens ADD COLUMN IF NOT EXISTS chave_item varchar(150);
+ALTER TABLE public.pedidos_compra_itens ADD COLUMN IF NOT EXISTS hash_item varchar(64);
+
+-- Itens gravados antes desta migration ficam com chave NULL e são substituídos no próximo sync
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pedidos_compra_itens_chave
+    ON public.pedidos_compra_itens(pedido_compra_id, chave_item);
@@ -0,0 +1,234 @@
+-- Fato diário de vendas por SKU, mantido incrementalmente a partir de vw_vendas_sku_diarias
+CREATE TABLE IF NOT EXISTS public.fato_vendas_sku_diarias (
+    data_venda date NOT NULL,
+    sku varchar(100) NOT NULL,
+    produto_nome varchar(255),
+    valor_total_vendas numeric(15,2) NOT NULL DEFAULT 0,
+    qtd_vendida numeric(15,3) NOT NULL DEFAULT 0,
+    atualizado_em timestamp DEFAULT now(),
+    PRIMARY KEY (data_venda, sku)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fato_vendas_sku_diarias_sku ON public.fato_vendas_sku_diarias(sku, data_venda);
+
+-- Fila de dias/SKUs alterados desde o último refresh (sku NULL = dia inteiro)
+CREATE TABLE IF NOT EXISTS public.fato_vendas_pendentes (
+    data_venda date NOT NULL,
+    sku varchar(100),
+    marcado_em timestamp DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_fato_vendas_pendentes_data ON public.fato_vendas_pendentes(data_venda);
+
+-- Carga inicial
+INSERT INTO public.fato_vendas_sku_diarias (data_venda, sku, produto_nome, valor_total_vendas, qtd_vendida)
+SELECT
+    data_venda::date,
+    sku,
+    max(produto_nome),
+    COALESCE(SUM(valor_total_vendas), 0),
+    COALESCE(SUM(qtd_vendida), 0)
+FROM public.vw_vendas_sku_diarias
+WHERE data_venda IS NOT NULL AND sku IS NOT NULL
+GROUP BY data_venda::date, sku
+ON CONFLICT (data_venda, sku) DO NOTHING;
+
+-- Marca os dias/SKUs tocados por mudanças em vendas_itens
+CREATE OR REPLACE FUNCTION public.fn_fato_vendas_marcar_itens() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.fato_vendas_pendentes (data_venda, sku)
+        SELECT DISTINCT v.data_venda::date, n.produto_codigo
+        FROM novos n
+        JOIN public.vendas v ON v.id = n.venda_id
+        WHERE v.data_venda IS NOT NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.fato_vendas_pendentes (data_venda, sku)
+        SELECT DISTINCT v.data_venda::date, o.produto_codigo
+        FROM antigos o
+        JOIN public.vendas v ON v.id = o.venda_id
+        WHERE v.data_venda IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Mudanças no cabeçalho da venda (data, cancelamento, exclusão) remarcam o dia inteiro
+CREATE OR REPLACE FUNCTION public.fn_fato_vendas_marcar_vendas() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO public.fato_vendas_pendentes (data_venda, sku)
+        SELECT DISTINCT d, NULL::varchar
+        FROM (
+            SELECT n.data_venda::date AS d FROM novos n
+            UNION
+            SELECT o.data_venda::date FROM antigos o
+        ) dias
+        WHERE d IS NOT NULL;
+    ELSE
+        INSERT INTO public.fato_vendas_pendentes (data_venda, sku)
+        SELECT DISTINCT o.data_venda::date, NULL::varchar
+        FROM antigos o
+        WHERE o.data_venda IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_fato_vendas_itens_ins ON public.vendas_itens;
+CREATE TRIGGER trg_fato_vendas_itens_ins AFTER INSERT ON public.vendas_itens
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_fato_vendas_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_fato_vendas_itens_upd ON public.vendas_itens;
+CREATE TRIGGER trg_fato_vendas_itens_upd AFTER UPDATE ON public.vendas_itens
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_fato_vendas_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_fato_vendas_itens_del ON public.vendas_itens;
+CREATE TRIGGER trg_fato_vendas_itens_del AFTER DELETE ON public.vendas_itens
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_fato_vendas_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_fato_vendas_vendas_upd ON public.vendas;
+CREATE TRIGGER trg_fato_vendas_vendas_upd AFTER UPDATE ON public.vendas
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_fato_vendas_marcar_vendas();
+
+DROP TRIGGER IF EXISTS trg_fato_vendas_vendas_del ON public.vendas;
+CREATE TRIGGER trg_fato_vendas_vendas_del AFTER DELETE ON public.vendas
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_fato_vendas_marcar_vendas();
+
+-- Recalcula só os dias/SKUs pendentes. Retorna quantos pares (dia, SKU) foram processados.
+-- Pode ser agendado no banco, ex.: SELECT cron.schedule('fato-vendas', '*/5 * * * *', 'SELECT public.refresh_fato_vendas_sku_diarias()');
+CREATE OR REPLACE FUNCTION public.refresh_fato_vendas_sku_diarias() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    processados integer;
+BEGIN
+    DROP TABLE IF EXISTS pg_temp._fato_pendentes;
+    CREATE TEMP TABLE _fato_pendentes (data_venda date, sku varchar(100)) ON COMMIT DROP;
+
+    WITH removidos AS (
+        DELETE FROM public.fato_vendas_pendentes RETURNING data_venda, sku
+    )
+    INSERT INTO _fato_pendentes
+    SELECT DISTINCT data_venda, sku FROM removidos;
+
+    GET DIAGNOSTICS processados = ROW_COUNT;
+    IF processados = 0 THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM public.fato_vendas_sku_diarias f
+    USING _fato_pendentes p
+    WHERE f.data_venda = p.data_venda AND (p.sku IS NULL OR f.sku = p.sku);
+
+    INSERT INTO public.fato_vendas_sku_diarias (data_venda, sku, produto_nome, valor_total_vendas, qtd_vendida)
+    SELECT
+        v.data_venda::date,
+        v.sku,
+        max(v.produto_nome),
+        COALESCE(SUM(v.valor_total_vendas), 0),
+        COALESCE(SUM(v.qtd_vendida), 0)
+    FROM public.vw_vendas_sku_diarias v
+    WHERE v.data_venda::date IN (SELECT DISTINCT data_venda FROM _fato_pendentes)
+      AND v.sku IS NOT NULL
+      AND EXISTS (
+          SELECT 1 FROM _fato_pendentes p
+          WHERE p.data_venda = v.data_venda::date AND (p.sku IS NULL OR p.sku = v.sku)
+      )
+    GROUP BY v.data_venda::date, v.sku
+    ON CONFLICT (data_venda, sku) DO UPDATE SET
+        produto_nome = EXCLUDED.produto_nome,
+        valor_total_vendas = EXCLUDED.valor_total_vendas,
+        qtd_vendida = EXCLUDED.qtd_vendida,
+        atualizado_em = now();
+
+    INSERT INTO public.sync_cursor (entidade, ultima_data, atualizado_em)
+    VALUES ('fato_vendas_sku_diarias', (SELECT max(data_venda) FROM _fato_pendentes), now())
+    ON CONFLICT (entidade) DO UPDATE SET atualizado_em = EXCLUDED.atualizado_em;
+
+    RETURN processados;
+END;
+$$;
+
+-- Views mensais passam a ler do fato pré-agregado (DROP porque os tipos das colunas podem mudar)
+DROP VIEW IF EXISTS public.vw_compras_vendas_mensal;
+CREATE VIEW public.vw_compras_vendas_mensal AS
+WITH compras_mensal AS (
+    SELECT
+        i.produto_codigo AS sku,
+        date_trunc('month', pc.data_pedido)::date AS mes,
+        SUM(i.quantidade) AS qtd_comprada,
+        SUM(i.quantidade * i.valor_unitario) AS valor_compras
+    FROM pedidos_compra_itens i
+    JOIN pedidos_compra pc ON pc.id = i.pedido_compra_id
+    WHERE pc.data_pedido IS NOT NULL
+    GROUP BY i.produto_codigo, date_trunc('month', pc.data_pedido)
+),
+vendas_mensal AS (
+    SELECT
+        sku,
+        date_trunc('month', data_venda)::date AS mes,
+        SUM(qtd_vendida) AS qtd_vendida,
+        SUM(valor_total_vendas) AS valor_vendas
+    FROM fato_vendas_sku_diarias
+    GROUP BY sku, date_trunc('month', data_venda)
+)
+SELECT
+    COALESCE(c.sku, v.sku) AS sku,
+    COALESCE(c.mes, v.mes) AS mes,
+    COALESCE(v.qtd_vendida, 0) AS qtd_vendida,
+    COALESCE(v.valor_vendas, 0) AS valor_vendas,
+    COALESCE(c.qtd_comprada, 0) AS qtd_comprada,
+    COALESCE(c.valor_compras, 0) AS valor_compras,
+    COALESCE(c.qtd_comprada, 0) - COALESCE(v.qtd_vendida, 0) AS saldo_mensal
+FROM compras_mensal c
+FULL OUTER JOIN vendas_mensal v ON c.sku = v.sku AND c.mes = v.mes
+ORDER BY COALESCE(c.sku, v.sku), COALESCE(c.mes, v.mes);
+
+DROP VIEW IF EXISTS public.vw_estoque_vendas_mensal;
+CREATE VIEW public.vw_estoque_vendas_mensal AS
+WITH compras_mensal AS (
+    SELECT
+        i.produto_codigo AS sku,
+        date_trunc('month', pc.data_pedido)::date AS mes,
+        SUM(i.quantidade) AS qtd_comprada
+    FROM pedidos_compra_itens i
+    JOIN pedidos_compra pc ON pc.id = i.pedido_compra_id
+    WHERE pc.data_pedido IS NOT NULL
+    GROUP BY i.produto_codigo, date_trunc('month', pc.data_pedido)
+),
+vendas_mensal AS (
+    SELECT
+        sku,
+        date_trunc('month', data_venda)::date AS mes,
+        SUM(qtd_vendida) AS qtd_vendida
+    FROM fato_vendas_sku_diarias
+    GROUP BY sku, date_trunc('month', data_venda)
+),
+combinado AS (
+    SELECT
+        COALESCE(c.sku, v.sku) AS sku,
+        COALESCE(c.mes, v.mes) AS mes,
+        COALESCE(c.qtd_comprada, 0) AS qtd_comprada,
+        COALESCE(v.qtd_vendida, 0) AS qtd_vendida
+    FROM compras_mensal c
+    FULL OUTER JOIN vendas_mensal v ON c.sku = v.sku AND c.mes = v.mes
+)
+SELECT
+    sku,
+    mes,
+    qtd_comprada,
+    qtd_vendida,
+    SUM(qtd_comprada - qtd_vendida) OVER (
+        PARTITION BY sku ORDER BY mes
+        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS estoque_acumulado
+FROM combinado
+ORDER BY sku, mes;
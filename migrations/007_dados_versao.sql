@@ -0,0 +1,68 @@
+-- Geração dos dados por dataset, usada para invalidar os snapshots do dashboard
+CREATE TABLE IF NOT EXISTS public.dados_versao (
+    dataset varchar(50) PRIMARY KEY,
+    geracao bigint NOT NULL DEFAULT 0,
+    atualizado_em timestamp DEFAULT now()
+);
+
+INSERT INTO public.dados_versao (dataset) VALUES ('vendas'), ('compras')
+ON CONFLICT (dataset) DO NOTHING;
+
+-- Incrementa a geração do dataset (TG_ARGV[0]) quando o comando alterou alguma linha
+CREATE OR REPLACE FUNCTION public.fn_dados_versao_incrementar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM antigos) THEN
+            RETURN NULL;
+        END IF;
+    ELSE
+        IF NOT EXISTS (SELECT 1 FROM novos) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    INSERT INTO public.dados_versao (dataset, geracao, atualizado_em)
+    VALUES (TG_ARGV[0], 1, now())
+    ON CONFLICT (dataset) DO UPDATE SET
+        geracao = public.dados_versao.geracao + 1,
+        atualizado_em = EXCLUDED.atualizado_em;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    alvo record;
+BEGIN
+    FOR alvo IN
+        SELECT * FROM (VALUES
+            ('fato_vendas_sku_diarias', 'vendas'),
+            ('pedidos_compra', 'compras'),
+            ('pedidos_compra_itens', 'compras')
+        ) AS t(tabela, dataset)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_dados_versao_ins ON public.%I', alvo.tabela);
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_ins AFTER INSERT ON public.%I
+             REFERENCING NEW TABLE AS novos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_dados_versao_upd ON public.%I', alvo.tabela);
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_upd AFTER UPDATE ON public.%I
+             REFERENCING NEW TABLE AS novos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_dados_versao_del ON public.%I', alvo.tabela);
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_del AFTER DELETE ON public.%I
+             REFERENCING OLD TABLE AS antigos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,111 @@
+-- Cubo diário de vendas por hierarquia de produto (categoria > modelo > cor > tecido > tamanho > SKU)
+CREATE TABLE IF NOT EXISTS public.vendas_categoria_diaria (
+    data_venda date NOT NULL,
+    categoria varchar(255) NOT NULL,
+    modelo varchar(255) NOT NULL,
+    cor varchar(255) NOT NULL,
+    tecido varchar(255) NOT NULL,
+    tamanho varchar(255) NOT NULL,
+    produto_id bigint,
+    produto_codigo varchar(100),
+    produto_nome varchar(255),
+    quantidade numeric(15,3) NOT NULL DEFAULT 0,
+    valor_total numeric(15,2) NOT NULL DEFAULT 0,
+    atualizado_em timestamp DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_vendas_categoria_diaria_data ON public.vendas_categoria_diaria(data_venda);
+CREATE INDEX IF NOT EXISTS idx_vendas_categoria_diaria_hierarquia
+    ON public.vendas_categoria_diaria(categoria, modelo, cor, tecido, tamanho);
+
+-- Dias alterados desde o último refresh do cubo
+CREATE TABLE IF NOT EXISTS public.vendas_categoria_pendentes (
+    data_venda date NOT NULL,
+    marcado_em timestamp DEFAULT now()
+);
+
+-- Reaproveita a captura de mudanças do fato diário (006): todo dia marcado lá é marcado aqui
+CREATE OR REPLACE FUNCTION public.fn_vendas_categoria_marcar() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO public.vendas_categoria_pendentes (data_venda)
+    SELECT DISTINCT data_venda FROM novos;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_vendas_categoria_marcar ON public.fato_vendas_pendentes;
+CREATE TRIGGER trg_vendas_categoria_marcar AFTER INSERT ON public.fato_vendas_pendentes
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_vendas_categoria_marcar();
+
+-- Recalcula os dias pendentes (ou tudo, com completo = true, ex.: após mudar atributos dos produtos).
+-- Retorna quantos dias foram recalculados.
+CREATE OR REPLACE FUNCTION public.refresh_vendas_categoria_diaria(completo boolean DEFAULT false) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    dias date[];
+BEGIN
+    IF completo THEN
+        DELETE FROM public.vendas_categoria_pendentes;
+        SELECT array_agg(DISTINCT v.data_venda::date) INTO dias
+        FROM public.vendas v WHERE v.data_venda IS NOT NULL;
+        TRUNCATE public.vendas_categoria_diaria;
+    ELSE
+        WITH removidos AS (
+            DELETE FROM public.vendas_categoria_pendentes RETURNING data_venda
+        )
+        SELECT array_agg(DISTINCT data_venda) INTO dias FROM removidos;
+
+        IF dias IS NULL THEN
+            RETURN 0;
+        END IF;
+
+        DELETE FROM public.vendas_categoria_diaria WHERE data_venda = ANY(dias);
+    END IF;
+
+    IF dias IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO public.vendas_categoria_diaria
+        (data_venda, categoria, modelo, cor, tecido, tamanho,
+         produto_id, produto_codigo, produto_nome, quantidade, valor_total)
+    SELECT
+        v.data_venda::date,
+        COALESCE(vw.categoria, 'Sem categoria'),
+        COALESCE(vw.modelo, 'Sem modelo'),
+        COALESCE(vw.cor, 'Sem cor'),
+        COALESCE(vw.tecido, 'Sem tecido'),
+        COALESCE(vw.tamanho, 'Sem tamanho'),
+        vi.produto_id,
+        vi.produto_codigo,
+        max(vi.produto_nome),
+        COALESCE(SUM(vi.quantidade), 0),
+        COALESCE(SUM(vi.valor_total), 0)
+    FROM public.vendas_itens vi
+    JOIN public.vendas v ON v.id = vi.venda_id
+    LEFT JOIN public.vw_estoque_por_produto_v6 vw ON vw.produto_id = vi.produto_id
+    WHERE v.data_venda::date = ANY(dias)
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8;
+
+    RETURN array_length(dias, 1);
+END;
+$$;
+
+-- Geração própria para invalidar os snapshots da página de categorias (ver 007)
+INSERT INTO public.dados_versao (dataset) VALUES ('vendas_categoria')
+ON CONFLICT (dataset) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_dados_versao_ins ON public.vendas_categoria_diaria;
+CREATE TRIGGER trg_dados_versao_ins AFTER INSERT ON public.vendas_categoria_diaria
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar('vendas_categoria');
+
+DROP TRIGGER IF EXISTS trg_dados_versao_del ON public.vendas_categoria_diaria;
+CREATE TRIGGER trg_dados_versao_del AFTER DELETE ON public.vendas_categoria_diaria
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar('vendas_categoria');
+
+-- Carga inicial
+SELECT public.refresh_vendas_categoria_diaria(true);
@@ -0,0 +1,19 @@
+-- Jobs de sincronização em segundo plano, com checkpoint para retomar após interrupção
+CREATE TABLE IF NOT EXISTS public.sync_jobs (
+    id uuid PRIMARY KEY,
+    entidade varchar(50) NOT NULL,
+    status varchar(20) NOT NULL DEFAULT 'executando',  -- executando, concluido, erro
+    parametros jsonb NOT NULL DEFAULT '{}',
+    checkpoint jsonb,
+    progresso jsonb,
+    erro text,
+    iniciado_em timestamp DEFAULT now(),
+    atualizado_em timestamp DEFAULT now(),
+    concluido_em timestamp
+);
+
+-- No máximo um job em execução por entidade
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_jobs_executando
+    ON public.sync_jobs(entidade) WHERE status = 'executando';
+
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_entidade ON public.sync_jobs(entidade, iniciado_em DESC);
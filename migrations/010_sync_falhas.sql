@@ -0,0 +1,11 @@
+-- Fila de falhas (dead-letter): registros que não foram buscados/gravados depois de todas as tentativas.
+-- O próximo sync busca só esses ids de novo e os remove da fila quando dão certo.
+CREATE TABLE IF NOT EXISTS public.sync_falhas (
+    entidade varchar(50) NOT NULL,
+    registro_id bigint NOT NULL,
+    erro text,
+    tentativas integer NOT NULL DEFAULT 1,
+    primeira_falha timestamp DEFAULT now(),
+    ultima_falha timestamp DEFAULT now(),
+    PRIMARY KEY (entidade, registro_id)
+);
@@ -0,0 +1,249 @@
+-- Razão mensal de estoque por SKU, mantido incrementalmente (substitui a janela sobre todo o histórico)
+CREATE TABLE IF NOT EXISTS public.estoque_mensal (
+    sku varchar(100) NOT NULL,
+    mes date NOT NULL,
+    qtd_comprada numeric(15,3) NOT NULL DEFAULT 0,
+    qtd_vendida numeric(15,3) NOT NULL DEFAULT 0,
+    estoque_acumulado numeric(15,3) NOT NULL DEFAULT 0,
+    atualizado_em timestamp DEFAULT now(),
+    PRIMARY KEY (sku, mes)
+);
+
+-- SKUs/meses tocados desde o último refresh; o refresh recalcula cada SKU a partir do menor mês
+CREATE TABLE IF NOT EXISTS public.estoque_pendentes (
+    sku varchar(100) NOT NULL,
+    mes date NOT NULL,
+    marcado_em timestamp DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_estoque_pendentes_sku ON public.estoque_pendentes(sku);
+
+-- O refresh busca as compras do SKU a partir de um mês
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_itens_codigo ON public.pedidos_compra_itens(produto_codigo);
+
+-- Itens de pedidos de compra: marca (SKU, mês do pedido) dos itens novos e antigos
+CREATE OR REPLACE FUNCTION public.fn_estoque_marcar_itens() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT n.produto_codigo, date_trunc('month', pc.data_pedido)::date
+        FROM novos n
+        JOIN public.pedidos_compra pc ON pc.id = n.pedido_compra_id
+        WHERE n.produto_codigo IS NOT NULL AND pc.data_pedido IS NOT NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT o.produto_codigo, date_trunc('month', pc.data_pedido)::date
+        FROM antigos o
+        JOIN public.pedidos_compra pc ON pc.id = o.pedido_compra_id
+        WHERE o.produto_codigo IS NOT NULL AND pc.data_pedido IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Mudança na data do pedido move todos os itens de mês (o antigo e o novo ficam pendentes)
+CREATE OR REPLACE FUNCTION public.fn_estoque_marcar_pedidos() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO public.estoque_pendentes (sku, mes)
+    SELECT DISTINCT i.produto_codigo, date_trunc('month', d.data_pedido)::date
+    FROM (
+        SELECT n.id, n.data_pedido FROM novos n
+        JOIN antigos o ON o.id = n.id
+        WHERE n.data_pedido IS DISTINCT FROM o.data_pedido
+        UNION ALL
+        SELECT o.id, o.data_pedido FROM antigos o
+        JOIN novos n ON n.id = o.id
+        WHERE n.data_pedido IS DISTINCT FROM o.data_pedido
+    ) d
+    JOIN public.pedidos_compra_itens i ON i.pedido_compra_id = d.id
+    WHERE i.produto_codigo IS NOT NULL AND d.data_pedido IS NOT NULL;
+    RETURN NULL;
+END;
+$$;
+
+-- Exclusão do pedido: os itens saem por cascata, quando o cabeçalho (e a data) já não existe
+CREATE OR REPLACE FUNCTION public.fn_estoque_marcar_pedido_excluido() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF OLD.data_pedido IS NOT NULL THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT i.produto_codigo, date_trunc('month', OLD.data_pedido)::date
+        FROM public.pedidos_compra_itens i
+        WHERE i.pedido_compra_id = OLD.id AND i.produto_codigo IS NOT NULL;
+    END IF;
+    RETURN OLD;
+END;
+$$;
+
+-- Vendas: o fato diário (006) já consolida as mudanças em vendas/vendas_itens
+CREATE OR REPLACE FUNCTION public.fn_estoque_marcar_vendas() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT n.sku, date_trunc('month', n.data_venda)::date FROM novos n;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT o.sku, date_trunc('month', o.data_venda)::date FROM antigos o;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_estoque_itens_ins ON public.pedidos_compra_itens;
+CREATE TRIGGER trg_estoque_itens_ins AFTER INSERT ON public.pedidos_compra_itens
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_estoque_itens_upd ON public.pedidos_compra_itens;
+CREATE TRIGGER trg_estoque_itens_upd AFTER UPDATE ON public.pedidos_compra_itens
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_estoque_itens_del ON public.pedidos_compra_itens;
+CREATE TRIGGER trg_estoque_itens_del AFTER DELETE ON public.pedidos_compra_itens
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+DROP TRIGGER IF EXISTS trg_estoque_pedidos_upd ON public.pedidos_compra;
+CREATE TRIGGER trg_estoque_pedidos_upd AFTER UPDATE ON public.pedidos_compra
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_pedidos();
+
+DROP TRIGGER IF EXISTS trg_estoque_pedidos_del ON public.pedidos_compra;
+CREATE TRIGGER trg_estoque_pedidos_del BEFORE DELETE ON public.pedidos_compra
+    FOR EACH ROW EXECUTE FUNCTION public.fn_estoque_marcar_pedido_excluido();
+
+DROP TRIGGER IF EXISTS trg_estoque_vendas_ins ON public.fato_vendas_sku_diarias;
+CREATE TRIGGER trg_estoque_vendas_ins AFTER INSERT ON public.fato_vendas_sku_diarias
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+DROP TRIGGER IF EXISTS trg_estoque_vendas_upd ON public.fato_vendas_sku_diarias;
+CREATE TRIGGER trg_estoque_vendas_upd AFTER UPDATE ON public.fato_vendas_sku_diarias
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+DROP TRIGGER IF EXISTS trg_estoque_vendas_del ON public.fato_vendas_sku_diarias;
+CREATE TRIGGER trg_estoque_vendas_del AFTER DELETE ON public.fato_vendas_sku_diarias
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+-- Recalcula cada SKU pendente a partir do menor mês tocado, partindo do saldo do último
+-- mês anterior (que não mudou). Retorna quantos SKUs foram processados.
+-- Pode ser agendado no banco, ex.: SELECT cron.schedule('estoque', '*/5 * * * *', 'SELECT public.refresh_estoque_mensal()');
+CREATE OR REPLACE FUNCTION public.refresh_estoque_mensal() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    processados integer;
+BEGIN
+    DROP TABLE IF EXISTS pg_temp._estoque_pendentes;
+    CREATE TEMP TABLE _estoque_pendentes (sku varchar(100) PRIMARY KEY, a_partir date, saldo_inicial numeric(15,3))
+        ON COMMIT DROP;
+
+    WITH removidos AS (
+        DELETE FROM public.estoque_pendentes RETURNING sku, mes
+    )
+    INSERT INTO _estoque_pendentes (sku, a_partir)
+    SELECT sku, min(mes) FROM removidos GROUP BY sku;
+
+    GET DIAGNOSTICS processados = ROW_COUNT;
+    IF processados = 0 THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE _estoque_pendentes p SET saldo_inicial = COALESCE((
+        SELECT e.estoque_acumulado FROM public.estoque_mensal e
+        WHERE e.sku = p.sku AND e.mes < p.a_partir
+        ORDER BY e.mes DESC
+        LIMIT 1
+    ), 0);
+
+    DELETE FROM public.estoque_mensal e
+    USING _estoque_pendentes p
+    WHERE e.sku = p.sku AND e.mes >= p.a_partir;
+
+    INSERT INTO public.estoque_mensal (sku, mes, qtd_comprada, qtd_vendida, estoque_acumulado)
+    WITH compras_mensal AS (
+        SELECT
+            i.produto_codigo AS sku,
+            date_trunc('month', pc.data_pedido)::date AS mes,
+            SUM(i.quantidade) AS qtd_comprada
+        FROM _estoque_pendentes p
+        JOIN public.pedidos_compra_itens i ON i.produto_codigo = p.sku
+        JOIN public.pedidos_compra pc ON pc.id = i.pedido_compra_id
+        WHERE pc.data_pedido >= p.a_partir
+        GROUP BY 1, 2
+    ),
+    vendas_mensal AS (
+        SELECT
+            f.sku,
+            date_trunc('month', f.data_venda)::date AS mes,
+            SUM(f.qtd_vendida) AS qtd_vendida
+        FROM _estoque_pendentes p
+        JOIN public.fato_vendas_sku_diarias f ON f.sku = p.sku AND f.data_venda >= p.a_partir
+        GROUP BY 1, 2
+    ),
+    combinado AS (
+        SELECT
+            COALESCE(c.sku, v.sku) AS sku,
+            COALESCE(c.mes, v.mes) AS mes,
+            COALESCE(c.qtd_comprada, 0) AS qtd_comprada,
+            COALESCE(v.qtd_vendida, 0) AS qtd_vendida
+        FROM compras_mensal c
+        FULL OUTER JOIN vendas_mensal v ON c.sku = v.sku AND c.mes = v.mes
+    )
+    SELECT
+        c.sku,
+        c.mes,
+        c.qtd_comprada,
+        c.qtd_vendida,
+        p.saldo_inicial + SUM(c.qtd_comprada - c.qtd_vendida) OVER (
+            PARTITION BY c.sku ORDER BY c.mes
+            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        )
+    FROM combinado c
+    JOIN _estoque_pendentes p ON p.sku = c.sku;
+
+    RETURN processados;
+END;
+$$;
+
+-- Geração própria: a página de estoque deve invalidar quando o razão muda, não antes (ver 007)
+INSERT INTO public.dados_versao (dataset) VALUES ('estoque')
+ON CONFLICT (dataset) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_dados_versao_ins ON public.estoque_mensal;
+CREATE TRIGGER trg_dados_versao_ins AFTER INSERT ON public.estoque_mensal
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar('estoque');
+
+DROP TRIGGER IF EXISTS trg_dados_versao_del ON public.estoque_mensal;
+CREATE TRIGGER trg_dados_versao_del AFTER DELETE ON public.estoque_mensal
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar('estoque');
+
+-- Carga inicial: todos os SKUs desde o primeiro mês
+INSERT INTO public.estoque_pendentes (sku, mes)
+SELECT i.produto_codigo, min(date_trunc('month', pc.data_pedido)::date)
+FROM public.pedidos_compra_itens i
+JOIN public.pedidos_compra pc ON pc.id = i.pedido_compra_id
+WHERE i.produto_codigo IS NOT NULL AND pc.data_pedido IS NOT NULL
+GROUP BY i.produto_codigo
+UNION ALL
+SELECT sku, min(date_trunc('month', data_venda)::date)
+FROM public.fato_vendas_sku_diarias
+GROUP BY sku;
+
+SELECT public.refresh_estoque_mensal();
+
+-- A view passa a ler do razão: uma varredura por índice em vez da janela sobre todo o histórico
+DROP VIEW IF EXISTS public.vw_estoque_vendas_mensal;
+CREATE VIEW public.vw_estoque_vendas_mensal AS
+SELECT sku, mes, qtd_comprada, qtd_vendida, estoque_acumulado
+FROM public.estoque_mensal
+ORDER BY sku, mes;
@@ -0,0 +1,501 @@
+-- Particionamento mensal (RANGE por data) de pedidos_compra, pedidos_compra_itens e fato_vendas_sku_diarias.
+-- Os itens passam a carregar a data do pedido, para serem particionados pela mesma chave.
+-- Leituras filtradas por data só abrem as partições do período, e meses antigos podem ser
+-- desanexados/arquivados (arquivar_particoes) sem reescrever as tabelas.
+
+-- Cria as partições mensais que faltam para os meses informados. Retorna quantas foram criadas.
+CREATE OR REPLACE FUNCTION public.criar_particoes_mensais(tabela text, meses date[]) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    mes date;
+    nome text;
+    criadas integer := 0;
+BEGIN
+    -- Dois syncs simultâneos não tentam criar a mesma partição
+    PERFORM pg_advisory_xact_lock(hashtext('particoes:' || tabela));
+    FOR mes IN
+        SELECT DISTINCT date_trunc('month', m)::date FROM unnest(meses) m WHERE m IS NOT NULL
+    LOOP
+        nome := format('%s_p%s', tabela, to_char(mes, 'YYYYMM'));
+        IF to_regclass(format('public.%I', nome)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                nome, tabela, mes, (mes + interval '1 month')::date
+            );
+            criadas := criadas + 1;
+        END IF;
+    END LOOP;
+    RETURN criadas;
+END;
+$$;
+
+-- Garante as partições do mês atual e dos próximos `meses_a_frente` em todas as tabelas particionadas.
+-- Pode ser agendado no banco, ex.: SELECT cron.schedule('particoes', '0 3 * * *', 'SELECT public.garantir_particoes_futuras()');
+CREATE OR REPLACE FUNCTION public.garantir_particoes_futuras(meses_a_frente integer DEFAULT 3) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    meses date[];
+BEGIN
+    SELECT array_agg(d::date) INTO meses
+    FROM generate_series(
+        date_trunc('month', current_date),
+        date_trunc('month', current_date) + make_interval(months => meses_a_frente),
+        interval '1 month'
+    ) d;
+    RETURN public.criar_particoes_mensais('pedidos_compra', meses)
+         + public.criar_particoes_mensais('pedidos_compra_itens', meses)
+         + public.criar_particoes_mensais('fato_vendas_sku_diarias', meses);
+END;
+$$;
+
+-- Desanexa as partições com todos os dias antes de `antes` e as move para o schema `esquema`.
+-- Continuam consultáveis lá e podem voltar com ALTER TABLE ... ATTACH PARTITION.
+-- Para pedidos_compra os itens do período são arquivados primeiro (chave estrangeira) e os
+-- pedidos saem de pedidos_compra_chaves (ao reanexar, as chaves precisam ser reinseridas).
+CREATE OR REPLACE FUNCTION public.arquivar_particoes(tabela text, antes date, esquema text DEFAULT 'arquivo')
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    particao record;
+    arquivadas integer := 0;
+BEGIN
+    IF tabela = 'pedidos_compra' THEN
+        arquivadas := public.arquivar_particoes('pedidos_compra_itens', antes, esquema);
+    END IF;
+
+    EXECUTE format('CREATE SCHEMA IF NOT EXISTS %I', esquema);
+    FOR particao IN
+        SELECT c.relname
+        FROM pg_inherits h
+        JOIN pg_class c ON c.oid = h.inhrelid
+        WHERE h.inhparent = format('public.%I', tabela)::regclass
+          AND c.relname ~ ('^' || tabela || '_p[0-9]{6}$')
+          AND to_date(right(c.relname, 6), 'YYYYMM') + interval '1 month' <= antes
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', tabela, particao.relname);
+        EXECUTE format('ALTER TABLE public.%I SET SCHEMA %I', particao.relname, esquema);
+        IF tabela = 'pedidos_compra' THEN
+            DELETE FROM public.pedidos_compra_chaves
+            WHERE data_pedido >= to_date(right(particao.relname, 6), 'YYYYMM')
+              AND data_pedido < to_date(right(particao.relname, 6), 'YYYYMM') + interval '1 month';
+        END IF;
+        arquivadas := arquivadas + 1;
+    END LOOP;
+    RETURN arquivadas;
+END;
+$$;
+
+-- ============================================================
+-- Troca das tabelas: as atuais viram *_legado, os dados são copiados e as legadas removidas
+-- ============================================================
+
+ALTER TABLE public.pedidos_compra RENAME TO pedidos_compra_legado;
+ALTER TABLE public.pedidos_compra_itens RENAME TO pedidos_compra_itens_legado;
+ALTER SEQUENCE public.pedidos_compra_itens_id_seq RENAME TO pedidos_compra_itens_legado_id_seq;
+ALTER TABLE public.fato_vendas_sku_diarias RENAME TO fato_vendas_sku_diarias_legado;
+
+-- Pedido sem data (raro no Bling) fica no mês da data prevista ou, sem ela, no da carga
+CREATE TABLE public.pedidos_compra (
+    id bigint NOT NULL,
+    numero varchar(20),
+    data_pedido date NOT NULL,
+    data_prevista date,
+    fornecedor_id bigint,
+    fornecedor_nome varchar(255),
+    situacao_valor integer,
+    valor_total_produtos numeric(15,2),
+    valor_total numeric(15,2),
+    desconto_valor numeric(15,2),
+    ordem_compra varchar(50),
+    observacoes text,
+    observacoes_internas text,
+    data_etl timestamp DEFAULT now(),
+    hash_conteudo varchar(64)
+) PARTITION BY RANGE (data_pedido);
+
+CREATE TABLE public.pedidos_compra_itens (
+    id bigserial NOT NULL,
+    pedido_compra_id bigint NOT NULL,
+    data_pedido date NOT NULL,
+    produto_id bigint,
+    produto_codigo varchar(100),
+    produto_nome varchar(255),
+    descricao text,
+    codigo_fornecedor varchar(100),
+    unidade varchar(10),
+    quantidade numeric(10,3),
+    valor_unitario numeric(15,2),
+    aliquota_ipi numeric(5,2),
+    data_etl timestamp DEFAULT now(),
+    chave_item varchar(150),
+    hash_item varchar(64)
+) PARTITION BY RANGE (data_pedido);
+
+CREATE TABLE public.fato_vendas_sku_diarias (
+    data_venda date NOT NULL,
+    sku varchar(100) NOT NULL,
+    produto_nome varchar(255),
+    valor_total_vendas numeric(15,2) NOT NULL DEFAULT 0,
+    qtd_vendida numeric(15,3) NOT NULL DEFAULT 0,
+    atualizado_em timestamp DEFAULT now()
+) PARTITION BY RANGE (data_venda);
+
+-- Partições de todo o histórico existente e dos próximos meses
+SELECT public.criar_particoes_mensais('pedidos_compra', ARRAY(
+    SELECT DISTINCT COALESCE(data_pedido, data_prevista, data_etl::date, current_date) FROM public.pedidos_compra_legado
+));
+SELECT public.criar_particoes_mensais('pedidos_compra_itens', ARRAY(
+    SELECT DISTINCT COALESCE(data_pedido, data_prevista, data_etl::date, current_date) FROM public.pedidos_compra_legado
+));
+SELECT public.criar_particoes_mensais('fato_vendas_sku_diarias', ARRAY(
+    SELECT DISTINCT data_venda FROM public.fato_vendas_sku_diarias_legado
+));
+SELECT public.garantir_particoes_futuras();
+
+INSERT INTO public.pedidos_compra (
+    id, numero, data_pedido, data_prevista, fornecedor_id, fornecedor_nome, situacao_valor,
+    valor_total_produtos, valor_total, desconto_valor, ordem_compra, observacoes,
+    observacoes_internas, data_etl, hash_conteudo
+)
+SELECT
+    id, numero, COALESCE(data_pedido, data_prevista, data_etl::date, current_date), data_prevista, fornecedor_id,
+    fornecedor_nome, situacao_valor, valor_total_produtos, valor_total, desconto_valor, ordem_compra,
+    observacoes, observacoes_internas, data_etl, hash_conteudo
+FROM public.pedidos_compra_legado;
+
+INSERT INTO public.pedidos_compra_itens (
+    id, pedido_compra_id, data_pedido, produto_id, produto_codigo, produto_nome, descricao,
+    codigo_fornecedor, unidade, quantidade, valor_unitario, aliquota_ipi, data_etl, chave_item, hash_item
+)
+SELECT
+    i.id, i.pedido_compra_id, COALESCE(pc.data_pedido, pc.data_prevista, pc.data_etl::date, current_date), i.produto_id,
+    i.produto_codigo, i.produto_nome, i.descricao, i.codigo_fornecedor, i.unidade, i.quantidade,
+    i.valor_unitario, i.aliquota_ipi, i.data_etl, i.chave_item, i.hash_item
+FROM public.pedidos_compra_itens_legado i
+JOIN public.pedidos_compra_legado pc ON pc.id = i.pedido_compra_id;
+
+SELECT setval(
+    'public.pedidos_compra_itens_id_seq',
+    GREATEST((SELECT max(id) FROM public.pedidos_compra_itens), 1)
+);
+
+INSERT INTO public.fato_vendas_sku_diarias (data_venda, sku, produto_nome, valor_total_vendas, qtd_vendida, atualizado_em)
+SELECT data_venda, sku, produto_nome, valor_total_vendas, qtd_vendida, atualizado_em
+FROM public.fato_vendas_sku_diarias_legado;
+
+-- Leva junto as views e triggers que apontavam para as tabelas antigas (recriados abaixo)
+DROP TABLE public.pedidos_compra_itens_legado, public.pedidos_compra_legado, public.fato_vendas_sku_diarias_legado
+    CASCADE;
+DROP FUNCTION IF EXISTS public.fn_estoque_marcar_pedidos();
+DROP FUNCTION IF EXISTS public.fn_estoque_marcar_pedido_excluido();
+
+-- Chaves e índices (criados depois da carga). Toda chave única inclui a coluna de partição;
+-- a PK (id, data_pedido) também atende buscas só por id.
+ALTER TABLE public.pedidos_compra ADD PRIMARY KEY (id, data_pedido);
+ALTER TABLE public.pedidos_compra_itens ADD PRIMARY KEY (id, data_pedido);
+ALTER TABLE public.fato_vendas_sku_diarias ADD PRIMARY KEY (data_venda, sku);
+
+-- Mudar a data do pedido move os itens junto (de partição, inclusive)
+ALTER TABLE public.pedidos_compra_itens
+    ADD CONSTRAINT pedidos_compra_itens_pedido_fkey
+    FOREIGN KEY (pedido_compra_id, data_pedido) REFERENCES public.pedidos_compra(id, data_pedido)
+    ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Uma linha por pedido, fora das partições. A PK das partições inclui a data, então é
+-- aqui que o id continua único (um pedido nunca fica em dois meses, nem se uma troca de
+-- data falhar no meio), e é por aqui que as buscas por id descobrem o mês do pedido e
+-- abrem uma partição só. Mantida pelo trigger abaixo, em qualquer caminho de escrita.
+CREATE TABLE public.pedidos_compra_chaves (
+    id bigint PRIMARY KEY,
+    data_pedido date NOT NULL
+);
+
+INSERT INTO public.pedidos_compra_chaves (id, data_pedido)
+SELECT id, data_pedido FROM public.pedidos_compra;
+
+-- A troca de partição num UPDATE chega como DELETE + INSERT (os AFTER UPDATE por linha
+-- não disparam nesse caso); o ramo de UPDATE cobre só a troca de data na mesma partição
+CREATE OR REPLACE FUNCTION public.fn_pedidos_compra_chaves() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM public.pedidos_compra_chaves WHERE id = OLD.id AND data_pedido = OLD.data_pedido;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.id <> OLD.id OR NEW.data_pedido <> OLD.data_pedido THEN
+            UPDATE public.pedidos_compra_chaves SET id = NEW.id, data_pedido = NEW.data_pedido
+            WHERE id = OLD.id AND data_pedido = OLD.data_pedido;
+        END IF;
+    ELSE
+        -- Um id que já está em outro mês viola a PK e desfaz a transação
+        INSERT INTO public.pedidos_compra_chaves (id, data_pedido) VALUES (NEW.id, NEW.data_pedido);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_pedidos_compra_chaves
+    AFTER INSERT OR UPDATE OR DELETE ON public.pedidos_compra
+    FOR EACH ROW EXECUTE FUNCTION public.fn_pedidos_compra_chaves();
+
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_fornecedor ON public.pedidos_compra(fornecedor_id);
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_situacao ON public.pedidos_compra(situacao_valor);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pedidos_compra_itens_chave
+    ON public.pedidos_compra_itens(pedido_compra_id, chave_item, data_pedido);
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_itens_produto ON public.pedidos_compra_itens(produto_id);
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_itens_codigo ON public.pedidos_compra_itens(produto_codigo, data_pedido);
+CREATE INDEX IF NOT EXISTS idx_fato_vendas_sku_diarias_sku ON public.fato_vendas_sku_diarias(sku, data_venda);
+
+-- ============================================================
+-- Triggers recriados nas tabelas particionadas
+-- ============================================================
+
+-- Gerações de dados_versao (007)
+DO $$
+DECLARE
+    alvo record;
+BEGIN
+    FOR alvo IN
+        SELECT * FROM (VALUES
+            ('fato_vendas_sku_diarias', 'vendas'),
+            ('pedidos_compra', 'compras'),
+            ('pedidos_compra_itens', 'compras')
+        ) AS t(tabela, dataset)
+    LOOP
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_ins AFTER INSERT ON public.%I
+             REFERENCING NEW TABLE AS novos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_upd AFTER UPDATE ON public.%I
+             REFERENCING NEW TABLE AS novos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+        EXECUTE format(
+            'CREATE TRIGGER trg_dados_versao_del AFTER DELETE ON public.%I
+             REFERENCING OLD TABLE AS antigos
+             FOR EACH STATEMENT EXECUTE FUNCTION public.fn_dados_versao_incrementar(%L)',
+            alvo.tabela, alvo.dataset
+        );
+    END LOOP;
+END;
+$$;
+
+-- Razão de estoque (011): com a data nos itens, os itens bastam. Mudança de data do pedido
+-- chega como UPDATE em cascata nos itens e exclusão do pedido como DELETE em cascata.
+CREATE OR REPLACE FUNCTION public.fn_estoque_marcar_itens() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT n.produto_codigo, date_trunc('month', n.data_pedido)::date
+        FROM novos n
+        WHERE n.produto_codigo IS NOT NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.estoque_pendentes (sku, mes)
+        SELECT DISTINCT o.produto_codigo, date_trunc('month', o.data_pedido)::date
+        FROM antigos o
+        WHERE o.produto_codigo IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_estoque_itens_ins AFTER INSERT ON public.pedidos_compra_itens
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+CREATE TRIGGER trg_estoque_itens_upd AFTER UPDATE ON public.pedidos_compra_itens
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+CREATE TRIGGER trg_estoque_itens_del AFTER DELETE ON public.pedidos_compra_itens
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_itens();
+
+CREATE TRIGGER trg_estoque_vendas_ins AFTER INSERT ON public.fato_vendas_sku_diarias
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+CREATE TRIGGER trg_estoque_vendas_upd AFTER UPDATE ON public.fato_vendas_sku_diarias
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+CREATE TRIGGER trg_estoque_vendas_del AFTER DELETE ON public.fato_vendas_sku_diarias
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.fn_estoque_marcar_vendas();
+
+-- ============================================================
+-- Refreshes: criam as partições dos dias que vão gravar e filtram pela chave de partição
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION public.refresh_fato_vendas_sku_diarias() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    processados integer;
+BEGIN
+    DROP TABLE IF EXISTS pg_temp._fato_pendentes;
+    CREATE TEMP TABLE _fato_pendentes (data_venda date, sku varchar(100)) ON COMMIT DROP;
+
+    WITH removidos AS (
+        DELETE FROM public.fato_vendas_pendentes RETURNING data_venda, sku
+    )
+    INSERT INTO _fato_pendentes
+    SELECT DISTINCT data_venda, sku FROM removidos;
+
+    GET DIAGNOSTICS processados = ROW_COUNT;
+    IF processados = 0 THEN
+        RETURN 0;
+    END IF;
+
+    PERFORM public.criar_particoes_mensais(
+        'fato_vendas_sku_diarias', ARRAY(SELECT DISTINCT data_venda FROM _fato_pendentes)
+    );
+
+    DELETE FROM public.fato_vendas_sku_diarias f
+    USING _fato_pendentes p
+    WHERE f.data_venda = p.data_venda AND (p.sku IS NULL OR f.sku = p.sku);
+
+    INSERT INTO public.fato_vendas_sku_diarias (data_venda, sku, produto_nome, valor_total_vendas, qtd_vendida)
+    SELECT
+        v.data_venda::date,
+        v.sku,
+        max(v.produto_nome),
+        COALESCE(SUM(v.valor_total_vendas), 0),
+        COALESCE(SUM(v.qtd_vendida), 0)
+    FROM public.vw_vendas_sku_diarias v
+    WHERE v.data_venda::date IN (SELECT DISTINCT data_venda FROM _fato_pendentes)
+      AND v.sku IS NOT NULL
+      AND EXISTS (
+          SELECT 1 FROM _fato_pendentes p
+          WHERE p.data_venda = v.data_venda::date AND (p.sku IS NULL OR p.sku = v.sku)
+      )
+    GROUP BY v.data_venda::date, v.sku
+    ON CONFLICT (data_venda, sku) DO UPDATE SET
+        produto_nome = EXCLUDED.produto_nome,
+        valor_total_vendas = EXCLUDED.valor_total_vendas,
+        qtd_vendida = EXCLUDED.qtd_vendida,
+        atualizado_em = now();
+
+    INSERT INTO public.sync_cursor (entidade, ultima_data, atualizado_em)
+    VALUES ('fato_vendas_sku_diarias', (SELECT max(data_venda) FROM _fato_pendentes), now())
+    ON CONFLICT (entidade) DO UPDATE SET atualizado_em = EXCLUDED.atualizado_em;
+
+    RETURN processados;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.refresh_estoque_mensal() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    processados integer;
+BEGIN
+    DROP TABLE IF EXISTS pg_temp._estoque_pendentes;
+    CREATE TEMP TABLE _estoque_pendentes (sku varchar(100) PRIMARY KEY, a_partir date, saldo_inicial numeric(15,3))
+        ON COMMIT DROP;
+
+    WITH removidos AS (
+        DELETE FROM public.estoque_pendentes RETURNING sku, mes
+    )
+    INSERT INTO _estoque_pendentes (sku, a_partir)
+    SELECT sku, min(mes) FROM removidos GROUP BY sku;
+
+    GET DIAGNOSTICS processados = ROW_COUNT;
+    IF processados = 0 THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE _estoque_pendentes p SET saldo_inicial = COALESCE((
+        SELECT e.estoque_acumulado FROM public.estoque_mensal e
+        WHERE e.sku = p.sku AND e.mes < p.a_partir
+        ORDER BY e.mes DESC
+        LIMIT 1
+    ), 0);
+
+    DELETE FROM public.estoque_mensal e
+    USING _estoque_pendentes p
+    WHERE e.sku = p.sku AND e.mes >= p.a_partir;
+
+    INSERT INTO public.estoque_mensal (sku, mes, qtd_comprada, qtd_vendida, estoque_acumulado)
+    WITH compras_mensal AS (
+        SELECT
+            i.produto_codigo AS sku,
+            date_trunc('month', i.data_pedido)::date AS mes,
+            SUM(i.quantidade) AS qtd_comprada
+        FROM _estoque_pendentes p
+        JOIN public.pedidos_compra_itens i ON i.produto_codigo = p.sku AND i.data_pedido >= p.a_partir
+        GROUP BY 1, 2
+    ),
+    vendas_mensal AS (
+        SELECT
+            f.sku,
+            date_trunc('month', f.data_venda)::date AS mes,
+            SUM(f.qtd_vendida) AS qtd_vendida
+        FROM _estoque_pendentes p
+        JOIN public.fato_vendas_sku_diarias f ON f.sku = p.sku AND f.data_venda >= p.a_partir
+        GROUP BY 1, 2
+    ),
+    combinado AS (
+        SELECT
+            COALESCE(c.sku, v.sku) AS sku,
+            COALESCE(c.mes, v.mes) AS mes,
+            COALESCE(c.qtd_comprada, 0) AS qtd_comprada,
+            COALESCE(v.qtd_vendida, 0) AS qtd_vendida
+        FROM compras_mensal c
+        FULL OUTER JOIN vendas_mensal v ON c.sku = v.sku AND c.mes = v.mes
+    )
+    SELECT
+        c.sku,
+        c.mes,
+        c.qtd_comprada,
+        c.qtd_vendida,
+        p.saldo_inicial + SUM(c.qtd_comprada - c.qtd_vendida) OVER (
+            PARTITION BY c.sku ORDER BY c.mes
+            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        )
+    FROM combinado c
+    JOIN _estoque_pendentes p ON p.sku = c.sku;
+
+    RETURN processados;
+END;
+$$;
+
+-- ============================================================
+-- Views
+-- ============================================================
+
+-- Compras por mês direto dos itens (sem join com o pedido)
+CREATE VIEW public.vw_compras_vendas_mensal AS
+WITH compras_mensal AS (
+    SELECT
+        produto_codigo AS sku,
+        date_trunc('month', data_pedido)::date AS mes,
+        SUM(quantidade) AS qtd_comprada,
+        SUM(quantidade * valor_unitario) AS valor_compras
+    FROM pedidos_compra_itens
+    GROUP BY 1, 2
+),
+vendas_mensal AS (
+    SELECT
+        sku,
+        date_trunc('month', data_venda)::date AS mes,
+        SUM(qtd_vendida) AS qtd_vendida,
+        SUM(valor_total_vendas) AS valor_vendas
+    FROM fato_vendas_sku_diarias
+    GROUP BY 1, 2
+)
+SELECT
+    COALESCE(c.sku, v.sku) AS sku,
+    COALESCE(c.mes, v.mes) AS mes,
+    COALESCE(v.qtd_vendida, 0) AS qtd_vendida,
+    COALESCE(v.valor_vendas, 0) AS valor_vendas,
+    COALESCE(c.qtd_comprada, 0) AS qtd_comprada,
+    COALESCE(c.valor_compras, 0) AS valor_compras,
+    COALESCE(c.qtd_comprada, 0) - COALESCE(v.qtd_vendida, 0) AS saldo_mensal
+FROM compras_mensal c
+FULL OUTER JOIN vendas_mensal v ON c.sku = v.sku AND c.mes = v.mes
+ORDER BY 1, 2;
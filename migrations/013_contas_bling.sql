@@ -0,0 +1,8 @@
+-- Várias empresas do Bling no mesmo deploy: cada pedido guarda a conta de origem
+-- (BLING_CONTAS). Os pedidos já gravados ficam na conta 'principal', a de antes do multi-conta.
+ALTER TABLE public.pedidos_compra
+    ADD COLUMN IF NOT EXISTS conta_id varchar(30) NOT NULL DEFAULT 'principal';
+
+-- Pedidos abertos de uma conta (sync incremental), sem ler os das outras
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_conta_situacao
+    ON public.pedidos_compra(conta_id, situacao_valor);
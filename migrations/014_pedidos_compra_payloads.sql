@@ -0,0 +1,24 @@
+-- Arquivo dos payloads de detalhe do Bling, como vieram da API: permite refazer o
+-- mapeamento (coluna nova, correção de bug) sem buscar tudo de novo sob o rate limit.
+-- Uma versão por conteúdo distinto de cada pedido; o replay usa a mais recente.
+CREATE TABLE IF NOT EXISTS public.pedidos_compra_payloads (
+    pedido_id bigint NOT NULL,
+    hash_payload varchar(64) NOT NULL,
+    conta_id varchar(30) NOT NULL DEFAULT 'principal',
+    payload jsonb NOT NULL,
+    buscado_em timestamp NOT NULL DEFAULT now(),
+    PRIMARY KEY (pedido_id, hash_payload)
+) WITH (toast_tuple_target = 512);
+
+-- Comprime a partir de 512 bytes (o padrão é ~2 kB, o que deixaria a maioria dos
+-- pedidos sem compressão) e com lz4 quando o servidor tiver suporte (Postgres 14+)
+DO $$
+BEGIN
+    ALTER TABLE public.pedidos_compra_payloads ALTER COLUMN payload SET COMPRESSION lz4;
+EXCEPTION WHEN feature_not_supported OR syntax_error OR invalid_parameter_value THEN
+    RAISE NOTICE 'lz4 indisponível, payloads usam a compressão padrão (pglz)';
+END $$;
+
+-- Versão mais recente de cada pedido, em ordem de id (leitura do replay)
+CREATE INDEX IF NOT EXISTS idx_pedidos_compra_payloads_recente
+    ON public.pedidos_compra_payloads(pedido_id, buscado_em DESC);
@@ -0,0 +1,7 @@
+-- Último sync completo (todos os pedidos buscados de novo) de cada entidade: o
+-- incremental vira completo a cada SYNC_RECONCILIAR_DIAS para pegar pedidos
+-- editados depois da janela do cursor (que é pela data do pedido)
+ALTER TABLE public.sync_cursor ADD COLUMN IF NOT EXISTS ultimo_completo timestamp;
+
+-- Cursores já existentes contam a partir do último sync, em vez de forçar um completo no deploy
+UPDATE public.sync_cursor SET ultimo_completo = atualizado_em WHERE ultimo_completo IS NULL;
@@ -1,27 +1,75 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
-from db import query_view
+import datasets
+from estoque_analise import ESTOQUE_JANELA_MESES, STATUS, analisar_estoque, ranking_alertas
+from filtro_indice import IndiceFiltro
+from tabela_paginada import paginar_dataframe, tabela_paginada
 
 st.set_page_config(page_title="Estoque x Vendas", layout="wide")
 st.title("Estoque x Vendas Mensal")
 
-VIEW_NAME = "public.vw_estoque_vendas_mensal"
 
+@st.cache_data(ttl=60)
+def load_versao():
+    return datasets.versao("estoque_vendas_mensal")
 
-@st.cache_data
-def load_data():
-    df = query_view(VIEW_NAME)
-    df["mes"] = pd.to_datetime(df["mes"])
-    return df
 
+@st.cache_data(max_entries=2)
+def load_data(versao):
+    return datasets.estoque_vendas_mensal(versao)
 
-df = load_data()
+
+@st.cache_resource(max_entries=2)
+def load_indice(versao):
+    return IndiceFiltro(load_data(versao), ["sku"], coluna_data="mes")
+
+
+@st.cache_resource(max_entries=10)
+def load_dados_ordenados(versao, selected, data_inicio, data_fim):
+    # Ordenação estável: dentro de cada SKU (ou valor ordenado) os meses seguem em ordem
+    indice = load_indice(versao)
+    dados = indice.aplicar(load_data(versao), indice.selecionar({"sku": list(selected)}, data_inicio, data_fim))
+    return dados.sort_values(["sku", "mes"], ignore_index=True)
+
+
+@st.cache_data(max_entries=20)
+def load_analise(versao, selected, data_inicio, data_fim):
+    indice = load_indice(versao)
+    dados = indice.aplicar(load_data(versao), indice.selecionar({"sku": list(selected)}, data_inicio, data_fim))
+    return analisar_estoque(dados, referencia=data_fim)
+
+
+ROTULOS_STATUS = {
+    "ruptura": "Ruptura", "critico": "Crítico", "alerta": "Alerta", "ok": "OK", "sem_giro": "Sem giro",
+}
+
+ROTULOS_ANALISE = {
+    "prioridade": "#", "sku": "SKU", "status": "Status", "estoque_atual": "Estoque",
+    "velocidade": f"Vendas/Mês ({ESTOQUE_JANELA_MESES}m)", "cobertura_meses": "Cobertura (meses)",
+    "ruptura_prevista": "Ruptura Prevista", "ruptura_atual": "Meses em Ruptura",
+    "maior_ruptura": "Maior Ruptura", "meses_sem_estoque": "Meses sem Estoque", "sugestao_compra": "Sugestão de Compra",
+}
+
+
+def _formatar_analise(pagina):
+    formatos = {
+        "status": lambda p: p["status"].map(ROTULOS_STATUS),
+        "ruptura_prevista": lambda p: p["ruptura_prevista"].dt.strftime("%Y-%m"),
+        "velocidade": lambda p: p["velocidade"].round(1),
+        "cobertura_meses": lambda p: p["cobertura_meses"].round(1),
+        "sugestao_compra": lambda p: p["sugestao_compra"].round(0),
+    }
+    return pagina.assign(**{c: f for c, f in formatos.items() if c in pagina})
+
+
+versao = load_versao()
+df = load_data(versao)
+indice = load_indice(versao)
 
 # --- Filtros ---
 col_filtro1, _ = st.columns([3, 1])
 
-skus_disponiveis = sorted(df["sku"].unique())
+skus_disponiveis = indice.opcoes("sku")
 
 with col_filtro1:
     selected = st.multiselect(
@@ -39,12 +87,7 @@ with col_data1:
 with col_data2:
     data_fim = st.date_input("Data final", value=None, min_value=data_min, max_value=data_max)
 
-if selected:
-    df = df[df["sku"].isin(selected)]
-if data_inicio:
-    df = df[df["mes"] >= pd.Timestamp(data_inicio)]
-if data_fim:
-    df = df[df["mes"] <= pd.Timestamp(data_fim)]
+df = indice.aplicar(df, indice.selecionar({"sku": selected}, data_inicio, data_fim))
 
 # --- Gráfico: Estoque acumulado vs Vendas ---
 agg_df = (
@@ -71,32 +114,76 @@ fig.update_layout(
 
 st.plotly_chart(fig, width='stretch')
 
-# --- Alertas: meses com estoque baixo e queda de vendas ---
-st.subheader("Meses com Estoque Baixo")
+# --- Alertas de estoque (todos os SKUs filtrados de uma vez) ---
+st.subheader("Alertas de Estoque")
+
+analise = load_analise(versao, tuple(selected), data_inicio, data_fim)
+
+contagem = analise["status"].value_counts()
+colunas_status = st.columns(len(STATUS))
+for coluna, status in zip(colunas_status, STATUS):
+    coluna.metric(ROTULOS_STATUS[status], f"{int(contagem.get(status, 0))}")
 
 if selected and len(selected) <= 5:
+    por_sku = analise.set_index("sku")
     for sku in selected:
-        sku_df = df[df["sku"] == sku].sort_values("mes")
-        baixo = sku_df[sku_df["estoque_acumulado"] <= 0]
-        if not baixo.empty:
-            meses = ", ".join(baixo["mes"].dt.strftime("%Y-%m"))
-            st.warning(f"**{sku}** — estoque zerado/negativo em: {meses}")
+        if sku not in por_sku.index:
+            st.info(f"**{sku}** — sem movimento no período")
+            continue
+        linha = por_sku.loc[sku]
+        if linha["status"] == "ruptura":
+            st.error(
+                f"**{sku}** — sem estoque há {linha['ruptura_atual']} meses "
+                f"(maior ruptura: {linha['maior_ruptura']} meses)"
+            )
+        elif linha["status"] in ("critico", "alerta"):
+            st.warning(
+                f"**{sku}** — cobertura de {linha['cobertura_meses']:.1f} meses, "
+                f"ruptura prevista em {linha['ruptura_prevista']:%Y-%m}; "
+                f"sugestão de compra: {linha['sugestao_compra']:,.0f} un."
+            )
+        elif linha["status"] == "sem_giro":
+            st.info(f"**{sku}** — sem vendas nos últimos {ESTOQUE_JANELA_MESES} meses")
         else:
-            st.success(f"**{sku}** — estoque sempre positivo no período")
+            historico = f"; ficou {linha['meses_sem_estoque']} meses sem estoque no período" if linha["meses_sem_estoque"] else ""
+            st.success(f"**{sku}** — cobertura de {linha['cobertura_meses']:.1f} meses{historico}")
+
+ranking = ranking_alertas(analise)
+if ranking.empty:
+    st.success("Nenhum SKU em ruptura ou com cobertura baixa no período.")
 else:
-    zerados = df[df["estoque_acumulado"] <= 0].groupby("sku").size().reset_index(name="meses_sem_estoque")
-    zerados = zerados.sort_values("meses_sem_estoque", ascending=False).head(20)
-    if not zerados.empty:
-        st.dataframe(zerados.rename(columns={"sku": "SKU", "meses_sem_estoque": "Meses sem Estoque"}), width='stretch')
-    else:
-        st.success("Nenhum SKU com estoque zerado/negativo no período.")
+    tabela_paginada(
+        "compras_vendas_alertas",
+        paginar_dataframe(ranking, chave=("compras_vendas_alertas", versao, tuple(selected), data_inicio, data_fim)),
+        list(ranking.columns),
+        len(ranking),
+        filtros=(versao, tuple(selected), data_inicio, data_fim),
+        ordem_padrao="prioridade",
+        rotulos=ROTULOS_ANALISE,
+        formatar=_formatar_analise,
+    )
+
+
+def _formatar_mes(pagina):
+    if "mes" not in pagina:
+        return pagina
+    return pagina.assign(mes=pagina["mes"].dt.strftime("%Y-%m"))
+
 
 # --- Tabela detalhada ---
 st.subheader("Dados por SKU/Mês")
 
-display_df = df.copy()
-display_df["mes"] = display_df["mes"].dt.strftime("%Y-%m")
-display_df = display_df.sort_values(["sku", "mes"])
-display_df.columns = ["SKU", "Mês", "Qtd Comprada", "Qtd Vendida", "Estoque Acumulado"]
-
-st.dataframe(display_df, width='stretch')
+filtros_dados = (versao, tuple(selected), data_inicio, data_fim)
+tabela_paginada(
+    "compras_vendas_dados",
+    paginar_dataframe(load_dados_ordenados(*filtros_dados), chave=("compras_vendas_dados", *filtros_dados)),
+    list(df.columns),
+    len(df),
+    filtros=filtros_dados,
+    ordem_padrao="sku",
+    rotulos={
+        "sku": "SKU", "mes": "Mês", "qtd_comprada": "Qtd Comprada",
+        "qtd_vendida": "Qtd Vendida", "estoque_acumulado": "Estoque Acumulado",
+    },
+    formatar=_formatar_mes,
+)
@@ -1,31 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from db import query_sql
+import datasets
+from datasets import HIERARQUIA
+from filtro_indice import IndiceFiltro
+from graficos import grafico_linhas
+from tabela_paginada import paginar_dataframe, tabela_paginada
 
 st.set_page_config(page_title="Vendas por Categoria", layout="wide")
 st.title("Vendas por Categoria")
 
-QUERY = """
-SELECT
-    v.data_venda,
-    vi.produto_id,
-    vi.produto_codigo,
-    vi.produto_nome,
-    vi.quantidade,
-    vi.valor_unitario,
-    vi.valor_total,
-    vw.categoria,
-    vw.modelo,
-    vw.cor,
-    vw.tecido,
-    vw.tamanho
-FROM vendas_itens vi
-JOIN vendas v ON v.id = vi.venda_id
-LEFT JOIN vw_estoque_por_produto_v6 vw ON vw.produto_id = vi.produto_id
-"""
-
-HIERARQUIA = ["categoria", "modelo", "cor", "tecido", "tamanho"]
 LABELS = {
     "categoria": "Categoria",
     "modelo": "Modelo",
@@ -36,24 +20,30 @@ LABELS = {
 }
 
 
-@st.cache_data
-def load_data():
-    df = query_sql(QUERY)
-    df["data_venda"] = pd.to_datetime(df["data_venda"])
-    for col in HIERARQUIA:
-        df[col] = df[col].fillna(f"Sem {col}")
-    return df
+@st.cache_data(ttl=60)
+def load_versao():
+    return datasets.versao("vendas_categoria")
 
 
-df = load_data()
+@st.cache_data(max_entries=2)
+def load_data(versao):
+    return datasets.vendas_categoria(versao)
+
+
+@st.cache_resource(max_entries=2)
+def load_indice(versao):
+    return IndiceFiltro(load_data(versao), HIERARQUIA, coluna_data="data_venda")
+
+
+versao = load_versao()
+df = load_data(versao)
+indice = load_indice(versao)
 
 # ============================================================
 # Filtros hierárquicos (cascata)
 # ============================================================
 st.subheader("Filtros")
 
-filtered = df.copy()
-
 # --- Data + Agrupamento ---
 col_data1, col_data2, col_agrup = st.columns([2, 2, 1])
 data_min = df["data_venda"].min().date()
@@ -66,22 +56,20 @@ with col_data2:
 with col_agrup:
     agrupamento = st.selectbox("Agrupar por", options=["Diário", "Semanal", "Mensal"])
 
-if data_inicio:
-    filtered = filtered[filtered["data_venda"] >= pd.Timestamp(data_inicio)]
-if data_fim:
-    filtered = filtered[filtered["data_venda"] <= pd.Timestamp(data_fim)]
+linhas = indice.intervalo(data_inicio, data_fim)
 
 # --- Cascata: cada filtro restringe os próximos ---
 cols = st.columns(len(HIERARQUIA))
 selecoes = {}
 
 for i, dim in enumerate(HIERARQUIA):
-    opcoes = sorted(filtered[dim].unique())
+    opcoes = indice.opcoes(dim, linhas)
     with cols[i]:
         sel = st.multiselect(LABELS[dim], options=opcoes, key=f"filtro_{dim}")
     selecoes[dim] = sel
-    if sel:
-        filtered = filtered[filtered[dim].isin(sel)]
+    linhas = indice.restringir(dim, sel, linhas)
+
+filtered = indice.aplicar(df, linhas)
 
 # ============================================================
 # Detalhar por (independente dos filtros)
@@ -125,30 +113,21 @@ freq_map = {"Diário": "D", "Semanal": "W-MON", "Mensal": "MS"}
 freq = freq_map[agrupamento]
 
 chart_df = (
-    filtered.groupby([pd.Grouper(key="data_venda", freq=freq), dim_detalhe], as_index=False)
+    filtered.groupby([pd.Grouper(key="data_venda", freq=freq), dim_detalhe], as_index=False, observed=True)
     .agg(valor_total=("valor_total", "sum"), quantidade=("quantidade", "sum"))
 )
 
-# Top 10 pra não poluir o gráfico
-top_valores = (
-    filtered.groupby(dim_detalhe, as_index=False)["valor_total"]
-    .sum()
-    .nlargest(10, "valor_total")[dim_detalhe]
-)
-chart_df_top = chart_df[chart_df[dim_detalhe].isin(top_valores)]
-
-fig_line = px.line(
-    chart_df_top,
+# Top 10 + "Outros" pra não poluir o gráfico
+fig_line = grafico_linhas(
+    chart_df,
     x="data_venda",
     y="valor_total",
-    color=dim_detalhe,
+    cor=dim_detalhe,
     custom_data=["quantidade"],
     labels={"data_venda": "Data", "valor_total": "Vendas (R$)", dim_detalhe: label_detalhe},
+    hovertemplate="<b>%{x}</b><br>R$ %{y:,.2f}<br>Qtd: %{customdata[0]:,.0f}<extra>%{fullData.name}</extra>",
+    max_series=10,
 )
-fig_line.update_traces(
-    hovertemplate="<b>%{x}</b><br>R$ %{y:,.2f}<br>Qtd: %{customdata[0]:,.0f}<extra>%{fullData.name}</extra>"
-)
-fig_line.update_layout(hovermode="x unified")
 
 st.plotly_chart(fig_line, use_container_width=True)
 
@@ -160,7 +139,7 @@ st.subheader(f"Ranking e Distribuição por {label_detalhe}")
 col_rank, col_pie = st.columns([3, 2])
 
 ranking = (
-    filtered.groupby(dim_detalhe, as_index=False)
+    filtered.groupby(dim_detalhe, as_index=False, observed=True)
     .agg(total_vendas=("valor_total", "sum"), total_qtd=("quantidade", "sum"))
     .sort_values("total_vendas", ascending=False)
     .reset_index(drop=True)
@@ -220,4 +199,12 @@ st.dataframe(ranking_display, use_container_width=True)
 # Dados detalhados
 # ============================================================
 with st.expander("Dados detalhados"):
-    st.dataframe(filtered, use_container_width=True)
+    filtros_chave = tuple((d, tuple(s)) for d, s in selecoes.items())
+    tabela_paginada(
+        "categoria_dados",
+        paginar_dataframe(filtered, chave=("categoria_dados", versao, data_inicio, data_fim, filtros_chave)),
+        list(filtered.columns),
+        len(filtered),
+        filtros=(versao, data_inicio, data_fim, filtros_chave),
+        ordem_padrao="data_venda",
+    )
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from db import query_sql
+
+FATO_VENDAS = "public.fato_vendas_sku_diarias"
+
+# date_trunc('week') começa na segunda-feira (ISO)
+AGRUPAMENTOS = {"Diário": "day", "Semanal": "week", "Mensal": "month"}
+
+SCHEMA_VENDAS = {
+    "data_venda": "datetime",
+    "sku": "category",
+    "produto_nome": "category",
+    "valor_total_vendas": "float64",
+    "qtd_vendida": "float32",
+}
+
+
+def _where(skus: list[str] | None, data_inicio, data_fim) -> tuple[str, list]:
+    condicoes = []
+    params = []
+    if skus:
+        condicoes.append("sku = ANY(%s)")
+        params.append(list(skus))
+    if data_inicio:
+        condicoes.append("data_venda >= %s")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append("data_venda <= %s")
+        params.append(data_fim)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return where, params
+
+
+def opcoes_sku() -> pd.DataFrame:
+    """SKUs disponíveis com o nome do produto, ordenados por SKU."""
+    return query_sql(
+        f"""
+        SELECT DISTINCT ON (sku) sku, produto_nome
+        FROM {FATO_VENDAS}
+        ORDER BY sku, data_venda DESC
+        """
+    )
+
+
+def intervalo_datas() -> tuple:
+    """Primeira e última data de venda."""
+    df = query_sql(f"SELECT min(data_venda) AS data_min, max(data_venda) AS data_max FROM {FATO_VENDAS}")
+    return df.at[0, "data_min"], df.at[0, "data_max"]
+
+
+def vendas_agrupadas(skus, data_inicio, data_fim, agrupamento: str) -> pd.DataFrame:
+    """Vendas por período (dia, semana iniciando na segunda ou mês) e SKU."""
+    where, params = _where(skus, data_inicio, data_fim)
+    return query_sql(
+        f"""
+        SELECT
+            date_trunc(%s, data_venda)::date AS data_venda,
+            sku,
+            SUM(valor_total_vendas) AS valor_total_vendas,
+            SUM(qtd_vendida) AS qtd_vendida
+        FROM {FATO_VENDAS}
+        {where}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        [AGRUPAMENTOS[agrupamento], *params],
+        schema={k: v for k, v in SCHEMA_VENDAS.items() if k != "produto_nome"},
+    )
+
+
+def ranking_vendas(skus, data_inicio, data_fim, limite: int = 10) -> pd.DataFrame:
+    """Produtos mais vendidos (por valor) no período."""
+    where, params = _where(skus, data_inicio, data_fim)
+    return query_sql(
+        f"""
+        SELECT
+            sku,
+            max(produto_nome) AS produto_nome,
+            SUM(valor_total_vendas) AS total_vendas,
+            SUM(qtd_vendida) AS total_qtd
+        FROM {FATO_VENDAS}
+        {where}
+        GROUP BY sku
+        ORDER BY total_vendas DESC
+        LIMIT %s
+        """,
+        [*params, limite],
+    )
+
+
+COLUNAS_DETALHE = ("data_venda", "sku", "produto_nome", "valor_total_vendas", "qtd_vendida")
+
+
+def _valor_python(valor):
+    """Converte escalares do numpy/pandas para tipos que o psycopg2 sabe adaptar."""
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def _chave_ordenacao(ordenar_por: str) -> list[str]:
+    """Expressões da chave de paginação: a coluna ordenada desempatada pela PK (data, SKU)."""
+    if ordenar_por not in COLUNAS_DETALHE:
+        raise ValueError(f"Coluna de ordenação inválida: {ordenar_por}")
+    # Comparação de tuplas com NULL não funciona: o nome vazio ordena junto dos sem nome
+    expressao = "COALESCE(produto_nome, '')" if ordenar_por == "produto_nome" else ordenar_por
+    return [expressao] + [c for c in ("data_venda", "sku") if c != ordenar_por]
+
+
+def contar_vendas(skus, data_inicio, data_fim) -> int:
+    """Quantidade de linhas diárias por SKU no período."""
+    where, params = _where(skus, data_inicio, data_fim)
+    return int(query_sql(f"SELECT count(*) AS n FROM {FATO_VENDAS} {where}", params).at[0, "n"])
+
+
+def pagina_vendas(
+    skus,
+    data_inicio,
+    data_fim,
+    colunas=COLUNAS_DETALHE,
+    ordenar_por: str = "data_venda",
+    decrescente: bool = False,
+    apos: tuple | None = None,
+    limite: int = 50,
+) -> tuple[pd.DataFrame, tuple | None]:
+    """Uma página das linhas diárias por SKU, com paginação por chave (keyset).
+
+    `apos` é a chave da última linha da página anterior (None = primeira página).
+    Retorna a página e a chave da sua última linha, ou None se não houver próxima.
+    """
+    chave = _chave_ordenacao(ordenar_por)
+    where, params = _where(skus, data_inicio, data_fim)
+    if apos is not None:
+        comparacao = f"({', '.join(chave)}) {'<' if decrescente else '>'} ({', '.join(['%s'] * len(chave))})"
+        where = f"{where} AND {comparacao}" if where else f"WHERE {comparacao}"
+        params = [*params, *apos]
+
+    selecao = [c for c in COLUNAS_DETALHE if c in colunas] or list(COLUNAS_DETALHE)
+    colunas_chave = [f"_chave{i}" for i in range(len(chave))]
+    direcao = "DESC" if decrescente else "ASC"
+    # Sem schema: os valores da chave voltam para o banco e precisam ser exatos (numeric, date)
+    df = query_sql(
+        f"""
+        SELECT {", ".join(selecao)}, {", ".join(f"{e} AS {c}" for e, c in zip(chave, colunas_chave))}
+        FROM {FATO_VENDAS}
+        {where}
+        ORDER BY {", ".join(f"{e} {direcao}" for e in chave)}
+        LIMIT %s
+        """,
+        [*params, limite + 1],
+    )
+
+    proximo = None
+    if len(df) > limite:
+        df = df.iloc[:limite]
+        proximo = tuple(_valor_python(v) for v in df.iloc[-1][colunas_chave])
+    return df.drop(columns=colunas_chave), proximo
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from db import query_sql
+
+# Diretório compartilhado entre processos/réplicas do dashboard (ex.: volume Docker)
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "/tmp/watcher_snapshots"))
+SNAPSHOT_MAX_MB = float(os.getenv("SNAPSHOT_MAX_MB", "1024"))
+
+
+def versao_dados(*datasets: str) -> str:
+    """Versão atual dos datasets (gerações em dados_versao), ex.: 'compras:12,vendas:40'."""
+    df = query_sql(
+        """
+        SELECT dataset, geracao FROM dados_versao
+        WHERE dataset = ANY(%s)
+        ORDER BY dataset
+        """,
+        [list(datasets)],
+    )
+    return ",".join(f"{row.dataset}:{row.geracao}" for row in df.itertuples())
+
+
+def _caminho(nome: str, versao: str, params: dict) -> Path:
+    chave = json.dumps({"versao": versao, "params": params}, sort_keys=True, default=str)
+    digest = hashlib.sha256(chave.encode()).hexdigest()[:20]
+    return SNAPSHOT_DIR / f"{nome}--{digest}.arrow"
+
+
+def ler(nome: str, versao: str, **params) -> pd.DataFrame | None:
+    """Lê o snapshot (Arrow IPC, memory-mapped) se existir para essa versão e parâmetros."""
+    caminho = _caminho(nome, versao, params)
+    try:
+        tabela = feather.read_table(caminho, memory_map=True)
+    except (FileNotFoundError, OSError):
+        return None
+    # Marca o acesso para a evicção por LRU
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+    return tabela.to_pandas()
+
+
+def gravar(nome: str, versao: str, df: pd.DataFrame, **params):
+    """Grava o snapshot de forma atômica e remove as versões antigas do mesmo dataset."""
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    caminho = _caminho(nome, versao, params)
+    # Nome único por gravação: sessões do Streamlit são threads do mesmo processo e
+    # podem gravar o mesmo snapshot ao mesmo tempo
+    fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=f"{caminho.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+        os.replace(tmp, caminho)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    if not params:
+        for antigo in SNAPSHOT_DIR.glob(f"{nome}--*.arrow"):
+            if antigo != caminho:
+                antigo.unlink(missing_ok=True)
+    _evict()
+
+
+def carregar(nome: str, versao: str, loader, **params) -> pd.DataFrame:
+    """Retorna o snapshot do dataset; se não existir, executa loader() e grava o resultado."""
+    df = ler(nome, versao, **params)
+    if df is None:
+        df = loader()
+        gravar(nome, versao, df, **params)
+    return df
+
+
+def _evict():
+    """Remove os snapshots menos usados até caber em SNAPSHOT_MAX_MB."""
+    limite = SNAPSHOT_MAX_MB * 1024 * 1024
+    arquivos = []
+    for caminho in SNAPSHOT_DIR.glob("*.arrow"):
+        try:
+            st = caminho.stat()
+        except FileNotFoundError:
+            continue
+        arquivos.append((st.st_mtime, st.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        caminho.unlink(missing_ok=True)
+        total -= tamanho
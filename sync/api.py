@@ -1,100 +1,171 @@
-import json
+from contextlib import asynccontextmanager
 from urllib.parse import urlencode
 
-from fastapi import FastAPI, Query
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, RedirectResponse
 
+from db import pool_stats
 from sync.bling import (
     BLING_AUTH_URL,
-    BLING_CLIENT_ID,
     BLING_REDIRECT_URI,
+    conta as conta_bling,
     exchange_code,
     load_tokens,
-    listar_pedidos_compra,
-    buscar_pedido_compra,
 )
-from sync.models import upsert_pedidos_compra
+from sync import jobs, metricas
+from sync.contas import BLING_CONTAS, CONTA_PADRAO, ContaDesconhecida
+from sync.models import (
+    refresh_estoque_mensal,
+    refresh_fato_vendas,
+    refresh_vendas_categoria,
+    buscar_job,
+    contar_falhas,
+    garantir_particoes_futuras,
+)
+from sync.pipeline import (
+    ENTIDADE_REPLAY_PEDIDOS_COMPRA,
+    entidade_pedidos_compra,
+    replay_pedidos_compra,
+    sync_pedidos_compra as _sync_generator,
+)
+
+# Uma entidade (job, cursor e fila de falhas) por conta do Bling
+EXECUTORES = {entidade_pedidos_compra(conta): _sync_generator for conta in BLING_CONTAS}
+EXECUTORES[ENTIDADE_REPLAY_PEDIDOS_COMPRA] = replay_pedidos_compra
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Partições do mês atual e dos próximos já existem antes do primeiro sync
+    garantir_particoes_futuras()
+    # Retoma jobs interrompidos (ex.: restart no meio do sync) e segue vigiando
+    jobs.vigiar(EXECUTORES)
+    yield
+
 
-app = FastAPI(title="Watcher Sync")
+app = FastAPI(title="Watcher Sync", lifespan=lifespan)
+
+
+def _conta(conta: str) -> str:
+    """Id da conta configurada, ou 404."""
+    try:
+        return conta_bling(conta).id
+    except ContaDesconhecida as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @app.get("/bling/auth")
-def bling_auth():
-    """Redireciona para a página de autorização do Bling."""
+def bling_auth(conta: str = Query(CONTA_PADRAO)):
+    """Redireciona para a página de autorização do Bling da conta."""
+    c = conta_bling(_conta(conta))
     params = urlencode({
         "response_type": "code",
-        "client_id": BLING_CLIENT_ID,
+        "client_id": c.client_id,
         "redirect_uri": BLING_REDIRECT_URI,
-        "state": "watcher",
+        # O Bling devolve o state no callback: é por ele que os tokens vão para a conta certa
+        "state": c.id,
     })
     return RedirectResponse(f"{BLING_AUTH_URL}?{params}")
 
 
 @app.get("/bling/callback")
 def bling_callback(code: str = Query(...), state: str = Query("")):
-    """Recebe o code do OAuth2 e troca por tokens."""
-    tokens = exchange_code(code)
-    return {"message": "Autenticação concluída", "expires_in": tokens["expires_in"]}
-
-
-def _sync_generator():
-    """Busca e salva página por página, emitindo progresso."""
-    import time
-
-    pagina = 1
-    total_inseridos = 0
-    total_erros = 0
-    total_pedidos = 0
-
-    while True:
-        resp = listar_pedidos_compra(pagina=pagina, limite=100)
-        data = resp.get("data", [])
-        if not data:
-            break
-
-        pedidos_detalhados = []
-        for pedido_resumo in data:
-            pedido_id = pedido_resumo.get("id")
-            if pedido_id:
-                time.sleep(0.35)
-                try:
-                    detalhe = buscar_pedido_compra(pedido_id)
-                    pedidos_detalhados.append(detalhe.get("data", detalhe))
-                except Exception as e:
-                    total_erros += 1
-                    yield json.dumps({"erro_fetch": str(e), "pedido_id": pedido_id}) + "\n"
-
-        resultado = upsert_pedidos_compra(pedidos_detalhados)
-        total_pedidos += resultado["total"]
-        total_inseridos += resultado["inseridos"]
-        total_erros += len(resultado["erros"])
-
-        progresso = {
-            "pagina": pagina,
-            "pedidos_pagina": len(data),
-            "inseridos_pagina": resultado["inseridos"],
-            "erros_pagina": len(resultado["erros"]),
-            "acumulado": {"total": total_pedidos, "inseridos": total_inseridos, "erros": total_erros},
-        }
-        yield json.dumps(progresso) + "\n"
-
-        pagina += 1
-        time.sleep(0.35)
-
-    yield json.dumps({"concluido": True, "total": total_pedidos, "inseridos": total_inseridos, "erros": total_erros}) + "\n"
-
-
-@app.post("/sync/pedidos-compra")
-def sync_pedidos_compra():
-    """Busca todos os pedidos de compra do Bling e salva no Supabase, com progresso."""
-    return StreamingResponse(_sync_generator(), media_type="application/x-ndjson")
+    """Recebe o code do OAuth2 e troca por tokens da conta indicada no state."""
+    if state not in BLING_CONTAS:
+        # Sem fallback: gravar os tokens na conta errada misturaria os pedidos de duas empresas
+        raise HTTPException(status_code=400, detail=f"state inválido: {state!r} não está em BLING_CONTAS")
+    conta = state
+    tokens = exchange_code(code, conta)
+    return {"message": "Autenticação concluída", "conta": conta, "expires_in": tokens["expires_in"]}
+
+
+@app.post("/sync/pedidos-compra", status_code=202)
+def sync_pedidos_compra(
+    incremental: bool = Query(False),
+    somente_falhas: bool = Query(False),
+    conta: str | None = Query(None),
+):
+    """Inicia o sync dos pedidos de compra em segundo plano e retorna os ids dos jobs.
+
+    Sem `conta`, inicia um job por conta de BLING_CONTAS; os jobs rodam em paralelo
+    no pool de processos (SYNC_PROCESSOS), cada um com o rate limit da sua conta.
+    Com `incremental=true`, processa apenas o que mudou desde o último sync; com
+    `somente_falhas=true`, só busca de novo os pedidos da fila de falhas. Um job
+    interrompido (ou que terminou em erro) é retomado do último checkpoint.
+    """
+    contas = [_conta(conta)] if conta else list(BLING_CONTAS)
+    iniciados = {}
+    em_andamento = {}
+    for conta_id in contas:
+        parametros = {"incremental": incremental, "conta": conta_id}
+        if somente_falhas:
+            parametros["somente_falhas"] = True
+        try:
+            iniciados[conta_id] = jobs.iniciar(entidade_pedidos_compra(conta_id), _sync_generator, parametros)
+        except jobs.JobEmAndamento as e:
+            em_andamento[conta_id] = e.job_id
+    if not iniciados:
+        detalhe = {"mensagem": "Sync já em execução", "jobs": em_andamento}
+        if len(em_andamento) == 1:
+            detalhe["job_id"] = next(iter(em_andamento.values()))
+        raise HTTPException(status_code=409, detail=detalhe)
+
+    resposta = {"status": "executando", "jobs": iniciados, "em_andamento": em_andamento}
+    if len(iniciados) == 1:
+        resposta["job_id"] = next(iter(iniciados.values()))
+    return resposta
+
+
+@app.post("/sync/pedidos-compra/replay", status_code=202)
+def sync_replay_pedidos_compra(conta: str | None = Query(None)):
+    """Regrava os pedidos a partir dos payloads arquivados, sem chamar o Bling, e retorna o id do job.
+
+    Para depois de mudar o mapeamento (coluna nova, correção): só os pedidos cujo
+    resultado mudou são regravados. `conta` limita a uma conta.
+    """
+    parametros = {"conta": _conta(conta)} if conta else {}
+    try:
+        job_id = jobs.iniciar(ENTIDADE_REPLAY_PEDIDOS_COMPRA, replay_pedidos_compra, parametros)
+    except jobs.JobEmAndamento as e:
+        raise HTTPException(status_code=409, detail={"mensagem": "Replay já em execução", "job_id": e.job_id})
+    return {"job_id": job_id, "status": "executando"}
+
+
+@app.get("/sync/jobs/{job_id}")
+def sync_job(job_id: str):
+    """Status, progresso e checkpoint de um job de sync."""
+    job = buscar_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {**job, "eventos": jobs.eventos(job_id)}
+
+
+@app.post("/sync/fato-vendas")
+def sync_fato_vendas(completo: bool = Query(False)):
+    """Atualiza os agregados de vendas (fato diário, cubo por categoria e razão de estoque) com o que mudou."""
+    # O cubo usa a fila preenchida junto com a do fato, então a ordem não importa;
+    # o razão de estoque lê o fato e por isso vem depois dele
+    return {
+        "processados": refresh_fato_vendas(),
+        "dias_categoria": refresh_vendas_categoria(completo),
+        "skus_estoque": refresh_estoque_mensal(),
+    }
 
 
 @app.get("/sync/status")
 def status():
-    """Health check e status dos tokens."""
-    tokens = load_tokens()
+    """Health check e status dos tokens de cada conta."""
+    contas = {conta: load_tokens(conta) is not None for conta in BLING_CONTAS}
     return {
         "status": "ok",
-        "bling_autenticado": tokens is not None,
+        "bling_autenticado": all(contas.values()),
+        "bling_contas": contas,
+        "db_pool": pool_stats(),
+        "falhas_pendentes": contar_falhas(),
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métricas do processo no formato texto do Prometheus."""
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,135 +2,336 @@ import os
 import json
 import time
 import base64
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import httpx
 from dotenv import load_dotenv
 
+from sync import metricas
+from sync.contas import BLING_CONTAS, CONTA_PADRAO, arquivo_tokens, credenciais, validar
+from sync.ratelimit import TokenBucket
+
 load_dotenv()
 
-BLING_CLIENT_ID = os.getenv("BLING_CLIENT_ID", "")
-BLING_CLIENT_SECRET = os.getenv("BLING_CLIENT_SECRET", "")
+BLING_CLIENT_ID, BLING_CLIENT_SECRET = credenciais(CONTA_PADRAO)
 BLING_REDIRECT_URI = "http://localhost:8000/bling/callback"
 BLING_AUTH_URL = "https://www.bling.com.br/Api/v3/oauth/authorize"
-BLING_TOKEN_URL = "https://www.bling.com.br/Api/v3/oauth/token"
-BLING_API_BASE = "https://www.bling.com.br/Api/v3"
+# Configuráveis para apontar o sync para o fake do benchmark (bench/fake_bling.py)
+BLING_TOKEN_URL = os.getenv("BLING_TOKEN_URL", "https://www.bling.com.br/Api/v3/oauth/token")
+BLING_API_BASE = os.getenv("BLING_API_BASE", "https://www.bling.com.br/Api/v3")
+
+TOKENS_FILE = arquivo_tokens(CONTA_PADRAO)
+
+# Limite da API do Bling: 3 req/s por conta (cada conta tem o seu token bucket)
+BLING_REQ_POR_SEGUNDO = float(os.getenv("BLING_REQ_POR_SEGUNDO", "3"))
+BLING_MAX_WORKERS = int(os.getenv("BLING_MAX_WORKERS", "4"))
 
-TOKENS_FILE = Path(__file__).parent.parent / "bling_tokens.json"
+# Retentativas em 429, 5xx e erros de rede: backoff exponencial com jitter, até BLING_BACKOFF_MAX_S
+BLING_MAX_TENTATIVAS = int(os.getenv("BLING_MAX_TENTATIVAS", "6"))
+BLING_BACKOFF_BASE_S = float(os.getenv("BLING_BACKOFF_BASE_S", "0.5"))
+BLING_BACKOFF_MAX_S = float(os.getenv("BLING_BACKOFF_MAX_S", "30"))
 
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
 
-def _basic_auth_header() -> str:
-    credentials = f"{BLING_CLIENT_ID}:{BLING_CLIENT_SECRET}"
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+def _basic_auth_header(client_id: str, client_secret: str) -> str:
+    credentials = f"{client_id}:{client_secret}"
     encoded = base64.b64encode(credentials.encode()).decode()
     return f"Basic {encoded}"
 
 
-def save_tokens(data: dict):
-    tokens = {
-        "access_token": data["access_token"],
-        "refresh_token": data["refresh_token"],
-        "expires_in": data.get("expires_in", 21600),
-        "saved_at": time.time(),
-    }
-    TOKENS_FILE.write_text(json.dumps(tokens, indent=2))
-    return tokens
+_client = None
+_client_lock = threading.Lock()
 
 
-def load_tokens() -> dict | None:
-    if not TOKENS_FILE.exists():
-        return None
-    return json.loads(TOKENS_FILE.read_text())
+def _get_client() -> httpx.Client:
+    """Client HTTP do processo, com keep-alive (e HTTP/2 se o pacote h2 estiver instalado)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=_HTTP2,
+                timeout=30,
+                limits=httpx.Limits(
+                    max_connections=BLING_MAX_WORKERS * len(BLING_CONTAS) + 2,
+                    max_keepalive_connections=BLING_MAX_WORKERS * len(BLING_CONTAS) + 2,
+                ),
+            )
+        return _client
+
+
+class TokenManager:
+    """Mantém os tokens do Bling em memória e os renova com single-flight.
+
+    O arquivo é lido uma vez e só é regravado quando os tokens mudam. A renovação
+    acontece sob lock: threads que recebem 401 com o mesmo token esperam a primeira
+    renovar e reaproveitam o token novo, em vez de renovarem de novo.
+    """
+
+    def __init__(
+        self,
+        arquivo: Path,
+        conta_id: str = CONTA_PADRAO,
+        client_id: str = BLING_CLIENT_ID,
+        client_secret: str = BLING_CLIENT_SECRET,
+    ):
+        self.arquivo = arquivo
+        self.conta_id = conta_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._tokens = None
+        self._carregado = False
+        self._lock = threading.RLock()
+
+    def carregar(self) -> dict | None:
+        with self._lock:
+            if not self._carregado:
+                if self.arquivo.exists():
+                    self._tokens = json.loads(self.arquivo.read_text())
+                self._carregado = True
+            return self._tokens
+
+    def salvar(self, data: dict) -> dict:
+        tokens = {
+            "access_token": data["access_token"],
+            "refresh_token": data["refresh_token"],
+            "expires_in": data.get("expires_in", 21600),
+            "saved_at": time.time(),
+        }
+        with self._lock:
+            atuais = self.carregar()
+            if (
+                atuais
+                and atuais["access_token"] == tokens["access_token"]
+                and atuais["refresh_token"] == tokens["refresh_token"]
+            ):
+                return atuais
+            self.arquivo.write_text(json.dumps(tokens, indent=2))
+            self._tokens = tokens
+            return tokens
+
+    def renovar(self, token_rejeitado: str | None = None) -> dict:
+        """Renova o access_token. Se outra thread já trocou o token rejeitado, reaproveita."""
+        with self._lock:
+            tokens = self.carregar()
+            if not tokens:
+                raise RuntimeError(f"Nenhum token salvo. Faça a autenticação em /bling/auth?conta={self.conta_id}")
+            if token_rejeitado and tokens["access_token"] != token_rejeitado:
+                return tokens
+
+            metricas.bling_token_renovacoes.inc(motivo="401" if token_rejeitado else "expirado", conta=self.conta_id)
+            resp = _get_client().post(
+                BLING_TOKEN_URL,
+                headers={"Authorization": _basic_auth_header(self.client_id, self.client_secret)},
+                json={"grant_type": "refresh_token", "refresh_token": tokens["refresh_token"]},
+            )
+            resp.raise_for_status()
+            return self.salvar(resp.json())
+
+    def access_token(self) -> str:
+        with self._lock:
+            tokens = self.carregar()
+            if not tokens:
+                raise RuntimeError(f"Nenhum token salvo. Faça a autenticação em /bling/auth?conta={self.conta_id}")
+
+            # Renova se expirou (com margem de 5 min)
+            elapsed = time.time() - tokens["saved_at"]
+            if elapsed >= tokens["expires_in"] - 300:
+                tokens = self.renovar()
+
+            return tokens["access_token"]
+
+
+class ContaBling:
+    """Uma empresa no Bling: credenciais, tokens e rate limiter próprios.
+
+    O limite da API vale por conta, então cada uma tem o seu token bucket (com a
+    taxa reduzida a cada 429 só dela) e várias contas sincronizam em paralelo sem
+    dividir a mesma cota.
+    """
+
+    def __init__(self, conta_id: str):
+        self.id = conta_id
+        self.client_id, self.client_secret = credenciais(conta_id)
+        self.tokens = TokenManager(arquivo_tokens(conta_id), conta_id, self.client_id, self.client_secret)
+        self.rate_limiter = TokenBucket(BLING_REQ_POR_SEGUNDO)
+
 
+CONTAS = {conta_id: ContaBling(conta_id) for conta_id in BLING_CONTAS}
 
-def exchange_code(code: str) -> dict:
-    """Troca o authorization code por access_token + refresh_token."""
-    resp = httpx.post(
+
+def conta(conta_id: str = CONTA_PADRAO) -> ContaBling:
+    """Conta configurada em BLING_CONTAS (levanta ContaDesconhecida se não houver)."""
+    return CONTAS[validar(conta_id)]
+
+
+def save_tokens(data: dict, conta_id: str = CONTA_PADRAO):
+    return conta(conta_id).tokens.salvar(data)
+
+
+def load_tokens(conta_id: str = CONTA_PADRAO) -> dict | None:
+    return conta(conta_id).tokens.carregar()
+
+
+def exchange_code(code: str, conta_id: str = CONTA_PADRAO) -> dict:
+    """Troca o authorization code por access_token + refresh_token da conta."""
+    c = conta(conta_id)
+    resp = _get_client().post(
         BLING_TOKEN_URL,
-        headers={"Authorization": _basic_auth_header()},
+        headers={"Authorization": _basic_auth_header(c.client_id, c.client_secret)},
         json={"grant_type": "authorization_code", "code": code},
     )
     resp.raise_for_status()
-    return save_tokens(resp.json())
+    return c.tokens.salvar(resp.json())
 
 
-def refresh_access_token() -> dict:
-    """Renova o access_token usando o refresh_token."""
-    tokens = load_tokens()
-    if not tokens:
-        raise RuntimeError("Nenhum token salvo. Faça a autenticação em /bling/auth")
+def refresh_access_token(conta_id: str = CONTA_PADRAO) -> dict:
+    """Renova o access_token da conta usando o refresh_token."""
+    return conta(conta_id).tokens.renovar()
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    """Segundos pedidos pelo header Retry-After (em segundos ou como data HTTP)."""
+    valor = resp.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-    resp = httpx.post(
-        BLING_TOKEN_URL,
-        headers={"Authorization": _basic_auth_header()},
-        json={"grant_type": "refresh_token", "refresh_token": tokens["refresh_token"]},
-    )
-    resp.raise_for_status()
-    return save_tokens(resp.json())
 
+def _backoff(tentativa: int) -> float:
+    """Backoff exponencial com jitter completo."""
+    return random.uniform(0, min(BLING_BACKOFF_MAX_S, BLING_BACKOFF_BASE_S * 2 ** tentativa))
 
-def _get_access_token() -> str:
-    tokens = load_tokens()
-    if not tokens:
-        raise RuntimeError("Nenhum token salvo. Faça a autenticação em /bling/auth")
 
-    # Renova se expirou (com margem de 5 min)
-    elapsed = time.time() - tokens["saved_at"]
-    if elapsed >= tokens["expires_in"] - 300:
-        tokens = refresh_access_token()
+def _requisitar(
+    client: httpx.Client, c: ContaBling, path: str, params: dict, token: str, endpoint: str
+) -> httpx.Response:
+    """Faz o GET repetindo em 429, 5xx e erros de rede.
 
-    return tokens["access_token"]
+    Em 429 a taxa do rate limiter da conta é reduzida e todas as threads dela
+    pausam pelo Retry-After; cada sucesso devolve parte da taxa.
+    """
+    rate_limiter = c.rate_limiter
+    tentativa = 0
+    while True:
+        metricas.bling_espera_rate_limit.observar(rate_limiter.adquirir(), endpoint=endpoint, conta=c.id)
+        inicio = time.perf_counter()
+        try:
+            resp = client.get(
+                f"{BLING_API_BASE}{path}",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+            )
+        except httpx.TransportError:
+            metricas.bling_requisicoes.inc(endpoint=endpoint, status="erro")
+            if tentativa == BLING_MAX_TENTATIVAS - 1:
+                raise
+            metricas.bling_retentativas.inc(endpoint=endpoint, motivo="rede")
+            time.sleep(_backoff(tentativa))
+            tentativa += 1
+            continue
 
+        metricas.bling_latencia.observar(time.perf_counter() - inicio, endpoint=endpoint)
+        metricas.bling_requisicoes.inc(endpoint=endpoint, status=str(resp.status_code))
 
-def _api_get(path: str, params: dict | None = None) -> dict:
-    token = _get_access_token()
-    resp = httpx.get(
-        f"{BLING_API_BASE}{path}",
-        headers={"Authorization": f"Bearer {token}"},
-        params=params or {},
-        timeout=30,
-    )
+        if resp.status_code not in STATUS_RETENTAVEIS or tentativa == BLING_MAX_TENTATIVAS - 1:
+            if resp.status_code < 400:
+                rate_limiter.recuperar()
+                metricas.bling_rate_limit_taxa.set(rate_limiter.taxa, conta=c.id)
+            return resp
+
+        espera = max(_retry_after(resp) or 0.0, _backoff(tentativa))
+        if resp.status_code == 429:
+            rate_limiter.reduzir()
+            rate_limiter.pausar(espera)
+            metricas.bling_rate_limit_taxa.set(rate_limiter.taxa, conta=c.id)
+            metricas.bling_retentativas.inc(endpoint=endpoint, motivo="429")
+            # A pausa do bucket já segura esta thread no próximo adquirir
+        else:
+            metricas.bling_retentativas.inc(endpoint=endpoint, motivo="5xx")
+            time.sleep(espera)
+        tentativa += 1
+
+
+def _api_get(path: str, params: dict | None = None, conta_id: str = CONTA_PADRAO) -> dict:
+    client = _get_client()
+    c = conta(conta_id)
+    endpoint = metricas.endpoint_bling(path)
+    token = c.tokens.access_token()
+    resp = _requisitar(client, c, path, params or {}, token, endpoint)
     if resp.status_code == 401:
-        # Token expirou, tenta renovar uma vez
-        token = refresh_access_token()["access_token"]
-        resp = httpx.get(
-            f"{BLING_API_BASE}{path}",
-            headers={"Authorization": f"Bearer {token}"},
-            params=params or {},
-            timeout=30,
-        )
+        # Token expirou, renova uma vez (ou reaproveita a renovação de outra thread)
+        token = c.tokens.renovar(token_rejeitado=token)["access_token"]
+        resp = _requisitar(client, c, path, params or {}, token, endpoint)
     resp.raise_for_status()
     return resp.json()
 
 
-def listar_pedidos_compra(pagina: int = 1, limite: int = 100) -> dict:
-    """Lista pedidos de compra (resumo)."""
-    return _api_get("/pedidos/compras", {"pagina": pagina, "limite": limite})
+def listar_pedidos_compra(pagina: int = 1, limite: int = 100, conta_id: str = CONTA_PADRAO, **filtros) -> dict:
+    """Lista pedidos de compra (resumo). Aceita filtros como dataInicial e valorSituacao."""
+    return _api_get("/pedidos/compras", {"pagina": pagina, "limite": limite, **filtros}, conta_id)
 
 
-def buscar_pedido_compra(id_pedido: int) -> dict:
+def buscar_pedido_compra(id_pedido: int, conta_id: str = CONTA_PADRAO) -> dict:
     """Busca um pedido de compra com todos os detalhes (itens, parcelas, etc)."""
-    return _api_get(f"/pedidos/compras/{id_pedido}")
+    return _api_get(f"/pedidos/compras/{id_pedido}", conta_id=conta_id)
+
+
+def buscar_pedidos_compra_concorrente(
+    ids: list[int], max_workers: int = BLING_MAX_WORKERS, conta_id: str = CONTA_PADRAO
+):
+    """Busca detalhes de vários pedidos em paralelo, respeitando o rate limit da conta.
+
+    Gera tuplas (pedido_id, detalhe, erro) na ordem em que as respostas chegam.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(buscar_pedido_compra, pedido_id, conta_id): pedido_id for pedido_id in ids
+        }
+        for future in as_completed(futures):
+            pedido_id = futures[future]
+            try:
+                detalhe = future.result()
+            except Exception as e:
+                yield pedido_id, None, e
+            else:
+                yield pedido_id, detalhe.get("data", detalhe), None
 
 
-def buscar_todos_pedidos_compra() -> list[dict]:
-    """Busca todos os pedidos de compra com detalhes completos, paginando."""
+def buscar_todos_pedidos_compra(conta_id: str = CONTA_PADRAO) -> list[dict]:
+    """Busca todos os pedidos de compra da conta com detalhes completos, paginando."""
     todos = []
     pagina = 1
 
     while True:
-        resp = listar_pedidos_compra(pagina=pagina, limite=100)
+        resp = listar_pedidos_compra(pagina=pagina, limite=100, conta_id=conta_id)
         data = resp.get("data", [])
         if not data:
             break
 
-        for pedido_resumo in data:
-            pedido_id = pedido_resumo.get("id")
-            if pedido_id:
-                time.sleep(0.35)  # Rate limit: max 3 req/s
-                detalhe = buscar_pedido_compra(pedido_id)
-                todos.append(detalhe.get("data", detalhe))
+        ids = [p["id"] for p in data if p.get("id")]
+        for _, detalhe, erro in buscar_pedidos_compra_concorrente(ids, conta_id=conta_id):
+            if erro:
+                raise erro
+            todos.append(detalhe)
 
         pagina += 1
-        time.sleep(0.35)
 
     return todos
@@ -0,0 +1,64 @@
+import os
+import re
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Conta de antes do multi-conta: mantém o bling_tokens.json, as credenciais
+# BLING_CLIENT_ID/BLING_CLIENT_SECRET e o nome antigo do cursor de sync
+CONTA_LEGADA = "principal"
+
+RAIZ = Path(__file__).parent.parent
+
+_ID_VALIDO = re.compile(r"^[a-z0-9_]{1,30}$")
+
+
+class ContaDesconhecida(Exception):
+    """A conta não está em BLING_CONTAS."""
+
+    def __init__(self, conta_id: str):
+        super().__init__(f"Conta Bling desconhecida: {conta_id}")
+        self.conta_id = conta_id
+
+
+def _ler_contas() -> tuple[str, ...]:
+    ids = [c.strip().lower() for c in os.getenv("BLING_CONTAS", CONTA_LEGADA).split(",") if c.strip()]
+    for conta_id in ids:
+        if not _ID_VALIDO.match(conta_id):
+            raise ValueError(f"BLING_CONTAS: id inválido {conta_id!r} (use letras minúsculas, números e _)")
+    return tuple(dict.fromkeys(ids)) or (CONTA_LEGADA,)
+
+
+# Empresas do Bling sincronizadas por este deploy, na ordem de BLING_CONTAS
+BLING_CONTAS = _ler_contas()
+# Conta usada quando nenhuma é informada: a primeira de BLING_CONTAS, que sempre existe
+CONTA_PADRAO = BLING_CONTAS[0]
+
+
+def credenciais(conta_id: str) -> tuple[str, str]:
+    """client_id e client_secret da conta (BLING_CLIENT_ID_<CONTA>, ou os globais se não houver).
+
+    Um mesmo app do Bling pode ser autorizado por várias empresas, então as
+    credenciais por conta só são necessárias quando cada uma tem o seu app.
+    """
+    sufixo = "" if conta_id == CONTA_LEGADA else f"_{conta_id.upper()}"
+    return (
+        os.getenv(f"BLING_CLIENT_ID{sufixo}") or os.getenv("BLING_CLIENT_ID", ""),
+        os.getenv(f"BLING_CLIENT_SECRET{sufixo}") or os.getenv("BLING_CLIENT_SECRET", ""),
+    )
+
+
+def arquivo_tokens(conta_id: str) -> Path:
+    """Arquivo de tokens da conta: bling_tokens.json na conta legada, bling_tokens_<conta>.json nas demais."""
+    if conta_id == CONTA_LEGADA:
+        return RAIZ / "bling_tokens.json"
+    return RAIZ / f"bling_tokens_{conta_id}.json"
+
+
+def validar(conta_id: str) -> str:
+    """Retorna o id se a conta estiver configurada; senão levanta ContaDesconhecida."""
+    if conta_id not in BLING_CONTAS:
+        raise ContaDesconhecida(conta_id)
+    return conta_id
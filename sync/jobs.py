@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sync import metricas
+from sync.contas import BLING_CONTAS
+from sync.models import (
+    criar_job,
+    assumir_job,
+    atualizar_job,
+    finalizar_job,
+    ultimo_job,
+    listar_jobs_parados,
+)
+
+# Sem heartbeat por mais que isso (s), um job "executando" é considerado interrompido
+SYNC_JOB_TIMEOUT_S = int(os.getenv("SYNC_JOB_TIMEOUT_S", "600"))
+
+# Processos que executam os jobs de sync (um job por vez em cada). Com várias contas
+# o padrão é um processo por conta, até o número de CPUs; 0 roda os jobs em threads
+# do próprio processo da API
+SYNC_PROCESSOS = int(os.getenv("SYNC_PROCESSOS", str(
+    0 if len(BLING_CONTAS) == 1 else min(len(BLING_CONTAS), os.cpu_count() or 1)
+)))
+
+# Intervalo mínimo (s) entre os envios das métricas de um worker para a API
+_INTERVALO_METRICAS_S = 5
+
+# Últimos eventos de cada job executado neste processo ou nos workers dele (erros de fetch, progresso)
+_eventos: dict[str, deque] = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+# Nos workers: fila por onde eventos e métricas voltam para o processo da API
+_fila_worker = None
+
+
+class JobEmAndamento(Exception):
+    """Já existe um job em execução para a entidade."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job {job_id} em execução")
+        self.job_id = job_id
+
+
+def _executar(job_id: str, entidade: str, executor, parametros: dict, checkpoint: dict | None, publicar=None):
+    """Consome os eventos do executor, gravando checkpoint e progresso no banco.
+
+    O executor é um gerador `executor(checkpoint=..., **parametros)` que emite dicts;
+    a chave `checkpoint`, quando presente, é o estado a partir do qual retomar.
+    `publicar` recebe cada evento (padrão: a lista de eventos do job neste processo).
+    """
+    publicar = publicar or _eventos.setdefault(job_id, deque(maxlen=200)).append
+    inicio = time.perf_counter()
+    status = "erro"
+    try:
+        for evento in executor(checkpoint=checkpoint, **parametros):
+            novo_checkpoint = evento.pop("checkpoint", None)
+            if evento:
+                publicar(evento)
+            if novo_checkpoint is not None or "erro_fetch" not in evento:
+                atualizar_job(job_id, checkpoint=novo_checkpoint, progresso=evento or None)
+            else:
+                # Erro de fetch não substitui o progresso, mas conta como heartbeat
+                atualizar_job(job_id)
+        finalizar_job(job_id, "concluido")
+        status = "concluido"
+    except Exception as e:
+        traceback.print_exc()
+        publicar({"erro": str(e)})
+        finalizar_job(job_id, "erro", str(e))
+    finally:
+        metricas.sync_execucoes.inc(entidade=entidade, status=status)
+        metricas.sync_duracao.observar(time.perf_counter() - inicio, entidade=entidade)
+
+
+def _iniciar_worker(fila):
+    global _fila_worker
+    _fila_worker = fila
+
+
+def _enviar_metricas():
+    _fila_worker.put(("metricas", f"worker-{os.getpid()}", metricas.instantaneo()))
+
+
+def _executar_no_worker(job_id: str, entidade: str, executor, parametros: dict, checkpoint: dict | None):
+    """Roda o job num processo do pool, mandando eventos e métricas de volta pela fila."""
+    ultimo_envio = time.monotonic()
+
+    def publicar(evento: dict):
+        nonlocal ultimo_envio
+        _fila_worker.put(("evento", job_id, evento))
+        if time.monotonic() - ultimo_envio >= _INTERVALO_METRICAS_S:
+            _enviar_metricas()
+            ultimo_envio = time.monotonic()
+
+    try:
+        _executar(job_id, entidade, executor, parametros, checkpoint, publicar)
+    finally:
+        _enviar_metricas()
+
+
+def _receber(fila):
+    """Thread da API que recebe os eventos e as métricas dos workers."""
+    while True:
+        tipo, origem, dados = fila.get()
+        if tipo == "evento":
+            _eventos.setdefault(origem, deque(maxlen=200)).append(dados)
+        else:
+            metricas.registrar_remoto(origem, dados)
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    """Pool de processos dos jobs, criado no primeiro uso.
+
+    Usa spawn: os workers não herdam o pool de conexões nem o client HTTP da API,
+    cada um abre os seus (um client e um rate limiter por conta em cada processo).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            contexto = multiprocessing.get_context("spawn")
+            fila = contexto.Queue()
+            threading.Thread(target=_receber, args=(fila,), name="sync-jobs-receptor", daemon=True).start()
+            _pool = ProcessPoolExecutor(
+                max_workers=SYNC_PROCESSOS,
+                mp_context=contexto,
+                initializer=_iniciar_worker,
+                initargs=(fila,),
+            )
+        return _pool
+
+
+def _disparar(job_id: str, entidade: str, executor, parametros: dict, checkpoint: dict | None):
+    if SYNC_PROCESSOS > 0:
+        # Se o worker morrer, o job fica sem heartbeat e o vigia retoma do checkpoint
+        futuro = _obter_pool().submit(_executar_no_worker, job_id, entidade, executor, parametros, checkpoint)
+        futuro.add_done_callback(_registrar_falha_worker)
+        return
+    thread = threading.Thread(
+        target=_executar,
+        args=(job_id, entidade, executor, parametros, checkpoint),
+        name=f"sync-job-{job_id}",
+        daemon=True,
+    )
+    thread.start()
+
+
+def _registrar_falha_worker(futuro):
+    global _pool
+    erro = futuro.exception()
+    if erro is None:
+        return
+    traceback.print_exception(erro)
+    # Um worker que morre quebra o pool inteiro: o próximo job cria outro
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            _pool = None
+
+
+def iniciar(entidade: str, executor, parametros: dict) -> str:
+    """Inicia (ou retoma) o job da entidade em segundo plano e retorna o id.
+
+    Se houver um job em execução parado, ele é assumido e retomado do checkpoint.
+    Se o último job terminou em erro com os mesmos parâmetros, o novo job começa
+    do checkpoint dele. Levanta JobEmAndamento se outro job estiver ativo.
+    """
+    anterior = ultimo_job(entidade)
+    if anterior and anterior["status"] == "executando":
+        job_id = str(anterior["id"])
+        if not assumir_job(job_id, SYNC_JOB_TIMEOUT_S):
+            raise JobEmAndamento(job_id)
+        _disparar(job_id, entidade, executor, anterior["parametros"], anterior["checkpoint"])
+        return job_id
+
+    checkpoint = None
+    if anterior and anterior["status"] == "erro" and anterior["parametros"] == parametros:
+        checkpoint = anterior["checkpoint"]
+
+    job_id = str(uuid.uuid4())
+    if not criar_job(job_id, entidade, parametros, checkpoint):
+        raise JobEmAndamento(str(ultimo_job(entidade)["id"]))
+    _disparar(job_id, entidade, executor, parametros, checkpoint)
+    return job_id
+
+
+def retomar_parados(executores: dict):
+    """Retoma, a partir do checkpoint, os jobs que ficaram sem heartbeat."""
+    retomados = []
+    for job in listar_jobs_parados(SYNC_JOB_TIMEOUT_S):
+        executor = executores.get(job["entidade"])
+        job_id = str(job["id"])
+        if executor and assumir_job(job_id, SYNC_JOB_TIMEOUT_S):
+            _disparar(job_id, job["entidade"], executor, job["parametros"], job["checkpoint"])
+            retomados.append(job_id)
+    return retomados
+
+
+def vigiar(executores: dict):
+    """Inicia uma thread que retoma periodicamente os jobs interrompidos."""
+    def _loop():
+        while True:
+            try:
+                retomar_parados(executores)
+            except Exception:
+                traceback.print_exc()
+            time.sleep(max(SYNC_JOB_TIMEOUT_S // 2, 30))
+
+    threading.Thread(target=_loop, name="sync-jobs-vigia", daemon=True).start()
+
+
+def eventos(job_id: str) -> list[dict]:
+    """Eventos recentes do job, se ele rodou neste processo."""
+    return list(_eventos.get(job_id, ()))
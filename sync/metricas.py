@@ -0,0 +1,252 @@
+import copy
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets padrão (s) para latências de HTTP e banco
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Buckets para tamanhos de lote (linhas)
+BUCKETS_LINHAS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._series = {}
+        registro.append(self)
+
+    def _chave(self, rotulos: dict) -> tuple:
+        if set(rotulos) != set(self.rotulos):
+            raise ValueError(f"{self.nome}: rótulos esperados {self.rotulos}, recebidos {tuple(rotulos)}")
+        return tuple(rotulos[n] for n in self.rotulos)
+
+    def _linhas(self, series: dict) -> list[str]:
+        raise NotImplementedError
+
+    def _somar(self, series: dict, outras: dict):
+        """Soma em `series` as séries de outro processo (contadores e histogramas)."""
+        for chave, valor in outras.items():
+            series[chave] = series.get(chave, 0) + valor
+
+    def copiar(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._series)
+
+    def exportar(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        series = self.copiar()
+        with _remotos_lock:
+            for instantaneo in _remotos.values():
+                self._somar(series, instantaneo.get(self.nome, {}))
+        linhas.extend(self._linhas(series))
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    """Contador monotônico, opcionalmente com rótulos."""
+
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    def valor(self, **rotulos) -> float:
+        with self._lock:
+            return self._series.get(self._chave(rotulos), 0)
+
+    def _linhas(self, series: dict) -> list[str]:
+        return [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}"
+            for chave, valor in sorted(series.items())
+        ]
+
+
+class Gauge(_Metrica):
+    """Valor instantâneo, que pode subir e descer."""
+
+    tipo = "gauge"
+
+    def set(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._series[chave] = valor
+
+    def _somar(self, series: dict, outras: dict):
+        # Cada conta tem o seu gauge, atualizado pelo processo que a sincroniza
+        series.update(outras)
+
+    def _linhas(self, series: dict) -> list[str]:
+        return [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}"
+            for chave, valor in sorted(series.items())
+        ]
+
+
+class Histograma(_Metrica):
+    """Histograma com buckets cumulativos, soma e contagem (formato Prometheus)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = (), buckets: tuple = BUCKETS_SEGUNDOS):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {"buckets": [0] * len(self.buckets), "soma": 0.0, "contagem": 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["buckets"][i] += 1
+                    break
+            serie["soma"] += valor
+            serie["contagem"] += 1
+
+    def soma(self, **rotulos) -> float:
+        with self._lock:
+            serie = self._series.get(self._chave(rotulos))
+            return serie["soma"] if serie else 0.0
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _somar(self, series: dict, outras: dict):
+        for chave, outra in outras.items():
+            serie = series.get(chave)
+            if serie is None:
+                series[chave] = copy.deepcopy(outra)
+                continue
+            serie["buckets"] = [a + b for a, b in zip(serie["buckets"], outra["buckets"])]
+            serie["soma"] += outra["soma"]
+            serie["contagem"] += outra["contagem"]
+
+    def _linhas(self, series: dict) -> list[str]:
+        linhas = []
+        for chave, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets, serie["buckets"]):
+                acumulado += quantidade
+                le = 'le="' + _formatar_numero(limite) + '"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, le)} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_numero(serie['soma'])}")
+            linhas.append(f"{self.nome}_count{rotulos} {serie['contagem']}")
+        return linhas
+
+
+registro: list[_Metrica] = []
+
+# Último instantâneo das métricas de cada worker de sync (ver sync.jobs), somado na exportação
+_remotos: dict[str, dict] = {}
+_remotos_lock = threading.Lock()
+
+
+def exportar() -> str:
+    """Todas as métricas do processo (e dos workers de sync) no formato texto do Prometheus (0.0.4)."""
+    return "\n".join(m.exportar() for m in registro) + "\n"
+
+
+def instantaneo() -> dict:
+    """Cópia das séries de todas as métricas do processo, para mandar a outro processo."""
+    return {m.nome: m.copiar() for m in registro}
+
+
+def registrar_remoto(origem: str, series: dict):
+    """Guarda o instantâneo mais recente de um worker; os valores são cumulativos por processo."""
+    with _remotos_lock:
+        _remotos[origem] = series
+
+
+_ID_NO_PATH = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_bling(path: str) -> str:
+    """Normaliza o path para o rótulo de endpoint (ids viram {id})."""
+    return _ID_NO_PATH.sub("/{id}", path)
+
+
+# --- Métricas do sync ---
+
+bling_requisicoes = Contador(
+    "bling_requisicoes_total", "Requisições à API do Bling por endpoint e status HTTP", ("endpoint", "status")
+)
+bling_latencia = Histograma(
+    "bling_requisicao_segundos", "Latência das requisições à API do Bling", ("endpoint",)
+)
+bling_espera_rate_limit = Histograma(
+    "bling_rate_limit_espera_segundos", "Tempo esperando o token bucket antes de cada requisição",
+    ("endpoint", "conta"),
+)
+bling_retentativas = Contador(
+    "bling_retentativas_total", "Requisições ao Bling repetidas, por endpoint e motivo (429, 5xx, rede)",
+    ("endpoint", "motivo"),
+)
+bling_rate_limit_taxa = Gauge(
+    "bling_rate_limit_taxa", "Taxa atual do token bucket de cada conta (req/s), reduzida quando a API devolve 429",
+    ("conta",),
+)
+bling_token_renovacoes = Contador(
+    "bling_token_renovacoes_total", "Renovações do access_token (expirado ou rejeitado com 401)", ("motivo", "conta")
+)
+db_upsert_duracao = Histograma(
+    "db_upsert_segundos", "Duração de cada gravação de pedidos no banco", ("modo",)
+)
+db_upsert_pedidos = Histograma(
+    "db_upsert_pedidos", "Pedidos por gravação no banco", ("modo",), buckets=BUCKETS_LINHAS
+)
+db_upsert_itens = Histograma(
+    "db_upsert_itens", "Itens por gravação no banco", ("modo",), buckets=BUCKETS_LINHAS
+)
+sync_estagio = Contador(
+    "sync_estagio_segundos_total", "Tempo gasto em cada estágio do pipeline de sync", ("entidade", "estagio")
+)
+sync_pedidos = Contador(
+    "sync_pedidos_total", "Pedidos processados pelo sync, por resultado", ("entidade", "resultado")
+)
+sync_itens = Contador(
+    "sync_itens_total", "Itens dos pedidos gravados pelo sync", ("entidade",)
+)
+sync_falhas = Contador(
+    "sync_falhas_total", "Pedidos enviados à fila de falhas (dead-letter) depois de esgotar as tentativas",
+    ("entidade",),
+)
+sync_execucoes = Contador(
+    "sync_execucoes_total", "Execuções de jobs de sync por status final", ("entidade", "status")
+)
+sync_duracao = Histograma(
+    "sync_execucao_segundos", "Duração das execuções de jobs de sync", ("entidade",),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+)
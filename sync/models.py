@@ -1,6 +1,61 @@
+import hashlib
+import json
+import time
 from datetime import datetime
 
-from db import get_connection
+from psycopg2 import errors
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from db import connection
+from sync import metricas
+from sync.contas import CONTA_PADRAO
+
+COLUNAS_PEDIDO = (
+    "id", "numero", "data_pedido", "data_prevista", "fornecedor_id", "fornecedor_nome",
+    "situacao_valor", "valor_total_produtos", "valor_total",
+    "desconto_valor", "ordem_compra", "observacoes", "observacoes_internas",
+    "conta_id", "hash_conteudo", "data_etl",
+)
+
+COLUNAS_ITEM = (
+    "pedido_compra_id", "data_pedido", "produto_id", "produto_codigo", "produto_nome",
+    "descricao", "codigo_fornecedor", "unidade", "quantidade",
+    "valor_unitario", "aliquota_ipi", "chave_item", "hash_item", "data_etl",
+)
+
+_IDX_DATA_PEDIDO = COLUNAS_PEDIDO.index("data_pedido")
+_IDX_CONTA = COLUNAS_PEDIDO.index("conta_id")
+_IDX_CHAVE_ITEM = COLUNAS_ITEM.index("chave_item")
+_IDX_HASH_ITEM = COLUNAS_ITEM.index("hash_item")
+
+_SQL_UPSERT_PEDIDO = f"""
+    INSERT INTO pedidos_compra ({", ".join(COLUNAS_PEDIDO)})
+    {{origem}}
+    ON CONFLICT (id, data_pedido) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in COLUNAS_PEDIDO[1:])}
+    RETURNING (xmax = 0)
+"""
+
+_SQL_INSERT_ITEM = (
+    f"INSERT INTO pedidos_compra_itens ({', '.join(COLUNAS_ITEM)}) "
+    f"VALUES ({', '.join(['%s'] * len(COLUNAS_ITEM))})"
+)
+
+_SQL_UPDATE_ITEM = (
+    f"UPDATE pedidos_compra_itens SET {', '.join(f'{c} = %s' for c in COLUNAS_ITEM[1:])} "
+    "WHERE id = %s AND data_pedido = %s"
+)
+
+
+# Payload bruto do detalhe, uma versão por conteúdo (ver replay_pedidos_compra no pipeline)
+_SQL_ARQUIVAR_PAYLOAD = """
+    INSERT INTO pedidos_compra_payloads (pedido_id, hash_payload, conta_id, payload) VALUES %s
+    ON CONFLICT (pedido_id, hash_payload) DO UPDATE SET buscado_em = now()
+"""
+
+# Pedido que mudou de data: move o pedido de partição (os itens vão junto pela FK em cascata).
+# Filtra pela data atual, para abrir só a partição de origem
+_SQL_MOVER_PEDIDO = "UPDATE pedidos_compra SET data_pedido = %s WHERE id = %s AND data_pedido = %s"
 
 
 def _parse_date(value):
@@ -10,107 +65,687 @@ def _parse_date(value):
     return value
 
 
-def upsert_pedidos_compra(pedidos: list[dict]) -> dict:
-    """Faz upsert dos pedidos de compra e seus itens no Supabase."""
-    conn = get_connection()
-    cur = conn.cursor()
+def _data_particao(pedido: dict, agora: datetime) -> str:
+    """Data usada como chave de partição: a do pedido, a prevista ou, sem nenhuma, a da carga."""
+    return (
+        _parse_date(pedido.get("data"))
+        or _parse_date(pedido.get("dataPrevista"))
+        or agora.date().isoformat()
+    )
+
+
+def garantir_particoes(datas) -> int:
+    """Cria as partições mensais de pedidos e itens que faltam para essas datas.
+
+    Roda numa transação própria e curta: criar uma partição trava a tabela-mãe,
+    então isso não deve ficar pendurado na transação do upsert. Não guarda os meses
+    já vistos: arquivar_particoes pode desanexar um mês a qualquer momento, e a
+    função do banco só cria o que não existe.
+    """
+    meses = sorted({str(d)[:7] for d in datas if d})
+    if not meses:
+        return 0
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT public.criar_particoes_mensais(t, %s::date[]) FROM unnest(%s::text[]) t",
+            ([f"{m}-01" for m in meses], ["pedidos_compra", "pedidos_compra_itens"]),
+        )
+        criadas = sum(n for (n,) in cur.fetchall())
+        conn.commit()
+    return criadas
+
+
+def _datas_atuais(cur, ids) -> dict:
+    """{id: data_pedido} dos pedidos já gravados, pela tabela de chaves (sem varrer as partições)."""
+    cur.execute("SELECT id, data_pedido FROM pedidos_compra_chaves WHERE id = ANY(%s)", (list(ids),))
+    return dict(cur.fetchall())
+
+
+def garantir_particoes_futuras(meses_a_frente: int = 3) -> int:
+    """Garante as partições do mês atual e dos próximos meses em todas as tabelas particionadas."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT public.garantir_particoes_futuras(%s)", (meses_a_frente,))
+        criadas = cur.fetchone()[0]
+        conn.commit()
+        return criadas
+
+
+def _hash(valores) -> str:
+    """Hash estável (sha256) de uma estrutura serializável em JSON."""
+    return hashlib.sha256(json.dumps(valores, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _mapear_pedido(pedido: dict, agora: datetime, conta_id: str = CONTA_PADRAO) -> tuple[tuple, list[tuple]]:
+    """Mapeia o payload do Bling para a linha de pedidos_compra e as linhas de itens.
+
+    As linhas seguem a ordem de COLUNAS_PEDIDO e COLUNAS_ITEM. Cada item recebe uma
+    chave estável dentro do pedido (produto + ocorrência) e o hash dos seus campos;
+    o hash do pedido cobre os campos do pedido e os hashes dos itens, sem o data_etl.
+    Pedido e itens levam a data de partição (_data_particao); o hash usa a data
+    como veio do Bling, para o fallback não mudar o hash de um dia para o outro.
+    A conta do Bling de origem vai em conta_id, fora do hash.
+    """
+    pedido_id = pedido.get("id")
+    data_particao = _data_particao(pedido, agora)
+    fornecedor = pedido.get("fornecedor") or {}
+    situacao = pedido.get("situacao") or {}
+
+    itens = []
+    ocorrencias = {}
+    for item in pedido.get("itens") or []:
+        produto = item.get("produto") or {}
+        campos = (
+            produto.get("id"),
+            produto.get("codigo"),
+            produto.get("nome"),
+            item.get("descricao"),
+            item.get("codigoFornecedor"),
+            item.get("unidade"),
+            item.get("quantidade"),
+            item.get("valor"),
+            item.get("aliquotaIPI"),
+        )
+        produto_ref = produto.get("id") or produto.get("codigo") or item.get("descricao")
+        ocorrencias[produto_ref] = ocorrencias.get(produto_ref, 0) + 1
+        chave = f"{produto_ref}#{ocorrencias[produto_ref]}"[:150]
+        itens.append((pedido_id, data_particao, *campos, chave, _hash(campos), agora))
+
+    campos_pedido = (
+        pedido_id,
+        pedido.get("numero"),
+        _parse_date(pedido.get("data")),
+        _parse_date(pedido.get("dataPrevista")),
+        fornecedor.get("id"),
+        fornecedor.get("nome"),
+        situacao.get("valor"),
+        pedido.get("totalProdutos"),
+        pedido.get("total"),
+        (pedido.get("desconto") or {}).get("valor"),
+        pedido.get("ordemCompra"),
+        pedido.get("observacoes"),
+        pedido.get("observacoesInternas"),
+    )
+    hash_conteudo = _hash([campos_pedido, [(i[_IDX_CHAVE_ITEM], i[_IDX_HASH_ITEM]) for i in itens]])
+    linha = (*campos_pedido, conta_id, hash_conteudo, agora)
+    return (*linha[:_IDX_DATA_PEDIDO], data_particao, *linha[_IDX_DATA_PEDIDO + 1:]), itens
+
+
+def _arquivar_payloads(cur, pedidos: list[dict], conta_id: str):
+    """Guarda os payloads como vieram do Bling, inclusive campos que o mapeamento ignora."""
+    # ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando
+    linhas = {}
+    for pedido in pedidos:
+        hash_payload = _hash(pedido)
+        linhas[(pedido.get("id"), hash_payload)] = (pedido.get("id"), hash_payload, conta_id, Json(pedido))
+    if linhas:
+        execute_values(cur, _SQL_ARQUIVAR_PAYLOAD, list(linhas.values()), page_size=1000)
+
+
+def _aplicar_diff_itens(cur, pedido_id: int, data_pedido, itens: list[tuple]):
+    """Aplica só os itens adicionados, removidos ou alterados de um pedido."""
+    cur.execute(
+        "SELECT id, chave_item, hash_item FROM pedidos_compra_itens "
+        "WHERE pedido_compra_id = %s AND data_pedido = %s",
+        (pedido_id, data_pedido),
+    )
+    existentes = cur.fetchall()
+    novos = {linha[_IDX_CHAVE_ITEM]: linha for linha in itens}
+
+    remover = [item_id for item_id, chave, _ in existentes if chave not in novos]
+    if remover:
+        cur.execute(
+            "DELETE FROM pedidos_compra_itens WHERE id = ANY(%s) AND data_pedido = %s",
+            (remover, data_pedido),
+        )
+
+    atuais = {chave: (item_id, hash_item) for item_id, chave, hash_item in existentes if chave in novos}
+    for chave, linha in novos.items():
+        atual = atuais.get(chave)
+        if atual is None:
+            cur.execute(_SQL_INSERT_ITEM, linha)
+        elif atual[1] != linha[_IDX_HASH_ITEM]:
+            cur.execute(_SQL_UPDATE_ITEM, (*linha[1:], atual[0], data_pedido))
+
+
+def upsert_pedidos_compra(pedidos: list[dict], conta_id: str = CONTA_PADRAO, arquivar: bool = True) -> dict:
+    """Faz upsert dos pedidos de compra e seus itens no Supabase, um pedido por transação.
+
+    Pedidos cujo hash de conteúdo não mudou são ignorados; nos demais só os itens
+    alterados são gravados. Com `arquivar`, o payload bruto vai para
+    pedidos_compra_payloads mesmo quando o pedido não muda.
+    """
     agora = datetime.now()
+    inicio = time.perf_counter()
+
+    placeholders_pedido = ", ".join(["%s"] * len(COLUNAS_PEDIDO))
 
+    itens_total = 0
     inseridos = 0
     atualizados = 0
+    inalterados = 0
     erros = []
 
-    for pedido in pedidos:
-        try:
-            pedido_id = pedido.get("id")
-            fornecedor = pedido.get("fornecedor") or {}
-            situacao = pedido.get("situacao") or {}
+    garantir_particoes(_data_particao(pedido, agora) for pedido in pedidos)
+
+    with connection() as conn:
+        cur = conn.cursor()
+
+        for pedido in pedidos:
+            try:
+                linha, itens = _mapear_pedido(pedido, agora, conta_id)
+                pedido_id = linha[0]
+                itens_total += len(itens)
+                if arquivar:
+                    _arquivar_payloads(cur, [pedido], conta_id)
+
+                data_pedido = linha[_IDX_DATA_PEDIDO]
+                data_atual = _datas_atuais(cur, [pedido_id]).get(pedido_id)
+                if data_atual is not None:
+                    cur.execute(
+                        "SELECT hash_conteudo FROM pedidos_compra WHERE id = %s AND data_pedido = %s",
+                        (pedido_id, data_atual),
+                    )
+                    atual = cur.fetchone()
+                    if atual and atual[0] == linha[COLUNAS_PEDIDO.index("hash_conteudo")]:
+                        conn.commit()
+                        inalterados += 1
+                        continue
+                    if str(data_atual) != data_pedido:
+                        cur.execute(_SQL_MOVER_PEDIDO, (data_pedido, pedido_id, data_atual))
+                cur.execute(_SQL_UPSERT_PEDIDO.format(origem=f"VALUES ({placeholders_pedido})"), linha)
+                inserido = cur.fetchone()[0]
+                _aplicar_diff_itens(cur, pedido_id, data_pedido, itens)
+
+                conn.commit()
+                if inserido:
+                    inseridos += 1
+                else:
+                    atualizados += 1
+
+            except Exception as e:
+                conn.rollback()
+                erros.append({"pedido_id": pedido.get("id"), "erro": str(e)})
+
+    metricas.db_upsert_duracao.observar(time.perf_counter() - inicio, modo="unitario")
+    metricas.db_upsert_pedidos.observar(len(pedidos), modo="unitario")
+    metricas.db_upsert_itens.observar(itens_total, modo="unitario")
+
+    return {
+        "total": len(pedidos),
+        "inseridos": inseridos,
+        "atualizados": atualizados,
+        "inalterados": inalterados,
+        "erros": erros,
+    }
+
+
+def normalizar_pedidos(
+    pedidos: list[dict], conta_id: str = CONTA_PADRAO
+) -> list[tuple[dict, tuple, list[tuple]]]:
+    """Mapeia os payloads do Bling para (payload, linha do pedido, linhas dos itens)."""
+    agora = datetime.now()
+    return [(pedido, *_mapear_pedido(pedido, agora, conta_id)) for pedido in pedidos]
+
+
+def upsert_pedidos_compra_bulk(pedidos: list[dict], conta_id: str = CONTA_PADRAO) -> dict:
+    """Faz upsert em lote dos pedidos de compra e seus itens (ver gravar_pedidos_normalizados)."""
+    return gravar_pedidos_normalizados(normalizar_pedidos(pedidos, conta_id))
+
+
+def gravar_pedidos_normalizados(normalizados: list[tuple[dict, tuple, list[tuple]]], arquivar: bool = True) -> dict:
+    """Faz upsert em lote de pedidos já normalizados por normalizar_pedidos.
+
+    Carrega pedidos e itens em tabelas temporárias com execute_values e faz o merge
+    com poucos comandos set-based numa única transação. Pedidos com hash inalterado
+    são descartados do lote, e nos demais só os itens adicionados, removidos ou
+    alterados são aplicados. Se o lote for rejeitado, recai em upsert_pedidos_compra
+    para reportar os erros pedido a pedido.
+
+    Com `arquivar`, os payloads brutos do lote vão para pedidos_compra_payloads na
+    mesma transação; o replay, que lê de lá, grava com arquivar=False.
+    """
+    if not normalizados:
+        return {"total": 0, "inseridos": 0, "atualizados": 0, "inalterados": 0, "erros": []}
+
+    # Um id repetido no lote (ON CONFLICT não aceita o mesmo id duas vezes no mesmo
+    # comando) fica só com a última versão e conta uma vez, nos dois caminhos abaixo
+    unicos = list({linha[0]: (pedido, linha, itens) for pedido, linha, itens in normalizados}.values())
+    por_conta = {}
+    for pedido, linha, _ in unicos:
+        por_conta.setdefault(linha[_IDX_CONTA], []).append(pedido)
+    linhas_pedidos = [linha for _, linha, _ in unicos]
+    linhas_itens = [item for _, _, itens in unicos for item in itens]
+    # Datas (partições) do lote: nos joins com as tabelas particionadas, os filtros
+    # data_pedido = ANY(...) com valores literais deixam o planner abrir só esses meses
+    datas_novas = sorted({linha[_IDX_DATA_PEDIDO] for linha in linhas_pedidos})
+
+    colunas_pedido = ", ".join(COLUNAS_PEDIDO)
+    colunas_item = ", ".join(COLUNAS_ITEM)
+
+    inicio = time.perf_counter()
+    try:
+        garantir_particoes(linha[_IDX_DATA_PEDIDO] for linha in linhas_pedidos)
+        with connection() as conn:
+            cur = conn.cursor()
+            if arquivar:
+                for conta_id, pedidos in por_conta.items():
+                    _arquivar_payloads(cur, pedidos, conta_id)
+            cur.execute(
+                "CREATE TEMP TABLE stg_pedidos_compra ON COMMIT DROP AS "
+                f"SELECT {colunas_pedido}, NULL::date AS data_atual FROM pedidos_compra WITH NO DATA"
+            )
+            cur.execute(
+                "CREATE TEMP TABLE stg_pedidos_compra_itens ON COMMIT DROP AS "
+                f"SELECT {colunas_item} FROM pedidos_compra_itens WITH NO DATA"
+            )
+            execute_values(
+                cur,
+                f"INSERT INTO stg_pedidos_compra ({colunas_pedido}) VALUES %s",
+                linhas_pedidos,
+                page_size=1000,
+            )
+            if linhas_itens:
+                execute_values(
+                    cur,
+                    f"INSERT INTO stg_pedidos_compra_itens ({colunas_item}) VALUES %s",
+                    linhas_itens,
+                    page_size=1000,
+                )
+
+            # Mês em que cada pedido já gravado está hoje
+            cur.execute(
+                """
+                UPDATE stg_pedidos_compra s SET data_atual = c.data_pedido
+                FROM pedidos_compra_chaves c
+                WHERE c.id = s.id
+                """
+            )
+            cur.execute("SELECT DISTINCT data_atual FROM stg_pedidos_compra WHERE data_atual IS NOT NULL")
+            datas_atuais = [data for (data,) in cur.fetchall()]
 
+            # Descarta os pedidos cujo conteúdo não mudou
             cur.execute(
                 """
-                INSERT INTO pedidos_compra
-                    (id, numero, data_pedido, data_prevista, fornecedor_id,
-                     situacao_valor, valor_total_produtos, valor_total,
-                     desconto_valor, ordem_compra, observacoes, observacoes_internas, data_etl)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    numero = EXCLUDED.numero,
-                    data_pedido = EXCLUDED.data_pedido,
-                    data_prevista = EXCLUDED.data_prevista,
-                    fornecedor_id = EXCLUDED.fornecedor_id,
-                    situacao_valor = EXCLUDED.situacao_valor,
-                    valor_total_produtos = EXCLUDED.valor_total_produtos,
-                    valor_total = EXCLUDED.valor_total,
-                    desconto_valor = EXCLUDED.desconto_valor,
-                    ordem_compra = EXCLUDED.ordem_compra,
-                    observacoes = EXCLUDED.observacoes,
-                    observacoes_internas = EXCLUDED.observacoes_internas,
-                    data_etl = EXCLUDED.data_etl
+                DELETE FROM stg_pedidos_compra s
+                USING pedidos_compra p
+                WHERE p.data_pedido = ANY(%s::date[])
+                  AND p.id = s.id AND p.data_pedido = s.data_atual
+                  AND p.hash_conteudo = s.hash_conteudo
                 """,
-                (
-                    pedido_id,
-                    pedido.get("numero"),
-                    _parse_date(pedido.get("data")),
-                    _parse_date(pedido.get("dataPrevista")),
-                    fornecedor.get("id"),
-                    situacao.get("valor"),
-                    pedido.get("totalProdutos"),
-                    pedido.get("total"),
-                    (pedido.get("desconto") or {}).get("valor"),
-                    pedido.get("ordemCompra"),
-                    pedido.get("observacoes"),
-                    pedido.get("observacoesInternas"),
-                    agora,
-                ),
+                (datas_atuais,),
+            )
+            inalterados = cur.rowcount
+            cur.execute(
+                """
+                DELETE FROM stg_pedidos_compra_itens n
+                WHERE NOT EXISTS (SELECT 1 FROM stg_pedidos_compra s WHERE s.id = n.pedido_compra_id)
+                """
             )
 
-            # Deleta itens antigos e insere os novos
+            # Pedidos que mudaram de data trocam de partição antes do upsert
             cur.execute(
-                "DELETE FROM pedidos_compra_itens WHERE pedido_compra_id = %s",
-                (pedido_id,),
+                """
+                UPDATE pedidos_compra p SET data_pedido = s.data_pedido
+                FROM stg_pedidos_compra s
+                WHERE p.data_pedido = ANY(%s::date[])
+                  AND p.id = s.id AND p.data_pedido = s.data_atual
+                  AND s.data_atual <> s.data_pedido
+                """,
+                (datas_atuais,),
             )
 
-            for item in pedido.get("itens") or []:
-                produto = item.get("produto") or {}
-                cur.execute(
-                    """
-                    INSERT INTO pedidos_compra_itens
-                        (pedido_compra_id, produto_id, produto_codigo, produto_nome,
-                         descricao, codigo_fornecedor, unidade, quantidade,
-                         valor_unitario, aliquota_ipi, data_etl)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        pedido_id,
-                        produto.get("id"),
-                        produto.get("codigo"),
-                        produto.get("nome"),
-                        item.get("descricao"),
-                        item.get("codigoFornecedor"),
-                        item.get("unidade"),
-                        item.get("quantidade"),
-                        item.get("valor"),
-                        item.get("aliquotaIPI"),
-                        agora,
-                    ),
-                )
+            cur.execute(_SQL_UPSERT_PEDIDO.format(origem=f"SELECT {colunas_pedido} FROM stg_pedidos_compra"))
+            resultados = cur.fetchall()
+            inseridos = sum(1 for (inserido,) in resultados if inserido)
 
+            # Itens removidos (inclui itens antigos sem chave)
+            cur.execute(
+                """
+                DELETE FROM pedidos_compra_itens i
+                USING stg_pedidos_compra s
+                WHERE i.data_pedido = ANY(%s::date[])
+                  AND i.pedido_compra_id = s.id AND i.data_pedido = s.data_pedido
+                  AND NOT EXISTS (
+                      SELECT 1 FROM stg_pedidos_compra_itens n
+                      WHERE n.pedido_compra_id = i.pedido_compra_id AND n.chave_item = i.chave_item
+                  )
+                """,
+                (datas_novas,),
+            )
+            # Itens alterados
+            cur.execute(
+                f"""
+                UPDATE pedidos_compra_itens i SET
+                    {", ".join(f"{c} = n.{c}" for c in COLUNAS_ITEM[1:])}
+                FROM stg_pedidos_compra_itens n
+                WHERE i.data_pedido = ANY(%s::date[])
+                  AND i.pedido_compra_id = n.pedido_compra_id
+                  AND i.data_pedido = n.data_pedido
+                  AND i.chave_item = n.chave_item
+                  AND i.hash_item IS DISTINCT FROM n.hash_item
+                """,
+                (datas_novas,),
+            )
+            # Itens adicionados
+            cur.execute(
+                f"""
+                INSERT INTO pedidos_compra_itens ({colunas_item})
+                SELECT {colunas_item} FROM stg_pedidos_compra_itens n
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM pedidos_compra_itens i
+                    WHERE i.data_pedido = ANY(%s::date[])
+                      AND i.pedido_compra_id = n.pedido_compra_id
+                      AND i.data_pedido = n.data_pedido
+                      AND i.chave_item = n.chave_item
+                )
+                """,
+                (datas_novas,),
+            )
             conn.commit()
-            if cur.rowcount > 0:
-                inseridos += 1
-            else:
-                atualizados += 1
+        resultado = {
+            "total": len(unicos),
+            "inseridos": inseridos,
+            "atualizados": len(resultados) - inseridos,
+            "inalterados": inalterados,
+            "erros": [],
+        }
+    except Exception:
+        # Lote rejeitado: grava pedido a pedido para saber quais falharam
+        resultado = {"total": 0, "inseridos": 0, "atualizados": 0, "inalterados": 0, "erros": []}
+        for conta_id, pedidos in por_conta.items():
+            for chave, valor in upsert_pedidos_compra(pedidos, conta_id, arquivar).items():
+                resultado[chave] += valor
+
+    metricas.db_upsert_duracao.observar(time.perf_counter() - inicio, modo="lote")
+    metricas.db_upsert_pedidos.observar(len(linhas_pedidos), modo="lote")
+    metricas.db_upsert_itens.observar(len(linhas_itens), modo="lote")
+
+    return resultado
+
+
+def carregar_resumo_pedidos_compra(ids: list[int]) -> dict[int, tuple]:
+    """Retorna {id: (situacao_valor, valor_total)} dos pedidos já gravados."""
+    if not ids:
+        return {}
+    with connection() as conn:
+        cur = conn.cursor()
+        datas = _datas_atuais(cur, ids)
+        if not datas:
+            return {}
+        cur.execute(
+            """
+            SELECT id, situacao_valor, valor_total FROM pedidos_compra
+            WHERE data_pedido = ANY(%s::date[]) AND id = ANY(%s)
+            """,
+            (sorted(set(datas.values())), list(datas)),
+        )
+        return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+
+def listar_ids_pedidos_compra_por_situacao(situacoes: tuple[int, ...], conta_id: str = CONTA_PADRAO) -> set[int]:
+    """Ids dos pedidos da conta gravados com alguma das situações informadas."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id FROM pedidos_compra WHERE conta_id = %s AND situacao_valor = ANY(%s)",
+            (conta_id, list(situacoes)),
+        )
+        return {row[0] for row in cur.fetchall()}
+
+
+def listar_payloads_arquivados(apos_id: int, limite: int, conta_id: str | None = None) -> list[tuple[int, str, dict]]:
+    """Versão mais recente do payload de cada pedido com id > apos_id, em ordem de id.
+
+    Retorna (pedido_id, conta_id, payload); paginar pelo último id (keyset) percorre
+    o arquivo inteiro sem OFFSET.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT DISTINCT ON (pedido_id) pedido_id, conta_id, payload
+            FROM pedidos_compra_payloads
+            WHERE pedido_id > %s AND (%s::varchar IS NULL OR conta_id = %s)
+            ORDER BY pedido_id, buscado_em DESC
+            LIMIT %s
+            """,
+            (apos_id, conta_id, conta_id, limite),
+        )
+        return cur.fetchall()
+
+
+def carregar_cursor(entidade: str):
+    """Retorna a última data sincronizada da entidade, ou None."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT ultima_data FROM sync_cursor WHERE entidade = %s", (entidade,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def salvar_cursor(entidade: str, ultima_data):
+    """Grava a última data sincronizada da entidade."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO sync_cursor (entidade, ultima_data, atualizado_em, ultimo_completo)
+            VALUES (%s, %s, now(), now())
+            ON CONFLICT (entidade) DO UPDATE SET
+                ultima_data = EXCLUDED.ultima_data,
+                atualizado_em = EXCLUDED.atualizado_em
+            """,
+            (entidade, ultima_data),
+        )
+        conn.commit()
+
+
+def reconciliacao_vencida(entidade: str, dias: float) -> bool:
+    """True se o último sync completo da entidade tem mais de `dias` dias (False sem cursor)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT ultimo_completo < now() - %s * interval '1 day' FROM sync_cursor WHERE entidade = %s",
+            (dias, entidade),
+        )
+        row = cur.fetchone()
+        return bool(row and row[0])
+
+
+def marcar_sync_completo(entidade: str):
+    """Registra que um sync completo da entidade terminou agora."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE sync_cursor SET ultimo_completo = now() WHERE entidade = %s", (entidade,))
+        conn.commit()
+
 
-        except Exception as e:
+def registrar_falhas(entidade: str, falhas: list[tuple[int, str]]):
+    """Grava (ou incrementa as tentativas de) registros na fila de falhas."""
+    if not falhas:
+        return
+    # ON CONFLICT não aceita o mesmo id duas vezes no mesmo comando
+    falhas = list({registro_id: (entidade, registro_id, erro) for registro_id, erro in falhas}.values())
+    with connection() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO sync_falhas (entidade, registro_id, erro) VALUES %s
+            ON CONFLICT (entidade, registro_id) DO UPDATE SET
+                erro = EXCLUDED.erro,
+                tentativas = sync_falhas.tentativas + 1,
+                ultima_falha = now()
+            """,
+            falhas,
+        )
+        conn.commit()
+
+
+def listar_falhas(entidade: str) -> list[int]:
+    """Ids na fila de falhas da entidade, das falhas mais antigas para as mais novas."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT registro_id FROM sync_falhas WHERE entidade = %s ORDER BY primeira_falha, registro_id",
+            (entidade,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def remover_falhas(entidade: str, ids: list[int]):
+    """Tira da fila de falhas os registros que foram sincronizados."""
+    if not ids:
+        return
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM sync_falhas WHERE entidade = %s AND registro_id = ANY(%s)",
+            (entidade, list(ids)),
+        )
+        conn.commit()
+
+
+def contar_falhas() -> dict[str, int]:
+    """Quantidade de registros na fila de falhas, por entidade."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT entidade, count(*) FROM sync_falhas GROUP BY entidade")
+        return dict(cur.fetchall())
+
+
+def refresh_fato_vendas() -> int:
+    """Recalcula no fato diário de vendas só os dias/SKUs alterados desde o último refresh."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT public.refresh_fato_vendas_sku_diarias()")
+        processados = cur.fetchone()[0]
+        conn.commit()
+        return processados
+
+
+def refresh_vendas_categoria(completo: bool = False) -> int:
+    """Recalcula no cubo de vendas por categoria os dias alterados (ou tudo, se completo)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT public.refresh_vendas_categoria_diaria(%s)", (completo,))
+        dias = cur.fetchone()[0]
+        conn.commit()
+        return dias
+
+
+def refresh_estoque_mensal() -> int:
+    """Atualiza o razão de estoque só nos SKUs tocados, a partir do menor mês alterado.
+
+    Syncs de contas diferentes terminam ao mesmo tempo: o lock serializa os refreshes,
+    que senão poderiam recalcular o mesmo SKU em paralelo a partir de meses diferentes.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('refresh_estoque_mensal'))")
+        cur.execute("SELECT public.refresh_estoque_mensal()")
+        skus = cur.fetchone()[0]
+        conn.commit()
+        return skus
+
+
+def criar_job(job_id: str, entidade: str, parametros: dict, checkpoint: dict | None = None) -> bool:
+    """Registra um job em execução. Retorna False se já houver outro em execução para a entidade."""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO sync_jobs (id, entidade, status, parametros, checkpoint)
+                VALUES (%s, %s, 'executando', %s, %s)
+                """,
+                (job_id, entidade, Json(parametros), Json(checkpoint) if checkpoint else None),
+            )
+        except errors.UniqueViolation:
             conn.rollback()
-            erros.append({"pedido_id": pedido.get("id"), "erro": str(e)})
+            return False
+        conn.commit()
+        return True
 
-    cur.close()
-    conn.close()
 
-    return {
-        "total": len(pedidos),
-        "inseridos": inseridos,
-        "atualizados": atualizados,
-        "erros": erros,
-    }
+def assumir_job(job_id: str, timeout_s: int) -> bool:
+    """Assume um job em execução parado há mais de timeout_s (processo que morreu)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE sync_jobs SET atualizado_em = now()
+            WHERE id = %s AND status = 'executando'
+              AND atualizado_em < now() - make_interval(secs => %s)
+            """,
+            (job_id, timeout_s),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+
+
+def atualizar_job(job_id: str, checkpoint: dict | None = None, progresso: dict | None = None):
+    """Grava checkpoint e/ou progresso do job (e serve de heartbeat)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE sync_jobs SET
+                checkpoint = COALESCE(%s, checkpoint),
+                progresso = COALESCE(%s, progresso),
+                atualizado_em = now()
+            WHERE id = %s
+            """,
+            (Json(checkpoint) if checkpoint is not None else None,
+             Json(progresso) if progresso is not None else None,
+             job_id),
+        )
+        conn.commit()
+
+
+def finalizar_job(job_id: str, status: str, erro: str | None = None):
+    """Marca o job como concluido ou erro (o checkpoint é mantido para retomar)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE sync_jobs SET status = %s, erro = %s, atualizado_em = now(), concluido_em = now()
+            WHERE id = %s
+            """,
+            (status, erro, job_id),
+        )
+        conn.commit()
+
+
+def buscar_job(job_id: str) -> dict | None:
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT * FROM sync_jobs WHERE id = %s", (job_id,))
+        return cur.fetchone()
+
+
+def ultimo_job(entidade: str) -> dict | None:
+    """Job mais recente da entidade."""
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            "SELECT * FROM sync_jobs WHERE entidade = %s ORDER BY iniciado_em DESC LIMIT 1",
+            (entidade,),
+        )
+        return cur.fetchone()
+
+
+def listar_jobs_parados(timeout_s: int) -> list[dict]:
+    """Jobs marcados como em execução sem heartbeat há mais de timeout_s."""
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            """
+            SELECT * FROM sync_jobs
+            WHERE status = 'executando' AND atualizado_em < now() - make_interval(secs => %s)
+            """,
+            (timeout_s,),
+        )
+        return cur.fetchall()
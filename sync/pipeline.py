@@ -0,0 +1,630 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sync import metricas
+from sync.bling import listar_pedidos_compra, buscar_pedidos_compra_concorrente
+from sync.contas import CONTA_LEGADA, CONTA_PADRAO, validar
+from sync.models import (
+    normalizar_pedidos,
+    gravar_pedidos_normalizados,
+    carregar_resumo_pedidos_compra,
+    listar_ids_pedidos_compra_por_situacao,
+    listar_payloads_arquivados,
+    carregar_cursor,
+    salvar_cursor,
+    reconciliacao_vencida,
+    marcar_sync_completo,
+    registrar_falhas,
+    listar_falhas,
+    remover_falhas,
+    refresh_estoque_mensal,
+)
+
+ENTIDADE_PEDIDOS_COMPRA = "pedidos_compra"
+# Replay dos payloads arquivados: job próprio, que não disputa com o sync das contas
+ENTIDADE_REPLAY_PEDIDOS_COMPRA = "pedidos_compra_replay"
+
+
+def entidade_pedidos_compra(conta_id: str = CONTA_PADRAO) -> str:
+    """Entidade dos jobs, cursor e fila de falhas da conta (a conta legada mantém o nome antigo)."""
+    return ENTIDADE_PEDIDOS_COMPRA if conta_id == CONTA_LEGADA else f"{ENTIDADE_PEDIDOS_COMPRA}:{conta_id}"
+
+
+# Situações do pedido de compra no Bling que ainda podem mudar: Em aberto, Em andamento
+SITUACOES_ABERTAS = (0, 3)
+
+# Dias reprocessados antes do cursor, para pegar pedidos lançados com data retroativa.
+# O cursor é pela data do pedido (é o filtro da listagem), não pela data de alteração:
+# um pedido já fechado e editado mais de SYNC_JANELA_DIAS depois da sua data não
+# aparece no incremental. Quem cobre esse caso é a reconciliação abaixo.
+SYNC_JANELA_DIAS = int(os.getenv("SYNC_JANELA_DIAS", "7"))
+
+# A cada tantos dias o incremental roda como sync completo (busca o detalhe de todos
+# os pedidos; os que não mudaram são descartados pelo hash). 0 desliga.
+SYNC_RECONCILIAR_DIAS = float(os.getenv("SYNC_RECONCILIAR_DIAS", "7"))
+
+# Páginas em espera entre um estágio e o próximo (backpressure e limite de memória)
+SYNC_FILA_PAGINAS = int(os.getenv("SYNC_FILA_PAGINAS", "4"))
+
+# O escritor junta as páginas que já estão na fila até esse número de pedidos por transação
+SYNC_LOTE_PEDIDOS = int(os.getenv("SYNC_LOTE_PEDIDOS", "500"))
+
+# Ids buscados por lote nas etapas avulsas (fila de falhas, pedidos retomados e fechados):
+# cada lote grava progresso/checkpoint, que é o heartbeat do job (ver SYNC_JOB_TIMEOUT_S)
+SYNC_LOTE_IDS = int(os.getenv("SYNC_LOTE_IDS", "200"))
+
+# Tempos medidos por página/lote e acumulados por execução (ver metricas.sync_estagio)
+ESTAGIOS = ("listagem", "busca", "espera_rate_limit", "normalizacao", "gravacao")
+
+_ENDPOINT_DETALHE = metricas.endpoint_bling("/pedidos/compras/0")
+
+_FIM = object()
+
+
+class _Parado(Exception):
+    """O pipeline foi interrompido (erro em outro estágio ou consumidor saiu)."""
+
+
+def _put(fila: queue.Queue, item, parar: threading.Event):
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+    raise _Parado
+
+
+def _get(fila: queue.Queue, parar: threading.Event):
+    while not parar.is_set():
+        try:
+            return fila.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    raise _Parado
+
+
+def _listar_paginas(conta_id: str, pagina: int = 1, **filtros):
+    """Percorre as páginas da listagem de pedidos de compra da conta com os filtros informados."""
+    while True:
+        resp = listar_pedidos_compra(pagina=pagina, limite=100, conta_id=conta_id, **filtros)
+        data = resp.get("data", [])
+        if not data:
+            break
+        yield pagina, data
+        pagina += 1
+
+
+def _alterado(resumo: dict, atual: tuple | None) -> bool:
+    """Compara o resumo da listagem com o que está gravado (situação e total)."""
+    if atual is None:
+        return True
+    situacao_valor, valor_total = atual
+    if (resumo.get("situacao") or {}).get("valor") != situacao_valor:
+        return True
+    return round(float(resumo.get("total") or 0), 2) != round(float(valor_total or 0), 2)
+
+
+class _Estado:
+    """Totais e posição do sync, a partir dos quais o checkpoint é montado.
+
+    Só reflete o que já foi gravado no banco: é isso que permite retomar da página
+    seguinte à última gravada sem perder as páginas que estavam em andamento.
+    """
+
+    def __init__(
+        self, conta_id: str, checkpoint: dict, incremental: bool, listagens: list[dict], abertos: set[int]
+    ):
+        self.conta_id = conta_id
+        self.entidade = entidade_pedidos_compra(conta_id)
+        self.incremental = incremental
+        self.listagens = listagens
+        self.abertos = abertos
+        self.acumulado = checkpoint.get("acumulado") or {"total": 0, "inseridos": 0, "inalterados": 0, "erros": 0}
+        self.acumulado.setdefault("itens", 0)
+        self.ultima_data = checkpoint.get("ultima_data")
+        self.vistos = set(checkpoint.get("vistos") or [])
+        # Ids na fila de falhas (sync_falhas), para tirar de lá os que derem certo
+        self.na_fila = set()
+        self.tempos = dict.fromkeys(ESTAGIOS, 0.0)
+        self.inicio = time.perf_counter()
+
+    def registrar(self, resultado: dict, erros_fetch: int = 0, itens: int = 0, tempos: dict | None = None):
+        self.acumulado["total"] += resultado["total"]
+        self.acumulado["inseridos"] += resultado["inseridos"]
+        self.acumulado["inalterados"] += resultado["inalterados"]
+        self.acumulado["erros"] += len(resultado["erros"]) + erros_fetch
+        self.acumulado["itens"] += itens
+
+        entidade = self.entidade
+        metricas.sync_itens.inc(itens, entidade=entidade)
+        for chave in ("inseridos", "atualizados", "inalterados"):
+            metricas.sync_pedidos.inc(resultado[chave], entidade=entidade, resultado=chave)
+        metricas.sync_pedidos.inc(len(resultado["erros"]) + erros_fetch, entidade=entidade, resultado="erros")
+        for estagio, segundos in (tempos or {}).items():
+            self.tempos[estagio] += segundos
+            metricas.sync_estagio.inc(segundos, entidade=entidade, estagio=estagio)
+
+    def resumo_tempos(self) -> dict:
+        return {
+            "duracao_s": round(time.perf_counter() - self.inicio, 3),
+            **{f"{estagio}_s": round(segundos, 3) for estagio, segundos in self.tempos.items()},
+        }
+
+    def registrar_pagina(self, pagina: dict):
+        self.vistos.update(pagina["listados"])
+        if pagina["ultima_data"]:
+            self.ultima_data = max(self.ultima_data or pagina["ultima_data"], pagina["ultima_data"])
+
+    def checkpoint(self, listagem: int, pagina: int, pendentes: list[int]) -> dict:
+        dados = {
+            "listagens": self.listagens,
+            "listagem": listagem,
+            "pagina": pagina,
+            "pendentes": pendentes,
+            "acumulado": dict(self.acumulado),
+            "ultima_data": self.ultima_data,
+            # Uma reconciliação retomada continua completa, mesmo num job incremental
+            "incremental": self.incremental,
+        }
+        # Só o incremental precisa dos ids vistos (para achar os pedidos fechados)
+        if self.incremental:
+            dados["vistos"] = sorted(self.vistos)
+            dados["abertos"] = sorted(self.abertos)
+        return dados
+
+
+# --- Estágios ---
+
+def _estagio_listar(estado: _Estado, listagem_inicial: int, pagina_inicial: int, saida, parar):
+    """Lista as páginas e decide quais pedidos precisam do detalhe."""
+    vistos = set(estado.vistos)
+    for idx in range(listagem_inicial, len(estado.listagens)):
+        filtros = estado.listagens[idx]
+        primeira = pagina_inicial if idx == listagem_inicial else 1
+        inicio = time.perf_counter()
+        for pagina, data in _listar_paginas(estado.conta_id, primeira, **filtros):
+            if parar.is_set():
+                raise _Parado
+            resumos = {p["id"]: p for p in data if p.get("id") and p["id"] not in vistos}
+            vistos.update(resumos)
+            datas = [
+                r["data"] for r in resumos.values()
+                if r.get("data") and r["data"] != "0000-00-00"
+            ]
+
+            ids = list(resumos)
+            if estado.incremental:
+                atuais = carregar_resumo_pedidos_compra(ids)
+                ids = [i for i in ids if _alterado(resumos[i], atuais.get(i))]
+
+            _put(saida, {
+                "listagem": idx,
+                "pagina": pagina,
+                "filtros": filtros,
+                "pedidos_pagina": len(data),
+                "listados": list(resumos),
+                "ids": ids,
+                "ultima_data": max(datas) if datas else None,
+                "tempos": {"listagem": time.perf_counter() - inicio},
+            }, parar)
+            inicio = time.perf_counter()
+    _put(saida, _FIM, parar)
+
+
+def _estagio_buscar(conta_id: str, entrada, saida, eventos, parar):
+    """Busca os detalhes (em paralelo, sob o rate limit da conta) de cada página."""
+    while True:
+        pagina = _get(entrada, parar)
+        if pagina is _FIM:
+            _put(saida, _FIM, parar)
+            return
+        detalhes = []
+        pagina["falhas"] = []
+        inicio = time.perf_counter()
+        espera_antes = metricas.bling_espera_rate_limit.soma(endpoint=_ENDPOINT_DETALHE, conta=conta_id)
+        for pedido_id, detalhe, erro in buscar_pedidos_compra_concorrente(pagina["ids"], conta_id=conta_id):
+            if erro:
+                pagina["falhas"].append((pedido_id, str(erro)))
+                eventos.put({"erro_fetch": str(erro), "pedido_id": pedido_id})
+            else:
+                detalhes.append(detalhe)
+        pagina["detalhes"] = detalhes
+        pagina["tempos"]["busca"] = time.perf_counter() - inicio
+        # Só este estágio busca detalhes da conta, então a diferença é a espera desta página
+        pagina["tempos"]["espera_rate_limit"] = (
+            metricas.bling_espera_rate_limit.soma(endpoint=_ENDPOINT_DETALHE, conta=conta_id) - espera_antes
+        )
+        _put(saida, pagina, parar)
+
+
+def _estagio_normalizar(conta_id: str, entrada, saida, parar):
+    """Converte os payloads nas linhas de pedidos e itens."""
+    while True:
+        pagina = _get(entrada, parar)
+        if pagina is _FIM:
+            _put(saida, _FIM, parar)
+            return
+        inicio = time.perf_counter()
+        pagina["normalizados"] = normalizar_pedidos(pagina.pop("detalhes"), conta_id)
+        pagina["itens"] = sum(len(itens) for _, _, itens in pagina["normalizados"])
+        pagina["tempos"]["normalizacao"] = time.perf_counter() - inicio
+        _put(saida, pagina, parar)
+
+
+def _estagio_gravar(entrada, eventos, parar):
+    """Grava as páginas em lotes: junta as que já estão na fila numa só transação."""
+    fim = False
+    while not fim:
+        lote = [_get(entrada, parar)]
+        if lote[0] is _FIM:
+            break
+        while sum(len(p["normalizados"]) for p in lote) < SYNC_LOTE_PEDIDOS:
+            try:
+                item = entrada.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIM:
+                fim = True
+                break
+            lote.append(item)
+
+        inicio = time.perf_counter()
+        resultado = gravar_pedidos_normalizados([n for p in lote for n in p["normalizados"]])
+        eventos.put(("gravado", lote, resultado, time.perf_counter() - inicio))
+
+
+def _executar_estagio(funcao, eventos: queue.Queue, parar: threading.Event, *args):
+    try:
+        funcao(*args)
+    except _Parado:
+        pass
+    except Exception as e:
+        # O erro entra na fila antes de parar os outros estágios, para não se perder
+        eventos.put(("erro", e))
+        parar.set()
+
+
+def _pipeline(estado: _Estado, listagem_inicial: int, pagina_inicial: int):
+    """Executa listagem -> busca -> normalização -> gravação em threads concorrentes.
+
+    Os estágios são ligados por filas limitadas, então o mais lento dita o ritmo.
+    Emite um evento de progresso (com checkpoint) a cada lote gravado.
+    """
+    parar = threading.Event()
+    eventos = queue.Queue()
+    paginas = queue.Queue(maxsize=SYNC_FILA_PAGINAS)
+    detalhadas = queue.Queue(maxsize=SYNC_FILA_PAGINAS)
+    normalizadas = queue.Queue(maxsize=SYNC_FILA_PAGINAS)
+
+    estagios = [
+        (_estagio_listar, estado, listagem_inicial, pagina_inicial, paginas, parar),
+        (_estagio_buscar, estado.conta_id, paginas, detalhadas, eventos, parar),
+        (_estagio_normalizar, estado.conta_id, detalhadas, normalizadas, parar),
+        (_estagio_gravar, normalizadas, eventos, parar),
+    ]
+    threads = [
+        threading.Thread(target=_executar_estagio, args=(funcao, eventos, parar, *args), daemon=True)
+        for funcao, *args in estagios
+    ]
+    for thread in threads:
+        thread.start()
+
+    escritor = threads[-1]
+    try:
+        while True:
+            try:
+                evento = eventos.get(timeout=0.5)
+            except queue.Empty:
+                if not escritor.is_alive() and eventos.empty():
+                    break
+                continue
+
+            if isinstance(evento, dict):
+                yield evento
+                continue
+
+            tipo, *dados = evento
+            if tipo == "erro":
+                raise dados[0]
+
+            lote, resultado, gravacao = dados
+            tempos = _somar_tempos([p["tempos"] for p in lote])
+            tempos["gravacao"] = gravacao
+            falhas = [f for p in lote for f in p["falhas"]]
+            estado.registrar(resultado, len(falhas), sum(p["itens"] for p in lote), tempos)
+            _atualizar_falhas(estado, falhas, resultado, [n[1][0] for p in lote for n in p["normalizados"]])
+            for pagina in lote:
+                estado.registrar_pagina(pagina)
+            ultima = lote[-1]
+            progresso = {
+                "pagina": ultima["pagina"],
+                "paginas_lote": len(lote),
+                "pedidos_lote": sum(p["pedidos_pagina"] for p in lote),
+                "inseridos_lote": resultado["inseridos"],
+                "inalterados_lote": resultado["inalterados"],
+                "erros_lote": len(resultado["erros"]) + len(falhas),
+                "tempos_lote": _arredondar(tempos),
+                "acumulado": dict(estado.acumulado),
+                "checkpoint": estado.checkpoint(ultima["listagem"], ultima["pagina"] + 1, []),
+            }
+            if estado.incremental:
+                progresso["filtros"] = ultima["filtros"]
+                progresso["alterados_lote"] = sum(len(p["ids"]) for p in lote)
+            yield progresso
+    finally:
+        parar.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+
+def _atualizar_falhas(estado: _Estado, falhas: list[tuple[int, str]], resultado: dict, buscados: list[int]):
+    """Manda para a fila de falhas o que não foi buscado/gravado e tira de lá o que deu certo."""
+    falhas = falhas + [(e["pedido_id"], e["erro"]) for e in resultado["erros"] if e.get("pedido_id")]
+    com_falha = {pedido_id for pedido_id, _ in falhas}
+    resolvidos = [i for i in buscados if i in estado.na_fila and i not in com_falha]
+
+    remover_falhas(estado.entidade, resolvidos)
+    registrar_falhas(estado.entidade, falhas)
+    estado.na_fila.difference_update(resolvidos)
+    estado.na_fila.update(com_falha)
+    metricas.sync_falhas.inc(len(falhas), entidade=estado.entidade)
+
+
+def _somar_tempos(tempos: list[dict]) -> dict:
+    total = {}
+    for parcial in tempos:
+        for estagio, segundos in parcial.items():
+            total[estagio] = total.get(estagio, 0.0) + segundos
+    return total
+
+
+def _arredondar(tempos: dict) -> dict:
+    return {f"{estagio}_s": round(segundos, 3) for estagio, segundos in tempos.items()}
+
+
+def _sincronizar_ids(ids: list[int], estado: _Estado):
+    """Busca os detalhes e grava um conjunto avulso de pedidos, emitindo erros de fetch.
+
+    Retorna o resultado da gravação e os tempos de cada etapa.
+    """
+    pedidos_detalhados = []
+    falhas = []
+    inicio = time.perf_counter()
+    espera_antes = metricas.bling_espera_rate_limit.soma(endpoint=_ENDPOINT_DETALHE, conta=estado.conta_id)
+    for pedido_id, detalhe, erro in buscar_pedidos_compra_concorrente(ids, conta_id=estado.conta_id):
+        if erro:
+            falhas.append((pedido_id, str(erro)))
+            yield {"erro_fetch": str(erro), "pedido_id": pedido_id}
+        else:
+            pedidos_detalhados.append(detalhe)
+    tempos = {
+        "busca": time.perf_counter() - inicio,
+        "espera_rate_limit": (
+            metricas.bling_espera_rate_limit.soma(endpoint=_ENDPOINT_DETALHE, conta=estado.conta_id) - espera_antes
+        ),
+    }
+
+    inicio = time.perf_counter()
+    normalizados = normalizar_pedidos(pedidos_detalhados, estado.conta_id)
+    tempos["normalizacao"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = gravar_pedidos_normalizados(normalizados)
+    tempos["gravacao"] = time.perf_counter() - inicio
+
+    estado.registrar(resultado, len(falhas), sum(len(itens) for _, _, itens in normalizados), tempos)
+    _atualizar_falhas(estado, falhas, resultado, [linha[0] for _, linha, _ in normalizados])
+    return resultado, tempos
+
+
+def _sincronizar_em_lotes(ids: list[int], estado: _Estado, etapa: str, checkpoint=None):
+    """Sincroniza `ids` em lotes de SYNC_LOTE_IDS, emitindo um evento de progresso por lote.
+
+    `checkpoint(restantes)` monta o checkpoint com os ids que ainda faltam. Sem os
+    eventos por lote, uma lista longa passaria do SYNC_JOB_TIMEOUT_S sem heartbeat
+    e o job seria retomado em paralelo enquanto ainda roda.
+    """
+    for inicio in range(0, len(ids), SYNC_LOTE_IDS):
+        fim = inicio + SYNC_LOTE_IDS
+        resultado, tempos = yield from _sincronizar_ids(ids[inicio:fim], estado)
+        evento = {
+            "etapa": etapa,
+            "ids_processados": min(fim, len(ids)),
+            "ids_total": len(ids),
+            "inseridos_lote": resultado["inseridos"],
+            "erros_lote": len(resultado["erros"]),
+            "tempos_lote": _arredondar(tempos),
+            "acumulado": dict(estado.acumulado),
+        }
+        if checkpoint:
+            evento["checkpoint"] = checkpoint(ids[fim:])
+        yield evento
+
+
+def _evento_final(estado: _Estado) -> dict:
+    # Leva ao razão de estoque só os SKUs/meses dos itens que este sync mudou
+    skus_estoque = refresh_estoque_mensal()
+    return {
+        "concluido": True,
+        "conta": estado.conta_id,
+        **estado.acumulado,
+        "skus_estoque": skus_estoque,
+        "tempos": estado.resumo_tempos(),
+    }
+
+
+def sync_pedidos_compra(
+    incremental: bool = False,
+    checkpoint: dict | None = None,
+    somente_falhas: bool = False,
+    conta: str = CONTA_PADRAO,
+):
+    """Busca e salva os pedidos de compra de uma conta do Bling, emitindo eventos de progresso (dicts).
+
+    No modo incremental lista apenas os pedidos a partir do cursor gravado (menos
+    uma janela de segurança) e os que ainda estão em situações abertas, buscando
+    o detalhe só dos pedidos novos ou cuja situação/total mudou. Se o último sync
+    completo tiver mais de SYNC_RECONCILIAR_DIAS, o incremental roda como completo.
+
+    Pedidos que falham mesmo após as retentativas vão para a fila de falhas
+    (sync_falhas). Cada sync começa buscando de novo os pedidos da fila; com
+    `somente_falhas` faz só isso, sem listar nada.
+
+    Os eventos levam em `checkpoint` a listagem e a página a retomar e os ids
+    pendentes; passando esse dict de volta o sync continua dali.
+
+    Cada conta tem o seu cursor, fila de falhas e job (ver entidade_pedidos_compra),
+    então contas diferentes podem sincronizar ao mesmo tempo.
+    """
+    conta_id = validar(conta)
+    entidade = entidade_pedidos_compra(conta_id)
+    cp = checkpoint or {}
+
+    incremental = cp.get("incremental", incremental)
+    reconciliacao = (
+        incremental and not somente_falhas and not cp and SYNC_RECONCILIAR_DIAS > 0
+        and reconciliacao_vencida(entidade, SYNC_RECONCILIAR_DIAS)
+    )
+    if reconciliacao:
+        incremental = False
+        yield {"reconciliacao": True, "conta": conta_id}
+
+    if somente_falhas:
+        listagens = []
+        abertos = set()
+    elif "listagens" in cp:
+        listagens = cp["listagens"]
+        abertos = set(cp.get("abertos") or [])
+    elif incremental:
+        cursor = carregar_cursor(entidade)
+        listagens = [{"valorSituacao": s} for s in SITUACOES_ABERTAS]
+        if cursor:
+            inicio = cursor - timedelta(days=SYNC_JANELA_DIAS)
+            listagens.insert(0, {"dataInicial": inicio.isoformat()})
+        else:
+            listagens = [{}]
+        abertos = listar_ids_pedidos_compra_por_situacao(SITUACOES_ABERTAS, conta_id)
+    else:
+        listagens = [{}]
+        abertos = set()
+
+    estado = _Estado(conta_id, cp, incremental, listagens, abertos)
+    estado.na_fila = set(listar_falhas(entidade))
+    listagem_inicial = cp.get("listagem", 0)
+    pagina_inicial = cp.get("pagina", 1)
+
+    # Fila de falhas: só no começo do sync (se ele for interrompido, os ids continuam na fila)
+    if estado.na_fila and (somente_falhas or not cp):
+        reprocessar = sorted(estado.na_fila)
+        # Sem checkpoint: os ids continuam em sync_falhas até darem certo, e os lotes
+        # já resolvidos saem de lá, então uma retomada só repete o que ainda falha
+        yield from _sincronizar_em_lotes(reprocessar, estado, "falhas")
+        yield {
+            "reprocessados_falhas": len(reprocessar),
+            "ainda_com_falha": len(estado.na_fila),
+            "acumulado": dict(estado.acumulado),
+        }
+
+    if somente_falhas:
+        yield _evento_final(estado)
+        return
+
+    # Pedidos que estavam em andamento quando o job foi interrompido
+    pendentes = cp.get("pendentes") or []
+    if pendentes:
+        yield from _sincronizar_em_lotes(
+            pendentes, estado, "retomados",
+            lambda restantes: estado.checkpoint(listagem_inicial, pagina_inicial, restantes),
+        )
+        if listagem_inicial == len(listagens):
+            # Os pendentes eram os pedidos fechados; essa etapa terminou
+            listagem_inicial += 1
+        yield {
+            "retomados": len(pendentes),
+            "acumulado": dict(estado.acumulado),
+            "checkpoint": estado.checkpoint(listagem_inicial, pagina_inicial, []),
+        }
+
+    if listagem_inicial < len(listagens):
+        yield from _pipeline(estado, listagem_inicial, pagina_inicial)
+
+    # Pedidos que estavam abertos e saíram dessas situações (atendidos/cancelados)
+    if listagem_inicial <= len(listagens):
+        fechados = sorted(abertos - estado.vistos)
+        if fechados:
+            yield {"checkpoint": estado.checkpoint(len(listagens), 1, fechados)}
+            yield from _sincronizar_em_lotes(
+                fechados, estado, "fechados",
+                lambda restantes: estado.checkpoint(len(listagens), 1, restantes),
+            )
+            yield {
+                "pedidos_fechados": len(fechados),
+                "acumulado": dict(estado.acumulado),
+                "checkpoint": estado.checkpoint(len(listagens) + 1, 1, []),
+            }
+
+    # O que falhou está na fila de falhas e será buscado de novo, então o cursor pode avançar
+    if estado.ultima_data:
+        salvar_cursor(entidade, estado.ultima_data)
+    if not incremental:
+        marcar_sync_completo(entidade)
+
+    yield _evento_final(estado)
+
+
+def replay_pedidos_compra(checkpoint: dict | None = None, conta: str | None = None):
+    """Refaz o mapeamento e a gravação dos pedidos a partir dos payloads arquivados, sem chamar a API.
+
+    Lê a versão mais recente de cada pedido em pedidos_compra_payloads, em ordem de
+    id e em lotes de SYNC_LOTE_PEDIDOS, e grava pelo mesmo caminho do sync. Como o
+    hash de conteúdo cobre os campos mapeados, só os pedidos cujo resultado do
+    mapeamento mudou (coluna nova, correção) são regravados. O próximo lote é lido
+    enquanto o atual é normalizado e gravado.
+
+    `conta` limita o replay a uma conta. O checkpoint guarda o último id gravado.
+    """
+    conta_id = validar(conta) if conta else None
+    cp = checkpoint or {}
+    ultimo_id = cp.get("ultimo_id", 0)
+    acumulado = cp.get("acumulado") or {"total": 0, "inseridos": 0, "atualizados": 0, "inalterados": 0, "erros": 0}
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=1) as leitor:
+        proximo = leitor.submit(listar_payloads_arquivados, ultimo_id, SYNC_LOTE_PEDIDOS, conta_id)
+        while True:
+            arquivados = proximo.result()
+            if not arquivados:
+                break
+            ultimo_id = arquivados[-1][0]
+            proximo = leitor.submit(listar_payloads_arquivados, ultimo_id, SYNC_LOTE_PEDIDOS, conta_id)
+
+            por_conta = {}
+            for _, conta_payload, payload in arquivados:
+                por_conta.setdefault(conta_payload, []).append(payload)
+            normalizados = [n for c, payloads in por_conta.items() for n in normalizar_pedidos(payloads, c)]
+            resultado = gravar_pedidos_normalizados(normalizados, arquivar=False)
+
+            for chave in ("total", "inseridos", "atualizados", "inalterados"):
+                acumulado[chave] += resultado[chave]
+            acumulado["erros"] += len(resultado["erros"])
+            yield {
+                "ultimo_id": ultimo_id,
+                "inseridos_lote": resultado["inseridos"],
+                "atualizados_lote": resultado["atualizados"],
+                "erros_lote": len(resultado["erros"]),
+                "acumulado": dict(acumulado),
+                "checkpoint": {"ultimo_id": ultimo_id, "acumulado": dict(acumulado)},
+            }
+
+    skus_estoque = refresh_estoque_mensal()
+    yield {
+        "concluido": True,
+        **acumulado,
+        "skus_estoque": skus_estoque,
+        "duracao_s": round(time.perf_counter() - inicio, 3),
+    }
@@ -0,0 +1,89 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket thread-safe para limitar a taxa de requisições.
+
+    Os tokens são repostos continuamente a `taxa` por segundo, até `capacidade`.
+    Uma capacidade de 1 espaça as requisições uniformemente, sem rajadas.
+
+    A taxa é adaptativa (AIMD): `reduzir` a corta multiplicativamente quando a API
+    reclama (429) e `recuperar` a devolve aos poucos, a cada sucesso, até a taxa
+    configurada. `pausar` segura todas as threads até o fim de um Retry-After.
+    """
+
+    def __init__(
+        self,
+        taxa: float,
+        capacidade: float = 1,
+        taxa_min: float | None = None,
+        fator_reducao: float = 0.5,
+        incremento: float | None = None,
+        intervalo_reducao: float = 1.0,
+    ):
+        self.taxa = taxa
+        self.taxa_max = taxa
+        self.taxa_min = taxa_min if taxa_min is not None else taxa / 10
+        self.fator_reducao = fator_reducao
+        # Por padrão volta à taxa cheia depois de ~100 sucessos a partir do mínimo
+        self.incremento = incremento if incremento is not None else (taxa - self.taxa_min) / 100
+        # 429s simultâneos de várias threads contam como uma só redução
+        self.intervalo_reducao = intervalo_reducao
+        self._ultima_reducao = float("-inf")
+        self.capacidade = capacidade
+        self._tokens = capacidade
+        self._ultimo = time.monotonic()
+        self._pausado_ate = 0.0
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        # Durante uma pausa _ultimo fica no futuro: não repõe nada até ela acabar
+        if agora > self._ultimo:
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+
+    def adquirir(self, tokens: float = 1) -> float:
+        """Bloqueia até haver tokens disponíveis. Retorna o tempo esperado, em segundos."""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                pausa = self._pausado_ate - time.monotonic()
+                if pausa <= 0:
+                    self._repor()
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return esperado
+                    falta = (tokens - self._tokens) / self.taxa
+                else:
+                    falta = pausa
+            time.sleep(falta)
+            esperado += falta
+
+    def reduzir(self):
+        """Corta a taxa (decremento multiplicativo), sem passar do mínimo."""
+        with self._lock:
+            agora = time.monotonic()
+            if agora - self._ultima_reducao < self.intervalo_reducao:
+                return
+            self._ultima_reducao = agora
+            self._repor()
+            self.taxa = max(self.taxa_min, self.taxa * self.fator_reducao)
+
+    def recuperar(self):
+        """Devolve parte da taxa (incremento aditivo), até a taxa configurada."""
+        if self.taxa >= self.taxa_max:
+            return
+        with self._lock:
+            self._repor()
+            self.taxa = min(self.taxa_max, self.taxa + self.incremento)
+
+    def pausar(self, segundos: float):
+        """Nenhuma thread adquire tokens pelos próximos `segundos` (ex.: Retry-After)."""
+        with self._lock:
+            self._repor()
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+            # Ao fim da pausa recomeça sem rajada acumulada
+            self._tokens = min(self._tokens, 0)
+            self._ultimo = self._pausado_ate
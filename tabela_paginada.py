@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TAMANHOS_PAGINA = (25, 50, 100, 250)
+
+
+def _ordenar(df: pd.DataFrame, coluna: str, decrescente: bool) -> np.ndarray:
+    return df[coluna].reset_index(drop=True).sort_values(
+        ascending=not decrescente, kind="stable", na_position="last"
+    ).index.to_numpy()
+
+
+@st.cache_data(max_entries=20)
+def _ordem_em_cache(_df: pd.DataFrame, chave, coluna: str, decrescente: bool) -> np.ndarray:
+    # O DataFrame não entra no hash (prefixo _): `chave` identifica o conteúdo
+    return _ordenar(_df, coluna, decrescente)
+
+
+def paginar_dataframe(df: pd.DataFrame, chave=None):
+    """Fonte de páginas sobre um DataFrame já carregado no servidor.
+
+    Retorna `carregar(colunas, ordenar_por, decrescente, cursor, limite)` no formato
+    esperado por `tabela_paginada`. O cursor é a posição da próxima linha na ordem
+    pedida; só a ordem (um argsort da coluna) e as linhas da página são calculadas.
+    Com `chave` (hashable que identifica o conteúdo do DataFrame, ex.: versão do
+    snapshot + filtros), a ordem fica em cache entre as páginas e os reruns.
+    """
+    def carregar(colunas, ordenar_por, decrescente, cursor, limite):
+        inicio = cursor or 0
+        if ordenar_por and chave is not None:
+            ordem = _ordem_em_cache(df, chave, ordenar_por, decrescente)
+        elif ordenar_por:
+            ordem = _ordenar(df, ordenar_por, decrescente)
+        else:
+            ordem = np.arange(len(df))
+        posicoes = ordem[inicio:inicio + limite]
+        pagina = df.iloc[posicoes]
+        if colunas:
+            pagina = pagina[list(colunas)]
+        proximo = inicio + limite if inicio + limite < len(df) else None
+        return pagina, proximo
+
+    return carregar
+
+
+def _estado(chave: str, assinatura) -> dict:
+    estado = st.session_state.get(chave)
+    if estado is None or estado["assinatura"] != assinatura:
+        # Filtros ou ordenação mudaram: volta para a primeira página
+        estado = {"assinatura": assinatura, "cursores": [None], "pagina": 0}
+        st.session_state[chave] = estado
+    return estado
+
+
+def _avancar(estado: dict, proximo):
+    del estado["cursores"][estado["pagina"] + 1:]
+    estado["cursores"].append(proximo)
+    estado["pagina"] += 1
+
+
+def _voltar(estado: dict):
+    estado["pagina"] = max(0, estado["pagina"] - 1)
+
+
+def _primeira(estado: dict):
+    estado["pagina"] = 0
+
+
+def tabela_paginada(
+    chave: str,
+    carregar,
+    colunas: list[str],
+    total: int,
+    filtros=(),
+    colunas_padrao: list[str] | None = None,
+    ordem_padrao: str | None = None,
+    rotulos: dict[str, str] | None = None,
+    formatar=None,
+):
+    """Tabela com paginação, ordenação e seleção de colunas feitas no servidor.
+
+    Só a página visível é enviada ao navegador. `carregar(colunas, ordenar_por,
+    decrescente, cursor, limite)` devolve (página, cursor da próxima página ou None);
+    o cursor é opaco (chave da última linha no banco, posição num DataFrame). Os
+    cursores das páginas visitadas ficam em st.session_state e são descartados
+    quando `filtros` ou a ordenação mudam. `formatar` é aplicado só à página.
+    """
+    rotulos = rotulos or {}
+
+    col_colunas, col_ordem, col_direcao, col_tamanho = st.columns([4, 2, 1, 1])
+    with col_colunas:
+        selecionadas = st.multiselect(
+            "Colunas",
+            options=colunas,
+            default=colunas_padrao or colunas,
+            format_func=lambda c: rotulos.get(c, c),
+            key=f"{chave}_colunas",
+        )
+    with col_ordem:
+        ordenar_por = st.selectbox(
+            "Ordenar por",
+            options=colunas,
+            index=colunas.index(ordem_padrao) if ordem_padrao in colunas else 0,
+            format_func=lambda c: rotulos.get(c, c),
+            key=f"{chave}_ordem",
+        )
+    with col_direcao:
+        decrescente = st.toggle("Decrescente", key=f"{chave}_decrescente")
+    with col_tamanho:
+        limite = st.selectbox("Linhas", options=TAMANHOS_PAGINA, index=1, key=f"{chave}_tamanho")
+
+    estado = _estado(f"{chave}_paginacao", (filtros, ordenar_por, decrescente, limite))
+    # Mantém a ordem original das colunas, independente da ordem de seleção
+    selecionadas = tuple(c for c in colunas if c in selecionadas) or tuple(colunas)
+
+    pagina, proximo = carregar(selecionadas, ordenar_por, decrescente, estado["cursores"][estado["pagina"]], limite)
+    if formatar:
+        pagina = formatar(pagina)
+
+    st.dataframe(pagina.rename(columns=rotulos), width='stretch', hide_index=True)
+
+    n_paginas = max(1, -(-total // limite))
+    col_primeira, col_anterior, col_info, col_proxima = st.columns([1, 1, 4, 1])
+    col_primeira.button(
+        "⏮ Primeira", key=f"{chave}_primeira", disabled=estado["pagina"] == 0,
+        on_click=_primeira, args=(estado,),
+    )
+    col_anterior.button(
+        "◀ Anterior", key=f"{chave}_anterior", disabled=estado["pagina"] == 0,
+        on_click=_voltar, args=(estado,),
+    )
+    col_info.caption(f"Página {estado['pagina'] + 1} de {n_paginas} · {total:,} linhas".replace(",", "."))
+    col_proxima.button(
+        "Próxima ▶", key=f"{chave}_proxima", disabled=proximo is None,
+        on_click=_avancar, args=(estado, proximo),
+    )
@@ -0,0 +1,169 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from estoque_analise import (
+    COLUNAS,
+    ESTOQUE_COBERTURA_ALERTA,
+    ESTOQUE_COBERTURA_ALVO,
+    ESTOQUE_COBERTURA_CRITICA,
+    analisar_estoque,
+    ranking_alertas,
+)
+
+
+def _referencia(df: pd.DataFrame, janela: int, referencia=None) -> pd.DataFrame:
+    """Mesmos indicadores calculados SKU a SKU, com o calendário mensal completo.
+
+    Cada SKU é reindexado mês a mês do primeiro mês até a referência: meses sem
+    linha têm venda zero e mantêm o estoque do mês anterior.
+    """
+    ref = pd.Timestamp(referencia) if referencia is not None else df["mes"].max()
+    resultado = []
+    for sku, grupo in df[df["mes"] <= ref].dropna(subset=["sku"]).groupby("sku", sort=False):
+        calendario = pd.date_range(grupo["mes"].min(), ref, freq="MS")
+        serie = grupo.set_index("mes").reindex(calendario)
+        estoque = serie["estoque_acumulado"].ffill()
+        vendido = serie["qtd_vendida"].fillna(0)
+
+        estoque_atual = float(estoque.iloc[-1])
+        velocidade = float(vendido.iloc[-janela:].sum()) / janela
+
+        sequencias, atual = [], 0
+        for sem_estoque in (estoque <= 0):
+            atual = atual + 1 if sem_estoque else 0
+            if atual == 1:
+                sequencias.append(0)
+            if atual:
+                sequencias[-1] = atual
+        ruptura_atual = atual
+
+        if estoque_atual <= 0:
+            cobertura, status, prevista = 0.0, "ruptura", ref
+        elif velocidade == 0:
+            cobertura, status, prevista = math.inf, "sem_giro", pd.NaT
+        else:
+            cobertura = estoque_atual / velocidade
+            prevista = ref + pd.DateOffset(months=math.ceil(cobertura))
+            if cobertura < ESTOQUE_COBERTURA_CRITICA:
+                status = "critico"
+            elif cobertura < ESTOQUE_COBERTURA_ALERTA:
+                status = "alerta"
+            else:
+                status = "ok"
+
+        resultado.append({
+            "sku": sku,
+            "status": status,
+            "estoque_atual": estoque_atual,
+            "velocidade": velocidade,
+            "cobertura_meses": cobertura,
+            "ruptura_prevista": prevista,
+            "ruptura_atual": ruptura_atual,
+            "maior_ruptura": max(sequencias, default=0),
+            "meses_sem_estoque": sum(sequencias),
+            "sugestao_compra": max(0.0, velocidade * ESTOQUE_COBERTURA_ALVO - max(estoque_atual, 0)),
+        })
+    return pd.DataFrame(resultado, columns=COLUNAS)
+
+
+def _comparar(obtido: pd.DataFrame, esperado: pd.DataFrame):
+    obtido = obtido.set_index("sku").sort_index()
+    esperado = esperado.set_index("sku").sort_index()
+    assert list(obtido.index) == list(esperado.index)
+    assert obtido["status"].astype(str).tolist() == esperado["status"].tolist()
+    for col in ("estoque_atual", "velocidade", "cobertura_meses", "sugestao_compra"):
+        np.testing.assert_allclose(obtido[col].to_numpy(), esperado[col].to_numpy(dtype=float), err_msg=col)
+    for col in ("ruptura_atual", "maior_ruptura", "meses_sem_estoque"):
+        assert obtido[col].tolist() == esperado[col].tolist(), col
+    pd.testing.assert_series_equal(
+        obtido["ruptura_prevista"], pd.to_datetime(esperado["ruptura_prevista"]).astype("datetime64[ns]"),
+        check_names=False,
+    )
+
+
+def _linhas(sku, movimentos):
+    """(mes, comprado, vendido) -> linhas no formato de vw_estoque_vendas_mensal."""
+    estoque, linhas = 0.0, []
+    for mes, comprado, vendido in movimentos:
+        estoque += comprado - vendido
+        linhas.append((sku, pd.Timestamp(mes), comprado, vendido, estoque))
+    return linhas
+
+
+@pytest.fixture
+def df():
+    linhas = [
+        # Ruptura em curso que começou num mês sem linha seguinte (vai até a referência)
+        *_linhas("RUPTURA", [("2024-01-01", 10, 4), ("2024-03-01", 0, 6), ("2024-04-01", 0, 0)]),
+        # Sequências sem estoque no primeiro mês e terminando logo antes da referência
+        *_linhas("BORDAS", [
+            ("2024-01-01", 0, 2), ("2024-02-01", 5, 0), ("2024-03-01", 0, 3),
+            ("2024-04-01", 0, 4), ("2024-06-01", 9, 1),
+        ]),
+        # Sem vendas na janela: cobertura infinita e sem ruptura prevista
+        *_linhas("PARADO", [("2023-10-01", 20, 5)]),
+        # Cobertura baixa e média
+        *_linhas("CRITICO", [("2024-04-01", 10, 0), ("2024-05-01", 0, 6), ("2024-06-01", 0, 3)]),
+        *_linhas("ALERTA", [("2024-05-01", 20, 5), ("2024-06-01", 0, 8)]),
+        *_linhas("OK", [("2024-06-01", 100, 10)]),
+        # Estoque negativo (venda sem compra registrada)
+        *_linhas("NEGATIVO", [("2024-06-01", 0, 3)]),
+    ]
+    return pd.DataFrame(linhas, columns=["sku", "mes", "qtd_comprada", "qtd_vendida", "estoque_acumulado"])
+
+
+@pytest.mark.parametrize("janela", [1, 3, 6])
+def test_igual_a_referencia(df, janela):
+    _comparar(analisar_estoque(df, janela=janela), _referencia(df, janela))
+
+
+@pytest.mark.parametrize("referencia", ["2024-03-01", "2024-05-01", "2024-09-01"])
+def test_igual_a_referencia_com_mes_de_referencia(df, referencia):
+    # Linhas depois da referência são ignoradas; meses sem linha até ela contam no calendário
+    _comparar(analisar_estoque(df, janela=3, referencia=referencia), _referencia(df, 3, referencia))
+
+
+def test_sequencias_nas_bordas(df):
+    analise = analisar_estoque(df, janela=3).set_index("sku")
+
+    # Jan sem estoque; depois mar, abr e mai (sem linha, herda abr) sem estoque; jun repõe
+    assert analise.loc["BORDAS", ["ruptura_atual", "maior_ruptura", "meses_sem_estoque"]].tolist() == [0, 3, 4]
+    # Mar até a referência (jun), inclusive os meses sem linha
+    assert analise.loc["RUPTURA", ["ruptura_atual", "maior_ruptura", "meses_sem_estoque"]].tolist() == [4, 4, 4]
+    assert analise.loc["RUPTURA", "status"] == "ruptura"
+    assert analise.loc["RUPTURA", "ruptura_prevista"] == pd.Timestamp("2024-06-01")
+
+
+def test_cobertura_sem_giro(df):
+    analise = analisar_estoque(df, janela=3).set_index("sku")
+
+    assert analise.loc["PARADO", "velocidade"] == 0
+    assert analise.loc["PARADO", "cobertura_meses"] == math.inf
+    assert analise.loc["PARADO", "status"] == "sem_giro"
+    assert pd.isna(analise.loc["PARADO", "ruptura_prevista"])
+    assert analise.loc["PARADO", "sugestao_compra"] == 0
+
+
+def test_linhas_sem_sku_ficam_de_fora(df):
+    com_nulo = pd.concat([df, df.head(2).assign(sku=None)], ignore_index=True)
+
+    _comparar(analisar_estoque(com_nulo, janela=3), _referencia(df, 3))
+
+
+def test_vazio(df):
+    assert list(analisar_estoque(df.head(0)).columns) == COLUNAS
+    assert analisar_estoque(df.head(0)).empty
+    # Referência anterior a todos os meses
+    assert analisar_estoque(df, referencia="2020-01-01").empty
+
+
+def test_ranking_alertas(df):
+    ranking = ranking_alertas(analisar_estoque(df, janela=3))
+
+    # Ruptura mais longa primeiro, depois por cobertura; sem_giro e ok ficam de fora
+    assert ranking["sku"].tolist() == ["RUPTURA", "NEGATIVO", "CRITICO", "ALERTA"]
+    assert ranking["prioridade"].tolist() == list(range(1, len(ranking) + 1))
+    assert ranking_alertas(analisar_estoque(df.head(0))).empty
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filtro_indice import IndiceFiltro
+
+HIERARQUIA = ["departamento", "categoria"]
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(42)
+    n = 500
+    departamentos = np.array(["Casa", "Moda", "Esporte", None], dtype=object)
+    categorias = np.array(["A", "B", "C", "D", "E", np.nan], dtype=object)
+    return pd.DataFrame({
+        "departamento": departamentos[rng.integers(0, len(departamentos), n)],
+        # Categórico com categorias fora de ordem e uma que não aparece
+        "categoria": pd.Categorical(
+            categorias[rng.integers(0, len(categorias), n)], categories=["E", "C", "A", "B", "D", "Z"]
+        ),
+        "data_venda": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "valor": rng.random(n),
+    })
+
+
+def _referencia(df, selecoes, inicio=None, fim=None) -> np.ndarray:
+    """Filtro ingênuo com máscaras do pandas: posições que atendem a tudo."""
+    mascara = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mascara &= df["data_venda"] >= pd.Timestamp(inicio)
+    if fim is not None:
+        mascara &= df["data_venda"] <= pd.Timestamp(fim)
+    for dim, valores in selecoes.items():
+        if len(valores):
+            mascara &= df[dim].isin(valores)
+    return np.flatnonzero(mascara.to_numpy())
+
+
+def _posicoes(indice, linhas) -> np.ndarray:
+    return np.arange(indice.n) if linhas is None else linhas
+
+
+@pytest.mark.parametrize("selecoes, inicio, fim", [
+    ({}, None, None),
+    ({"departamento": [], "categoria": []}, None, None),
+    ({"departamento": ["Casa"]}, None, None),
+    ({"departamento": ["Casa", "Moda"], "categoria": ["B"]}, None, None),
+    ({"categoria": ["A", "E"]}, "2024-03-01", "2024-06-30"),
+    ({}, "2024-02-10", None),
+    ({}, None, "2024-02-10"),
+    # Extremos iguais: o dia inteiro entra (fim inclusivo)
+    ({}, "2024-05-05", "2024-05-05"),
+    # Valores ausentes ou fora das categorias não trazem linhas
+    ({"departamento": ["Inexistente"]}, None, None),
+    ({"categoria": ["Z"]}, None, None),
+    ({}, "2030-01-01", None),
+])
+def test_selecionar_igual_ao_filtro_do_pandas(df, selecoes, inicio, fim):
+    indice = IndiceFiltro(df, HIERARQUIA, coluna_data="data_venda")
+
+    linhas = indice.selecionar(selecoes, inicio, fim)
+
+    np.testing.assert_array_equal(_posicoes(indice, linhas), _referencia(df, selecoes, inicio, fim))
+
+
+def test_sem_filtros_retorna_todas(df):
+    indice = IndiceFiltro(df, HIERARQUIA, coluna_data="data_venda")
+
+    assert indice.selecionar({}) is None
+    assert indice.selecionar({"departamento": []}) is None
+    assert indice.aplicar(df, None) is df
+
+
+def test_linhas_sem_valor_nao_entram_em_nenhuma_opcao(df):
+    indice = IndiceFiltro(df, HIERARQUIA)
+
+    # NaN/None não viram opção e as linhas sem valor só entram quando a dimensão não é filtrada
+    assert indice.opcoes("departamento") == ["Casa", "Esporte", "Moda"]
+    assert indice.opcoes("categoria") == ["A", "B", "C", "D", "E"]
+    todas = indice.selecionar({"departamento": indice.opcoes("departamento")})
+    np.testing.assert_array_equal(todas, np.flatnonzero(df["departamento"].notna().to_numpy()))
+
+
+def test_opcoes_em_cascata(df):
+    indice = IndiceFiltro(df, HIERARQUIA, coluna_data="data_venda")
+
+    linhas = indice.selecionar({"departamento": ["Esporte"]}, "2024-04-01", "2024-04-30")
+
+    esperado = df.iloc[_referencia(df, {"departamento": ["Esporte"]}, "2024-04-01", "2024-04-30")]
+    assert indice.opcoes("categoria", linhas) == sorted(esperado["categoria"].dropna().unique())
+    assert indice.opcoes("categoria", np.empty(0, dtype=np.intp)) == []
+
+
+def test_aplicar_materializa_as_linhas(df):
+    indice = IndiceFiltro(df, HIERARQUIA, coluna_data="data_venda")
+
+    linhas = indice.selecionar({"categoria": ["C"]}, "2024-06-01", None)
+
+    pd.testing.assert_frame_equal(
+        indice.aplicar(df, linhas), df.iloc[_referencia(df, {"categoria": ["C"]}, "2024-06-01", None)]
+    )
+
+
+def test_dataframe_vazio():
+    df = pd.DataFrame({
+        "departamento": pd.Series(dtype=object),
+        "categoria": pd.Series(dtype="category"),
+        "data_venda": pd.Series(dtype="datetime64[ns]"),
+    })
+    indice = IndiceFiltro(df, HIERARQUIA, coluna_data="data_venda")
+
+    assert indice.opcoes("departamento") == []
+    assert len(indice.selecionar({"departamento": ["Casa"]})) == 0
+    assert len(indice.selecionar({}, "2024-01-01", "2024-12-31")) == 0
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+
+from graficos import ROTULO_OUTROS, _limitar_series, lttb
+
+
+def _lttb_referencia(x, y, pontos) -> list[int]:
+    """LTTB como descrito por Steinarsson (2013), ponto a ponto e sem NumPy."""
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return list(range(n))
+    # Baldes de (n - 2) / (pontos - 2) pontos, com as bordas em aritmética inteira
+    def borda(i):
+        return i * (n - 2) // (pontos - 2) + 1
+
+    escolhidos = [0]
+    a = 0
+    for i in range(pontos - 2):
+        inicio, fim = borda(i), borda(i + 1)
+        prox_inicio, prox_fim = fim, borda(i + 2)
+        if i == pontos - 3:
+            cx, cy = x[n - 1], y[n - 1]
+        else:
+            cx = sum(x[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+            cy = sum(y[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+        maior, escolhido = -1.0, inicio
+        for j in range(inicio, fim):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if area > maior:
+                maior, escolhido = area, j
+        escolhidos.append(escolhido)
+        a = escolhido
+    escolhidos.append(n - 1)
+    return escolhidos
+
+
+@pytest.mark.parametrize("n, pontos", [(1000, 50), (1000, 3), (101, 10), (37, 36), (500, 499), (32, 24)])
+def test_lttb_igual_a_referencia(n, pontos):
+    rng = np.random.default_rng(n + pontos)
+    x = np.sort(rng.random(n)) * 1000
+    y = np.cumsum(rng.normal(size=n))
+
+    indices = lttb(x, y, pontos)
+
+    assert indices.tolist() == _lttb_referencia(x.tolist(), y.tolist(), pontos)
+    assert len(indices) == pontos
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize("n, pontos", [(0, 10), (1, 10), (5, 5), (5, 10), (100, 2), (100, 0)])
+def test_lttb_sem_reducao(n, pontos):
+    # n <= pontos (ou pontos < 3): nada a reduzir, devolve todos os pontos
+    x = np.arange(n, dtype=float)
+    y = np.ones(n)
+
+    np.testing.assert_array_equal(lttb(x, y, pontos), np.arange(n))
+
+
+def test_lttb_preserva_picos():
+    n = 10_000
+    x = np.arange(n, dtype=float)
+    y = np.zeros(n)
+    y[1234], y[7777] = 50.0, -80.0
+
+    indices = lttb(x, y, 100)
+
+    assert 1234 in indices and 7777 in indices
+
+
+def test_lttb_aceita_datas_como_inteiros():
+    datas = pd.date_range("2024-01-01", periods=400, freq="D").to_numpy().astype(np.int64)
+    y = np.sin(np.arange(400) / 10)
+
+    assert lttb(datas, y, 40).tolist() == _lttb_referencia(datas.astype(float).tolist(), y.tolist(), 40)
+
+
+@pytest.fixture
+def vendas():
+    rng = np.random.default_rng(7)
+    meses = pd.date_range("2024-01-01", periods=6, freq="MS")
+    skus = [f"SKU{i:02d}" for i in range(8)]
+    linhas = [
+        (mes, sku, float(rng.integers(1, 100)), float(rng.integers(1, 10)))
+        for sku in skus for mes in meses if rng.random() > 0.2
+    ]
+    return pd.DataFrame(linhas, columns=["mes", "sku", "total_vendas", "qtd"])
+
+
+def _limitar_referencia(df, max_series):
+    """Top-N por soma com pandas puro; o resto somado por mês numa série "Outros"."""
+    totais = df.groupby("sku")["total_vendas"].sum().sort_values(ascending=False)
+    principais = totais.index[:max_series]
+    outros = (
+        df[~df["sku"].isin(principais)]
+        .groupby("mes")[["total_vendas", "qtd"]].sum()
+        .reset_index()
+        .assign(sku=ROTULO_OUTROS)
+    )
+    return pd.concat([df[df["sku"].isin(principais)], outros], ignore_index=True), list(principais)
+
+
+def _normalizar(df):
+    df = df[["mes", "sku", "total_vendas", "qtd"]].astype({"sku": object})
+    return df.sort_values(["sku", "mes"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("max_series", [1, 3, 7])
+def test_limitar_series_igual_a_referencia(vendas, max_series):
+    df, series = _limitar_series(vendas, "mes", "total_vendas", "sku", ["qtd"], max_series)
+
+    esperado, principais = _limitar_referencia(vendas, max_series)
+    assert series == [*principais, ROTULO_OUTROS]
+    pd.testing.assert_frame_equal(_normalizar(df), _normalizar(esperado))
+    # "Outros" preserva o total de cada mês
+    np.testing.assert_allclose(
+        df.groupby("mes")["total_vendas"].sum(), vendas.groupby("mes")["total_vendas"].sum()
+    )
+
+
+@pytest.mark.parametrize("max_series", [8, 20])
+def test_limitar_series_sem_excesso_nao_muda_nada(vendas, max_series):
+    df, series = _limitar_series(vendas, "mes", "total_vendas", "sku", ["qtd"], max_series)
+
+    assert df is vendas
+    assert ROTULO_OUTROS not in series
+    assert sorted(series) == sorted(vendas["sku"].unique())
+
+
+def test_limitar_series_categorica(vendas):
+    categorica = vendas.astype({"sku": "category"})
+
+    df, series = _limitar_series(categorica, "mes", "total_vendas", "sku", ["qtd"], 3)
+
+    esperado, _ = _limitar_referencia(vendas, 3)
+    assert series[-1] == ROTULO_OUTROS
+    pd.testing.assert_frame_equal(_normalizar(df), _normalizar(esperado))
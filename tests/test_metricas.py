@@ -0,0 +1,157 @@
+import math
+
+import pytest
+
+from sync import metricas
+
+
+@pytest.fixture(autouse=True)
+def registro_isolado(monkeypatch):
+    # As métricas do sync ficam no registro global; cada teste usa um registro próprio
+    monkeypatch.setattr(metricas, "registro", [])
+    monkeypatch.setattr(metricas, "_remotos", {})
+
+
+def _amostras(texto: str) -> dict[str, str]:
+    """Linhas de amostra do formato texto (sem HELP/TYPE) -> valor."""
+    amostras = {}
+    for linha in texto.splitlines():
+        if linha and not linha.startswith("#"):
+            serie, valor = linha.rsplit(" ", 1)
+            amostras[serie] = valor
+    return amostras
+
+
+def test_cabecalho_help_e_type():
+    metricas.Contador("teste_total", "Contador de teste")
+    metricas.Gauge("teste_gauge", "Gauge de teste")
+    metricas.Histograma("teste_segundos", "Histograma de teste", buckets=(1,))
+
+    linhas = metricas.exportar().splitlines()
+
+    assert linhas[:2] == ["# HELP teste_total Contador de teste", "# TYPE teste_total counter"]
+    assert "# TYPE teste_gauge gauge" in linhas
+    assert "# TYPE teste_segundos histogram" in linhas
+    assert metricas.exportar().endswith("\n")
+
+
+def test_contador_sem_rotulos_e_com_rotulos():
+    simples = metricas.Contador("simples_total", "x")
+    rotulado = metricas.Contador("rotulado_total", "x", ("endpoint", "status"))
+    simples.inc()
+    simples.inc(2.5)
+    rotulado.inc(endpoint="/pedidos/compras", status=200)
+    rotulado.inc(endpoint="/pedidos/compras", status=200)
+    rotulado.inc(endpoint="/pedidos/compras", status=429)
+
+    assert _amostras(simples.exportar()) == {"simples_total": "3.5"}
+    assert _amostras(rotulado.exportar()) == {
+        'rotulado_total{endpoint="/pedidos/compras",status="200"}': "2",
+        'rotulado_total{endpoint="/pedidos/compras",status="429"}': "1",
+    }
+
+
+def test_rotulos_sao_escapados():
+    contador = metricas.Contador("escape_total", "x", ("motivo",))
+    contador.inc(motivo='a\\b"c\nd')
+
+    (linha,) = [l for l in contador.exportar().splitlines() if not l.startswith("#")]
+
+    assert linha == 'escape_total{motivo="a\\\\b\\"c\\nd"} 1'
+
+
+def test_rotulos_errados_levantam():
+    contador = metricas.Contador("rotulos_total", "x", ("conta",))
+
+    with pytest.raises(ValueError):
+        contador.inc(endpoint="/x")
+    with pytest.raises(ValueError):
+        contador.inc()
+
+
+def test_histograma_buckets_cumulativos_sum_count():
+    histograma = metricas.Histograma("latencia_segundos", "x", ("endpoint",), buckets=(0.5, 0.1, 1))
+    for valor in (0.05, 0.1, 0.3, 0.7, 5):
+        histograma.observar(valor, endpoint="/a")
+
+    amostras = _amostras(histograma.exportar())
+
+    # Buckets ordenados, cumulativos e com o +Inf no fim igual à contagem
+    assert amostras == {
+        'latencia_segundos_bucket{endpoint="/a",le="0.1"}': "2",
+        'latencia_segundos_bucket{endpoint="/a",le="0.5"}': "3",
+        'latencia_segundos_bucket{endpoint="/a",le="1"}': "4",
+        'latencia_segundos_bucket{endpoint="/a",le="+Inf"}': "5",
+        'latencia_segundos_sum{endpoint="/a"}': repr(0.05 + 0.1 + 0.3 + 0.7 + 5),
+        'latencia_segundos_count{endpoint="/a"}': "5",
+    }
+    linhas = [l for l in histograma.exportar().splitlines() if not l.startswith("#")]
+    assert [l.split("{")[0] for l in linhas][-2:] == ["latencia_segundos_sum", "latencia_segundos_count"]
+
+
+def test_histograma_sem_rotulos():
+    histograma = metricas.Histograma("lote", "x", buckets=(10,))
+    histograma.observar(3)
+
+    assert _amostras(histograma.exportar()) == {
+        'lote_bucket{le="10"}': "1",
+        'lote_bucket{le="+Inf"}': "1",
+        "lote_sum": "3",
+        "lote_count": "1",
+    }
+
+
+def test_formatar_numero():
+    assert metricas._formatar_numero(math.inf) == "+Inf"
+    assert metricas._formatar_numero(-math.inf) == "-Inf"
+    assert metricas._formatar_numero(3.0) == "3"
+    assert metricas._formatar_numero(0.25) == "0.25"
+
+
+def test_soma_instantaneos_dos_workers():
+    contador = metricas.Contador("pedidos_total", "x", ("entidade",))
+    histograma = metricas.Histograma("duracao_segundos", "x", ("entidade",), buckets=(1,))
+    gauge = metricas.Gauge("taxa", "x", ("conta",))
+    contador.inc(2, entidade="pedidos_compra")
+    histograma.observar(0.5, entidade="pedidos_compra")
+    gauge.set(3, conta="principal")
+
+    metricas.registrar_remoto("worker-1", {
+        "pedidos_total": {("pedidos_compra",): 5, ("pedidos_compra:loja2",): 1},
+        "duracao_segundos": {("pedidos_compra",): {"buckets": [0, 1], "soma": 2.0, "contagem": 1}},
+        "taxa": {("principal",): 1.5},
+    })
+    # Um instantâneo novo do mesmo worker substitui o anterior (os valores são cumulativos)
+    metricas.registrar_remoto("worker-1", {"pedidos_total": {("pedidos_compra",): 6}})
+    metricas.registrar_remoto("worker-2", {"taxa": {("loja2",): 2}})
+
+    assert _amostras(contador.exportar()) == {'pedidos_total{entidade="pedidos_compra"}': "8"}
+    assert _amostras(gauge.exportar()) == {'taxa{conta="loja2"}': "2", 'taxa{conta="principal"}': "3"}
+
+    metricas.registrar_remoto("worker-1", {
+        "duracao_segundos": {("pedidos_compra",): {"buckets": [0, 1], "soma": 2.0, "contagem": 1}},
+    })
+    assert _amostras(histograma.exportar()) == {
+        'duracao_segundos_bucket{entidade="pedidos_compra",le="1"}': "1",
+        'duracao_segundos_bucket{entidade="pedidos_compra",le="+Inf"}': "2",
+        'duracao_segundos_sum{entidade="pedidos_compra"}': "2.5",
+        'duracao_segundos_count{entidade="pedidos_compra"}': "2",
+    }
+    # A exportação não altera as séries locais
+    assert contador.valor(entidade="pedidos_compra") == 2
+
+
+def test_instantaneo_e_copia_independente():
+    contador = metricas.Contador("copia_total", "x")
+    contador.inc()
+
+    instantaneo = metricas.instantaneo()
+    contador.inc()
+
+    assert instantaneo == {"copia_total": {(): 1}}
+
+
+def test_endpoint_bling_normaliza_ids():
+    assert metricas.endpoint_bling("/pedidos/compras/123") == "/pedidos/compras/{id}"
+    assert metricas.endpoint_bling("/pedidos/compras/123/itens") == "/pedidos/compras/{id}/itens"
+    assert metricas.endpoint_bling("/pedidos/compras") == "/pedidos/compras"
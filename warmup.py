@@ -0,0 +1,61 @@
+"""Pré-aquecimento dos snapshots do dashboard.
+
+Calcula e grava em SNAPSHOT_DIR os datasets base de cada página e as agregações
+padrão (sem filtros), para que a primeira visita depois de um deploy ou de um
+sync leia o snapshot em vez de consultar o banco.
+
+    python warmup.py             # aquece uma vez e sai (início do container)
+    python warmup.py --vigiar    # reaquece sempre que dados_versao muda (fim de um sync)
+"""
+import argparse
+import os
+import sys
+import time
+
+import datasets
+
+WARMUP_INTERVALO_S = float(os.getenv("WARMUP_INTERVALO_S", "30"))
+
+
+def aquecer(aquecidas: dict | None = None) -> dict:
+    """Aquece as páginas cuja versão mudou desde `aquecidas`. Retorna as versões aquecidas."""
+    aquecidas = dict(aquecidas or {})
+    for pagina, carregadores in datasets.aquecimentos().items():
+        try:
+            versao = datasets.versao(pagina)
+            if aquecidas.get(pagina) == versao:
+                continue
+            inicio = time.perf_counter()
+            for carregar in carregadores:
+                carregar(versao)
+        except Exception as e:
+            # Uma página com erro não impede as outras; tenta de novo na próxima volta
+            print(f"[warmup] {pagina}: erro ao aquecer: {e}", file=sys.stderr, flush=True)
+            continue
+        aquecidas[pagina] = versao
+        print(f"[warmup] {pagina} ({versao}) aquecida em {time.perf_counter() - inicio:.1f}s", flush=True)
+    return aquecidas
+
+
+def vigiar(intervalo: float = WARMUP_INTERVALO_S):
+    """Consulta dados_versao a cada `intervalo` segundos e reaquece o que mudou."""
+    aquecidas = {}
+    while True:
+        aquecidas = aquecer(aquecidas)
+        time.sleep(intervalo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-aquece os snapshots do dashboard")
+    parser.add_argument("--vigiar", action="store_true", help="continua rodando e reaquece após cada sync")
+    parser.add_argument("--intervalo", type=float, default=WARMUP_INTERVALO_S, help="segundos entre verificações")
+    args = parser.parse_args()
+
+    if args.vigiar:
+        vigiar(args.intervalo)
+    else:
+        aquecer()
+
+
+if __name__ == "__main__":
+    main()